@@ -0,0 +1,154 @@
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (JPEG quality, scale factor, frames per second), from most to least constrained
+QUALITY_LADDER: List[Tuple[int, float, int]] = [
+    (40, 0.4, 5),
+    (50, 0.5, 8),
+    (60, 0.5, 10),   # low
+    (70, 0.6, 12),
+    (80, 0.7, 15),   # medium
+    (85, 0.85, 18),
+    (90, 1.0, 20),   # high
+]
+
+# The quality the user picks is the ceiling the controller may climb back to
+QUALITY_PRESETS: Dict[str, int] = {
+    "low": 2,
+    "medium": 4,
+    "high": 6
+}
+
+class ViewerState:
+    """Congestion signals and current ladder level for one viewer"""
+
+    def __init__(self, level: int, now: float):
+        self.level = level
+        self.ack_rtt: Optional[float] = None  # Smoothed frame send -> client ack time
+        self.frames_dropped = 0
+        self.frames_queued = 0
+        self.healthy_since: Optional[float] = now
+        self.last_change = now
+
+class AdaptiveBitrateController:
+    """Drive JPEG quality, scale and frame rate from measured delivery to each viewer.
+
+    Every viewer gets its own ladder level based on its send latency, dropped frames and
+    frame acknowledgements. Frames are encoded once for the whole session, so the stream
+    runs at the level of the most constrained viewer; faster viewers still receive every
+    frame while slower ones lose stale frames to their latest-wins frame slot.
+    """
+
+    def __init__(self, preset: str = "medium"):
+        self.ceiling = QUALITY_PRESETS.get(preset, QUALITY_PRESETS["medium"])
+        self.viewers: Dict[str, ViewerState] = {}
+        self._sent_at: Dict[int, float] = {}
+        self._last_evaluation = 0.0
+
+        self.evaluation_interval = 0.5  # Seconds between decisions
+        self.downgrade_cooldown = 1.0  # Let a step down take effect before the next one
+        self.upgrade_after = 3.0  # Seconds of healthy delivery before stepping up
+        self.max_send_latency = 0.25  # Seconds a frame may wait in the sender
+        self.max_ack_rtt = 0.5  # Seconds until the client reports a frame as painted
+        self.max_drop_ratio = 0.1
+        self.healthy_send_latency = 0.08
+        self.healthy_ack_rtt = 0.2
+        self.max_tracked_frames = 256
+
+    @property
+    def level(self) -> int:
+        if not self.viewers:
+            return self.ceiling
+        return min(viewer.level for viewer in self.viewers.values())
+
+    def at_ceiling(self) -> bool:
+        """True unless some viewer was stepped down below the selected preset"""
+        return self.level >= self.ceiling
+
+    def current_settings(self) -> Tuple[int, float, int]:
+        """Return (quality, scale_factor, fps) for the current level"""
+        return QUALITY_LADDER[self.level]
+
+    def set_preset(self, preset: str):
+        """Apply a user-selected quality; every viewer restarts at the new ceiling"""
+        self.ceiling = QUALITY_PRESETS.get(preset, QUALITY_PRESETS["medium"])
+        now = time.monotonic()
+        for viewer in self.viewers.values():
+            viewer.level = self.ceiling
+            viewer.healthy_since = now
+            viewer.last_change = now
+
+    def on_frame_sent(self, frame_id: int, now: Optional[float] = None):
+        self._sent_at[frame_id] = time.monotonic() if now is None else now
+        if len(self._sent_at) > self.max_tracked_frames:
+            self._sent_at.pop(next(iter(self._sent_at)))
+
+    def on_ack(self, connection_id: str, frame_id: int, now: Optional[float] = None):
+        viewer = self.viewers.get(connection_id)
+        sent_at = self._sent_at.get(frame_id)
+        if viewer is None or sent_at is None:
+            return
+
+        rtt = (time.monotonic() if now is None else now) - sent_at
+        viewer.ack_rtt = rtt if viewer.ack_rtt is None else viewer.ack_rtt * 0.8 + rtt * 0.2
+
+    def evaluate(self, viewer_stats: Dict[str, dict], now: Optional[float] = None) -> bool:
+        """Update viewer levels from their connection stats; return True if the stream level changed"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_evaluation < self.evaluation_interval:
+            return False
+        self._last_evaluation = now
+        previous_level = self.level
+
+        # Track viewers joining and leaving
+        for connection_id in list(self.viewers):
+            if connection_id not in viewer_stats:
+                del self.viewers[connection_id]
+
+        for connection_id, stats in viewer_stats.items():
+            if stats is None:
+                continue
+            viewer = self.viewers.get(connection_id)
+            if viewer is None:
+                viewer = self.viewers[connection_id] = ViewerState(self.ceiling, now)
+                viewer.frames_dropped = stats["frames_dropped"]
+                viewer.frames_queued = stats["frames_queued"]
+                continue
+
+            queued = stats["frames_queued"] - viewer.frames_queued
+            dropped = stats["frames_dropped"] - viewer.frames_dropped
+            viewer.frames_queued = stats["frames_queued"]
+            viewer.frames_dropped = stats["frames_dropped"]
+            drop_ratio = dropped / queued if queued else 0.0
+            send_latency = stats.get("frame_latency") or 0.0
+            ack_rtt = viewer.ack_rtt or 0.0
+
+            congested = (drop_ratio > self.max_drop_ratio
+                         or send_latency > self.max_send_latency
+                         or ack_rtt > self.max_ack_rtt)
+            healthy = (dropped == 0
+                       and send_latency < self.healthy_send_latency
+                       and ack_rtt < self.healthy_ack_rtt)
+
+            if congested:
+                viewer.healthy_since = None
+                if viewer.level > 0 and now - viewer.last_change >= self.downgrade_cooldown:
+                    viewer.level -= 1
+                    viewer.last_change = now
+                    logger.info(f"📉 Viewer {connection_id} congested (drops {drop_ratio:.0%}, "
+                                f"send {send_latency * 1000:.0f}ms, ack {ack_rtt * 1000:.0f}ms) - level {viewer.level}")
+            elif healthy:
+                if viewer.healthy_since is None:
+                    viewer.healthy_since = now
+                elif viewer.level < self.ceiling and now - viewer.healthy_since >= self.upgrade_after:
+                    viewer.level += 1
+                    viewer.last_change = now
+                    viewer.healthy_since = now
+                    logger.info(f"📈 Viewer {connection_id} healthy - level {viewer.level}")
+            else:
+                viewer.healthy_since = None
+
+        return self.level != previous_level
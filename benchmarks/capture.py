@@ -0,0 +1,104 @@
+"""Capture pipeline throughput: grab, scale, diff and encode with a synthetic screen.
+
+Calls ``ScreenCapture.capture_screen`` back to back (no FPS pacing) for each content
+mode, resolution and quality preset, so the result is the highest frame rate the
+pipeline can sustain on this machine and what each frame costs.
+
+``--codecs jpeg h264`` compares per-frame JPEG tiles with the inter-frame H.264 mode
+(needs PyAV); ``bytes_per_frame`` is the bandwidth difference.
+
+    python -m benchmarks.capture --frames 60
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from capture_backends import SyntheticBackend
+from screen_capture import ScreenCapture
+from video_encoder import VIDEO_CODECS_AVAILABLE
+
+MODES = SyntheticBackend.MODES
+RESOLUTIONS: Sequence[Tuple[int, int]] = ((1280, 720), (1920, 1080), (2560, 1440))
+PRESETS = ("low", "medium", "high")
+CODECS = ("jpeg", "h264")
+
+def benchmark_capture(mode: str, width: int, height: int, preset: str, frames: int, codec: str = "jpeg") -> Dict:
+    """Capture ``frames`` frames and return throughput and per-frame cost"""
+    capture = ScreenCapture(backend=SyntheticBackend(width, height, mode))
+    capture.apply_quality_preset(preset)
+    capture.set_codec(codec)
+
+    # The first frame is always a keyframe; measure the steady state after it
+    capture.capture_screen()
+
+    sent = keyframes = total_bytes = 0
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for _ in range(frames):
+        screen_data = capture.capture_screen()
+        if screen_data:
+            sent += 1
+            keyframes += screen_data["keyframe"]
+            total_bytes += len(screen_data["payload"])
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    capture.close()
+
+    return {
+        "codec": capture.codec,
+        "mode": mode,
+        "resolution": f"{width}x{height}",
+        "preset": preset,
+        "quality": capture.quality,
+        "scale_factor": capture.scale_factor,
+        "frames_captured": frames,
+        "frames_sent": sent,
+        "keyframes": keyframes,
+        "fps": round(frames / wall, 2),
+        "bytes_per_frame": round(total_bytes / sent) if sent else 0,
+        "cpu_ms_per_frame": round(cpu / frames * 1000, 3),
+        "wall_ms_per_frame": round(wall / frames * 1000, 3)
+    }
+
+def run(frames: int, modes: Sequence[str] = MODES, resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS,
+        presets: Sequence[str] = PRESETS, codecs: Sequence[str] = ("jpeg",)) -> List[Dict]:
+    if not VIDEO_CODECS_AVAILABLE and "h264" in codecs:
+        print("PyAV is not installed - skipping h264")
+        codecs = [codec for codec in codecs if codec != "h264"]
+
+    results = []
+    print(f"{'codec':<6} {'mode':<10} {'resolution':<10} {'preset':<7} {'fps':>8} {'sent':>5} {'bytes/frame':>12} {'cpu ms':>8}")
+    for codec in codecs:
+        for mode in modes:
+            for width, height in resolutions:
+                for preset in presets:
+                    result = benchmark_capture(mode, width, height, preset, frames, codec)
+                    results.append(result)
+                    print(f"{codec:<6} {mode:<10} {result['resolution']:<10} {preset:<7} {result['fps']:>8.1f} "
+                          f"{result['frames_sent']:>5} {result['bytes_per_frame']:>12,} {result['cpu_ms_per_frame']:>8.2f}")
+    return results
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark screen capture and encoding")
+    parser.add_argument("--frames", type=int, default=60, help="Frames per combination")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution, default=list(RESOLUTIONS),
+                        help="WIDTHxHEIGHT, e.g. 1920x1080")
+    parser.add_argument("--presets", nargs="+", default=list(PRESETS), choices=PRESETS)
+    parser.add_argument("--codecs", nargs="+", default=["jpeg"], choices=CODECS)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.frames, args.modes, args.resolutions, args.presets, args.codecs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
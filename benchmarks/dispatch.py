@@ -0,0 +1,108 @@
+"""Microbenchmark for inbound WebSocket message handling.
+
+Compares, per message type, the original path (``json.loads``, full ``WebRTCMessage``
+validation, a throwaway ``MouseEvent``/``KeyboardEvent`` and a walk down the if/elif
+chain) with ``MessageDispatcher``. Handlers are no-ops so only decoding and routing
+are measured.
+
+    python -m benchmarks.dispatch --messages 100000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from message_dispatch import MessageDispatcher, orjson
+from models import KeyboardEvent, MessageType, MouseEvent, WebRTCMessage
+
+SAMPLE_MESSAGES = {
+    MessageType.MOUSE_EVENT: {
+        "type": "mouse_event",
+        "data": {"x": 640, "y": 360, "button": "left", "action": "mousemove", "deltaY": 0, "frame_id": 1234}
+    },
+    MessageType.KEYBOARD_EVENT: {
+        "type": "keyboard_event",
+        "data": {"key": "a", "action": "keydown", "modifiers": {"ctrl": False, "alt": False, "shift": False, "meta": False}}
+    },
+    MessageType.INPUT_BATCH: {
+        "type": "input_batch",
+        "data": {"events": [
+            {"type": "mouse_event", "data": {"x": 640 + i, "y": 360, "button": "left", "action": "mousemove"}}
+            for i in range(4)
+        ]}
+    },
+    MessageType.FRAME_ACK: {"type": "frame_ack", "data": {"frame_id": 1234}},
+    MessageType.QUALITY_CHANGE: {"type": "quality_change", "data": {"quality": "medium"}},
+}
+
+# Order of the original if/elif chain in websocket_endpoint
+LEGACY_CHAIN = [
+    MessageType.CONNECTION_REQUEST,
+    MessageType.CONNECTION_APPROVE,
+    MessageType.CONNECTION_REJECT,
+    MessageType.SCREEN_SHARE,
+    MessageType.MOUSE_EVENT,
+    MessageType.KEYBOARD_EVENT,
+    MessageType.INPUT_BATCH,
+    MessageType.QUALITY_CHANGE,
+    MessageType.FRAME_ACK,
+]
+
+async def legacy_dispatch(connection_id: str, raw: str):
+    message = WebRTCMessage(**json.loads(raw))
+    for message_type in LEGACY_CHAIN:
+        if message.type == message_type:
+            if message_type == MessageType.MOUSE_EVENT:
+                MouseEvent(**message.data)
+            elif message_type == MessageType.KEYBOARD_EVENT:
+                KeyboardEvent(**message.data)
+            return
+
+def create_dispatcher() -> MessageDispatcher:
+    """A dispatcher registered the same way as main.py, with no-op handlers"""
+    dispatcher = MessageDispatcher()
+
+    async def noop(connection_id, message):
+        pass
+
+    dispatcher.register(MessageType.MOUSE_EVENT, MessageType.KEYBOARD_EVENT,
+                        MessageType.INPUT_BATCH, MessageType.FRAME_ACK, fast=True)(noop)
+    dispatcher.register(MessageType.CONNECTION_REQUEST, MessageType.CONNECTION_APPROVE,
+                        MessageType.CONNECTION_REJECT, MessageType.SCREEN_SHARE,
+                        MessageType.QUALITY_CHANGE)(noop)
+    return dispatcher
+
+async def measure(dispatch, raw: str, count: int) -> float:
+    """Return messages per second"""
+    started = time.perf_counter()
+    for _ in range(count):
+        await dispatch("benchmark", raw)
+    return count / (time.perf_counter() - started)
+
+async def run(count: int) -> List[Dict]:
+    dispatcher = create_dispatcher()
+    results = []
+    print(f"📊 {count} messages per type, JSON decoder: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'message type':<16} {'before msg/s':>14} {'after msg/s':>14} {'speedup':>8}")
+    for message_type, message in SAMPLE_MESSAGES.items():
+        raw = json.dumps(message)
+        before = await measure(legacy_dispatch, raw, count)
+        after = await measure(dispatcher.dispatch, raw, count)
+        print(f"{message_type.value:<16} {before:>14,.0f} {after:>14,.0f} {after / before:>7.1f}x")
+        results.append({
+            "message_type": message_type.value,
+            "legacy_messages_per_sec": round(before, 1),
+            "dispatcher_messages_per_sec": round(after, 1)
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inbound message dispatch")
+    parser.add_argument("--messages", type=int, default=50000, help="Messages per message type")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages))
+
+if __name__ == "__main__":
+    main()
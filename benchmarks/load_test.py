@@ -0,0 +1,276 @@
+"""Load generator: many hosts and viewers talking to a running server over /ws.
+
+Every simulated session goes through the real protocol - the host creates a session,
+clients send join_session, the host approves each connection_request_pending, then
+the host starts screen sharing. The first client controls and sends input batches
+like client.html does; the others are view-only viewers. Clients ack every frame.
+
+Measured:
+    join latency        join_session sent -> successful session_join_response
+    frame inter-arrival time between binary frames at each client, and jitter as
+                        the change between consecutive intervals
+    input round trip    input_batch sent by the client -> relayed copy received by the host
+
+Run the server on the synthetic capture backend so every session streams a changing
+screen without a display. The headless demo screen (CAPTURE_BACKEND=auto in production)
+is sent once and then only on settings changes, which leaves nothing to measure
+inter-arrival and jitter on. Turn input injection off too - otherwise every simulated
+client clicks and types into the desktop of whoever runs the server. For example
+
+    INPUT_INJECTION=false CAPTURE_BACKEND=synthetic SYNTHETIC_CAPTURE_MODE=scrolling python main.py
+    python -m benchmarks.load_test --url ws://localhost:10000/ws --sessions 200 --viewers 2 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import struct
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+import websockets
+
+FRAME_ID = struct.Struct("<I")  # frame_id sits at offset 8 of the frame header (see frame_protocol.py)
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize_ms(values: List[float]) -> Dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.5) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2) if values else None,
+        "max_ms": round(max(values) * 1000, 2) if values else None
+    }
+
+class LoadStats:
+    def __init__(self):
+        self.join_latencies: List[float] = []
+        self.frame_intervals: List[float] = []
+        self.frame_jitter: List[float] = []
+        self.input_round_trips: List[float] = []
+        self.frames_received = 0
+        self.frame_bytes = 0
+        self.inputs_sent = 0
+        self.inputs_relayed = 0
+        self.sessions_ready = 0
+        self.errors: Dict[str, int] = {}
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+class Peer:
+    """One WebSocket connection with a reader task and waiters for message types"""
+
+    def __init__(self, websocket, stats: LoadStats):
+        self.websocket = websocket
+        self.stats = stats
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._last_frame_at: Optional[float] = None
+        self._last_interval: Optional[float] = None
+        self.reader = asyncio.create_task(self._read())
+
+    async def send(self, message_type: str, data: dict):
+        await self.websocket.send(json.dumps({"type": message_type, "data": data}))
+
+    def expect(self, message_type: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[message_type] = future
+        return future
+
+    async def _read(self):
+        try:
+            async for message in self.websocket:
+                if isinstance(message, bytes):
+                    await self.on_frame(message)
+                    continue
+                message = json.loads(message)
+                if message.get("type") == "ping":
+                    # The server closes connections that miss its heartbeat
+                    await self.send("pong", message.get("data") or {})
+                    continue
+                waiter = self._waiters.pop(message.get("type"), None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(message.get("data") or {})
+                await self.on_message(message)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def on_message(self, message: dict):
+        pass
+
+    async def on_frame(self, frame: bytes):
+        now = time.monotonic()
+        self.stats.frames_received += 1
+        self.stats.frame_bytes += len(frame)
+        if self._last_frame_at is not None:
+            interval = now - self._last_frame_at
+            self.stats.frame_intervals.append(interval)
+            if self._last_interval is not None:
+                self.stats.frame_jitter.append(abs(interval - self._last_interval))
+            self._last_interval = interval
+        self._last_frame_at = now
+
+    async def close(self):
+        await self.websocket.close()
+        self.reader.cancel()
+
+class Host(Peer):
+    def __init__(self, websocket, stats: LoadStats):
+        super().__init__(websocket, stats)
+        self.input_sent_at: Dict[int, float] = {}
+
+    async def on_message(self, message: dict):
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        if message_type == "connection_request_pending":
+            await self.send("connection_approve", {"pending_id": data.get("pending_id")})
+        elif message_type == "input_batch":
+            sent_at = self.input_sent_at.pop(data.get("seq"), None)
+            if sent_at is not None:
+                self.stats.inputs_relayed += 1
+                self.stats.input_round_trips.append(time.monotonic() - sent_at)
+
+    async def on_frame(self, frame: bytes):
+        pass  # The host preview is not what viewers see; only clients are measured
+
+class Client(Peer):
+    async def on_frame(self, frame: bytes):
+        await super().on_frame(frame)
+        if len(frame) >= 12:
+            await self.send("frame_ack", {"frame_id": FRAME_ID.unpack_from(frame, 8)[0]})
+
+def input_batch(seq: int, width: int, height: int) -> dict:
+    """A frame's worth of pointer motion, with an occasional click or key press"""
+    x, y = random.randrange(width), random.randrange(height)
+    events = [{"type": "mouse_event", "data": {"x": x + i, "y": y, "button": "left", "action": "mousemove"}}
+              for i in range(random.randint(1, 3))]
+    if seq % 20 == 0:
+        for action in ("mousedown", "mouseup"):
+            events.append({"type": "mouse_event", "data": {"x": x, "y": y, "button": "left", "action": action}})
+    if seq % 50 == 0:
+        events.append({"type": "keyboard_event", "data": {"key": "a", "action": "keydown", "modifiers": {}}})
+    return {"events": events, "seq": seq}
+
+async def run_session(index: int, args, stats: LoadStats, stop: asyncio.Event):
+    peers: List[Peer] = []
+    try:
+        host = Host(await websockets.connect(args.url, max_size=None), stats)
+        peers.append(host)
+        created = host.expect("session_created")
+        await host.send("connection_request", {"action": "create_session", "password": None})
+        session_id = (await asyncio.wait_for(created, args.timeout))["session_id"]
+
+        clients = []
+        for _ in range(1 + args.viewers):
+            client = Client(await websockets.connect(args.url, max_size=None), stats)
+            peers.append(client)
+            joined = client.expect("session_join_response")
+            started = time.monotonic()
+            await client.send("connection_request", {"action": "join_session", "session_id": session_id,
+                                                     "user_agent": "load-test"})
+            response = await asyncio.wait_for(joined, args.timeout)
+            if not response.get("success"):
+                stats.error(f"join: {response.get('error')}")
+                return
+            stats.join_latencies.append(time.monotonic() - started)
+            clients.append(client)
+
+        sharing = host.expect("sharing_started")
+        await host.send("screen_share", {"action": "start", "quality": args.quality})
+        await asyncio.wait_for(sharing, args.timeout)
+        stats.sessions_ready += 1
+
+        # The first client controls the host; send input batches until the run ends
+        controller = clients[0]
+        seq = index * 1_000_000
+        interval = 1.0 / args.input_rate
+        while not stop.is_set():
+            seq += 1
+            host.input_sent_at[seq] = time.monotonic()
+            await controller.send("input_batch", input_batch(seq, 1280, 720))
+            stats.inputs_sent += 1
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    except asyncio.TimeoutError:
+        stats.error("timeout")
+    except (OSError, websockets.WebSocketException) as e:
+        stats.error(type(e).__name__)
+    finally:
+        await stop.wait()
+        for peer in peers:
+            await peer.close()
+
+async def run(args) -> Dict:
+    stats = LoadStats()
+    stop = asyncio.Event()
+
+    # Spread session start-up over the ramp period instead of connecting all at once
+    tasks = []
+    for index in range(args.sessions):
+        tasks.append(asyncio.create_task(run_session(index, args, stats, stop)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.sessions)
+
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    viewers = args.sessions * (1 + args.viewers)
+    report = {
+        "sessions": args.sessions,
+        "sessions_ready": stats.sessions_ready,
+        "clients_per_session": 1 + args.viewers,
+        "duration_s": args.duration,
+        "join_latency": summarize_ms(stats.join_latencies),
+        "frame_inter_arrival": summarize_ms(stats.frame_intervals),
+        "frame_jitter": summarize_ms(stats.frame_jitter),
+        "frames_received": stats.frames_received,
+        "fps_per_client": round(stats.frames_received / args.duration / viewers, 2),
+        "megabytes_received": round(stats.frame_bytes / 1e6, 2),
+        "input_round_trip": summarize_ms(stats.input_round_trips),
+        "inputs_sent": stats.inputs_sent,
+        "inputs_relayed": stats.inputs_relayed,
+        "errors": stats.errors
+    }
+    return report
+
+def injects_input(url: str) -> bool:
+    """Ask the server's /health endpoint whether it drives the real mouse and keyboard"""
+    base = url.replace("wss://", "https://", 1).replace("ws://", "http://", 1).rsplit("/ws", 1)[0]
+    with urllib.request.urlopen(f"{base}/health", timeout=5) as response:
+        return bool(json.load(response).get("input_injection"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many hosts and viewers against a running server")
+    parser.add_argument("--url", default="ws://localhost:10000/ws")
+    parser.add_argument("--sessions", type=int, default=50, help="Hosts, each with its own session")
+    parser.add_argument("--viewers", type=int, default=1, help="View-only viewers per session besides the controlling client")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run after start-up begins")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which sessions are started")
+    parser.add_argument("--input-rate", type=float, default=30.0, help="Input batches per second per controlling client")
+    parser.add_argument("--quality", default="medium", choices=("low", "medium", "high"))
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for each handshake step")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--allow-input-injection", action="store_true",
+                        help="Run even though the server injects the simulated input into its desktop")
+    args = parser.parse_args()
+
+    if not args.allow_input_injection and injects_input(args.url):
+        parser.error("the server injects input into its desktop - restart it with INPUT_INJECTION=false")
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""ConnectionManager relay throughput with simulated WebSocket clients.
+
+Builds sessions of one host, one controlling client and optional viewers on in-memory
+sockets, then measures:
+
+    input  - client -> host relays of mouse events (JSON encode + queue + send)
+    frames - one encoded frame fanned out to the host preview and every viewer
+
+Sockets can add a per-send delay to model slow clients; frames that are still queued
+when a newer one arrives are dropped by the outbound channel, and that shows up in
+the ``frames_dropped`` column.
+
+    python -m benchmarks.relay --sessions 50 --viewers 2
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from websocket_manager import ConnectionManager
+
+class SimulatedWebSocket:
+    """In-memory stand-in for a Starlette WebSocket that counts what it is sent"""
+
+    def __init__(self, send_delay: float = 0.0):
+        self.send_delay = send_delay
+        self.messages = 0
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.messages += 1
+        self.bytes += len(text)
+
+    async def send_bytes(self, data: bytes):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.frames += 1
+        self.bytes += len(data)
+
+async def create_sessions(manager: ConnectionManager, sessions: int, viewers: int, send_delay: float) -> List[Dict]:
+    """Create sessions through the same calls the /ws handlers make"""
+    created = []
+    for _ in range(sessions):
+        host_id = await manager.connect(SimulatedWebSocket(send_delay))
+        session_id = await manager.create_session(host_id)
+        members = []
+        for _ in range(1 + viewers):
+            client_id = await manager.connect(SimulatedWebSocket(send_delay))
+            pending_id = await manager.request_join_session(session_id, client_id, {})
+            await manager.approve_connection(pending_id)
+            members.append(client_id)
+        created.append({"host_id": host_id, "client_id": members[0], "viewer_ids": members[1:]})
+    return created
+
+async def wait_until_drained(manager: ConnectionManager, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(channel.messages.empty() and channel.frame is None for channel in manager.channels.values()):
+            return
+        await asyncio.sleep(0.001)
+
+def close_all(manager: ConnectionManager):
+    for connection_id in list(manager.active_connections):
+        manager.disconnect(connection_id)
+
+async def benchmark_input_relay(sessions: int, viewers: int, messages: int, send_delay: float) -> Dict:
+    manager = ConnectionManager()
+    created = await create_sessions(manager, sessions, viewers, send_delay)
+    message = {"type": "mouse_event", "data": {"x": 640, "y": 360, "button": "left", "action": "mousemove"}}
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for _ in range(messages):
+        for session in created:
+            await manager.relay_message(message, session["client_id"])
+    await wait_until_drained(manager)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    relayed = messages * sessions
+    close_all(manager)
+    return {
+        "benchmark": "input",
+        "sessions": sessions,
+        "viewers_per_session": viewers,
+        "send_delay_ms": send_delay * 1000,
+        "messages": relayed,
+        "messages_per_sec": round(relayed / wall, 1),
+        "cpu_us_per_message": round(cpu / relayed * 1e6, 2)
+    }
+
+async def benchmark_frame_fanout(sessions: int, viewers: int, frames: int, frame_bytes: int, send_delay: float) -> Dict:
+    manager = ConnectionManager()
+    created = await create_sessions(manager, sessions, viewers, send_delay)
+    payload = bytes(frame_bytes)
+    recipients = [manager.get_stream_recipients(session["host_id"]) for session in created]
+
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for frame_number in range(frames):
+        for session_recipients in recipients:
+            manager.broadcast_bytes(payload, session_recipients, keyframe=frame_number == 0)
+        await asyncio.sleep(0)  # Let the senders run, as the streaming loop does between frames
+    await wait_until_drained(manager)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    stats = [manager.get_connection_stats(connection_id) for connection_id in manager.active_connections]
+    frames_sent = sum(s["frames_sent"] for s in stats)
+    frames_dropped = sum(s["frames_dropped"] for s in stats)
+    close_all(manager)
+    return {
+        "benchmark": "frames",
+        "sessions": sessions,
+        "viewers_per_session": viewers,
+        "send_delay_ms": send_delay * 1000,
+        "frame_bytes": frame_bytes,
+        "frames_queued": frames * sum(len(r) for r in recipients),
+        "frames_sent": frames_sent,
+        "frames_dropped": frames_dropped,
+        "frames_per_sec": round(frames_sent / wall, 1),
+        "megabytes_per_sec": round(frames_sent * frame_bytes / wall / 1e6, 2),
+        "cpu_us_per_frame": round(cpu / max(frames_sent, 1) * 1e6, 2)
+    }
+
+async def run(sessions: int, viewers: int, messages: int, frames: int, frame_bytes: int,
+              send_delay: float) -> List[Dict]:
+    results = [
+        await benchmark_input_relay(sessions, viewers, messages, send_delay),
+        await benchmark_frame_fanout(sessions, viewers, frames, frame_bytes, send_delay),
+    ]
+    for result in results:
+        print(json.dumps(result))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ConnectionManager relay and frame fan-out")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--viewers", type=int, default=2, help="View-only viewers per session")
+    parser.add_argument("--messages", type=int, default=1000, help="Input messages per session")
+    parser.add_argument("--frames", type=int, default=200, help="Frames per session")
+    parser.add_argument("--frame-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--send-delay", type=float, default=0.0, help="Seconds each simulated send takes")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sessions, args.viewers, args.messages, args.frames,
+                              args.frame_bytes, args.send_delay))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Run every benchmark and write one JSON report to compare across commits.
+
+    python -m benchmarks.run --output reports/$(git rev-parse --short HEAD).json
+    python -m benchmarks.run --quick   # smaller matrix for a fast sanity check
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+
+from benchmarks import capture, dispatch, relay
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the capture, relay and dispatch benchmarks")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report path")
+    parser.add_argument("--quick", action="store_true", help="One resolution and fewer iterations")
+    args = parser.parse_args()
+
+    if args.quick:
+        capture_results = capture.run(frames=15, resolutions=[(1280, 720)])
+        relay_results = asyncio.run(relay.run(sessions=5, viewers=1, messages=200, frames=50,
+                                              frame_bytes=64 * 1024, send_delay=0.0))
+        dispatch_results = asyncio.run(dispatch.run(5000))
+    else:
+        capture_results = capture.run(frames=60, codecs=capture.CODECS)
+        relay_results = asyncio.run(relay.run(sessions=20, viewers=2, messages=1000, frames=200,
+                                              frame_bytes=64 * 1024, send_delay=0.0))
+        relay_results += asyncio.run(relay.run(sessions=20, viewers=2, messages=200, frames=200,
+                                               frame_bytes=64 * 1024, send_delay=0.005))
+        dispatch_results = asyncio.run(dispatch.run(50000))
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "quick": args.quick,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count()
+        },
+        "capture": capture_results,
+        "relay": relay_results,
+        "dispatch": dispatch_results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
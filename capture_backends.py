@@ -0,0 +1,188 @@
+"""Screen capture backends.
+
+Every backend returns frames as ``(height, width, 3)`` RGB ``uint8`` NumPy arrays.
+Backends that reuse buffers alternate between two of them, so a returned frame stays
+valid until the next-but-one ``grab()`` call - long enough for ScreenCapture to diff
+the current frame against the previous one without copying either.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import ImageGrab
+
+logger = logging.getLogger(__name__)
+
+class CaptureBackend:
+    """Base class for screen capture backends"""
+
+    name = "base"
+
+    def size(self) -> Tuple[int, int]:
+        """Return the (width, height) of the captured screen"""
+        raise NotImplementedError
+
+    def grab(self) -> np.ndarray:
+        """Capture the screen as an RGB array"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class PILBackend(CaptureBackend):
+    """PIL ImageGrab - portable, allocates a new image per frame"""
+
+    name = "pil"
+
+    def __init__(self):
+        self._size: Optional[Tuple[int, int]] = None
+
+    def size(self) -> Tuple[int, int]:
+        if self._size is None:
+            self.grab()
+        return self._size
+
+    def grab(self) -> np.ndarray:
+        screenshot = ImageGrab.grab()
+        if screenshot.mode != "RGB":
+            screenshot = screenshot.convert("RGB")
+        self._size = screenshot.size
+        return np.asarray(screenshot)
+
+class PyAutoGUIBackend(CaptureBackend):
+    """pyautogui.screenshot() - the original capture path, screen size queried once"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+        self._size = tuple(pyautogui.size())
+
+    def size(self) -> Tuple[int, int]:
+        return self._size
+
+    def grab(self) -> np.ndarray:
+        screenshot = self._pyautogui.screenshot()
+        if screenshot.mode != "RGB":
+            screenshot = screenshot.convert("RGB")
+        self._size = screenshot.size
+        return np.asarray(screenshot)
+
+class MSSBackend(CaptureBackend):
+    """mss - X11 shared memory (XShm) on Linux, reusing its buffers between frames"""
+
+    name = "mss"
+
+    def __init__(self, monitor: int = 1):
+        import mss
+        self._sct = mss.mss()
+        self._monitor = dict(self._sct.monitors[monitor])
+        width, height = self._monitor["width"], self._monitor["height"]
+        self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._index = 0
+
+    def size(self) -> Tuple[int, int]:
+        return self._monitor["width"], self._monitor["height"]
+
+    def grab(self) -> np.ndarray:
+        shot = self._sct.grab(self._monitor)
+        bgra = np.frombuffer(shot.bgra, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+        buffer = self._buffers[self._index]
+        if buffer.shape[:2] != bgra.shape[:2]:
+            # Resolution changed - reallocate once
+            buffer = np.empty((shot.height, shot.width, 3), dtype=np.uint8)
+            self._buffers = [buffer, np.empty_like(buffer)]
+            self._index = 0
+            self._monitor["width"], self._monitor["height"] = shot.width, shot.height
+
+        np.copyto(buffer, bgra[:, :, 2::-1])
+        self._index ^= 1
+        return buffer
+
+    def close(self):
+        self._sct.close()
+
+class SyntheticBackend(CaptureBackend):
+    """Generated content for tests and benchmarks, no display needed.
+
+    Modes:
+        static     - the same frame every time
+        scrolling  - text-like content moving up a few pixels per frame
+        video      - every pixel changes every frame
+    """
+
+    name = "synthetic"
+    MODES = ("static", "scrolling", "video")
+
+    def __init__(self, width: int = 1920, height: int = 1080, mode: str = "static", scroll_speed: int = 8):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown synthetic capture mode: {mode}")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.scroll_speed = scroll_speed
+        self.frame_number = 0
+
+        # Twice the screen height so scrolling is a sliding window without wrap-around copies
+        self._content = self._render_content(width, height * 2)
+        self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._index = 0
+
+    @staticmethod
+    def _render_content(width: int, height: int) -> np.ndarray:
+        """Dark background with light 'text lines' made of word-sized blocks"""
+        rng = np.random.default_rng(1234)
+        content = np.full((height, width, 3), (44, 62, 80), dtype=np.uint8)
+        line_height, glyph_height = 24, 14
+        for top in range(8, height - line_height, line_height):
+            x = 16
+            while x < width - 16:
+                word = int(rng.integers(20, 120))
+                content[top:top + glyph_height, x:min(x + word, width - 16)] = (236, 240, 241)
+                x += word + int(rng.integers(8, 20))
+        return content
+
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def grab(self) -> np.ndarray:
+        buffer = self._buffers[self._index]
+        self._index ^= 1
+
+        if self.mode == "static":
+            np.copyto(buffer, self._content[:self.height])
+        elif self.mode == "scrolling":
+            offset = (self.frame_number * self.scroll_speed) % self.height
+            np.copyto(buffer, self._content[offset:offset + self.height])
+        else:
+            np.add(self._content[:self.height], np.uint8(self.frame_number * 7 % 256), out=buffer)
+
+        self.frame_number += 1
+        return buffer
+
+BACKENDS = {
+    MSSBackend.name: MSSBackend,
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    PILBackend.name: PILBackend,
+    SyntheticBackend.name: SyntheticBackend,
+}
+
+def create_backend(name: str = "auto", **options) -> CaptureBackend:
+    """Create a capture backend by name; "auto" picks the fastest one that works here"""
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown capture backend: {name}")
+        return BACKENDS[name](**options)
+
+    for backend_class in (MSSBackend, PyAutoGUIBackend, PILBackend):
+        try:
+            backend = backend_class()
+            logger.info(f"🎥 Using {backend.name} capture backend")
+            return backend
+        except Exception as e:
+            logger.warning(f"⚠️ {backend_class.name} capture backend unavailable: {e}")
+
+    raise RuntimeError("No screen capture backend available")
@@ -24,7 +24,41 @@ class Settings:
     
     # WebSocket settings
     WS_MAX_SIZE: int = 16 * 1024 * 1024  # 16MB
-    WS_PING_INTERVAL: int = 20
-    WS_PING_TIMEOUT: int = 10
+    WS_PING_INTERVAL: int = int(os.getenv("WS_PING_INTERVAL", 20))  # Seconds between heartbeat pings
+    WS_PING_TIMEOUT: int = int(os.getenv("WS_PING_TIMEOUT", 10))  # Seconds past a missed ping before the connection is closed
+    MAX_CONNECTIONS: int = int(os.getenv("MAX_CONNECTIONS", 2000))  # Per worker; further connections are refused
+    WS_SEND_QUEUE_SIZE: int = 256  # Control messages buffered per connection before senders wait
+    
+    # Screen capture settings
+    CAPTURE_BACKEND: str = os.getenv("CAPTURE_BACKEND", "auto")  # auto, mss, pyautogui, pil or synthetic
+    INPUT_INJECTION: bool = os.getenv("INPUT_INJECTION", "true").lower() == "true"  # false: accept input but never touch the local mouse and keyboard
+    SYNTHETIC_CAPTURE_MODE: str = os.getenv("SYNTHETIC_CAPTURE_MODE", "static")  # static, scrolling or video
+    SYNTHETIC_CAPTURE_WIDTH: int = int(os.getenv("SYNTHETIC_CAPTURE_WIDTH", 1920))
+    SYNTHETIC_CAPTURE_HEIGHT: int = int(os.getenv("SYNTHETIC_CAPTURE_HEIGHT", 1080))
+    STREAM_CODEC: str = os.getenv("STREAM_CODEC", "jpeg")  # jpeg, or h264 (needs PyAV, and WebCodecs in every viewer)
+    # Offer viewers a WebRTC video track (needs aiortc). Each viewer's peer runs its own
+    # encoder and frame conversion, unlike the encode-once WebSocket fan-out, so CPU grows per viewer
+    WEBRTC_MEDIA: bool = os.getenv("WEBRTC_MEDIA", "false").lower() == "true"
+    WEBRTC_ICE_SERVERS: list = [url for url in os.getenv("WEBRTC_ICE_SERVERS", "").split(",") if url]  # None needed on a LAN
+    
+    # Logging - per-event messages are DEBUG records on the input, messages and frames categories
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_CATEGORY_LEVELS: str = os.getenv("LOG_CATEGORY_LEVELS", "input=WARNING,messages=WARNING,frames=WARNING")
+    LOG_RATE_LIMITS: str = os.getenv("LOG_RATE_LIMITS", "input=20,messages=20,frames=5")  # Records per second per category
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Records waiting for the writer thread before new ones are dropped
+    
+    # Workers - more than one needs the shared SQLite store and the Unix-socket bus between workers
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", 1))  # Also read by gunicorn
+    SESSION_STORE: str = os.getenv("SESSION_STORE", "sqlite" if WORKERS > 1 else "memory")  # memory or sqlite
+    SESSION_STORE_PATH: str = os.getenv("SESSION_STORE_PATH", "/tmp/remote_desktop/sessions.db")
+    WORKER_SOCKET_DIR: str = os.getenv("WORKER_SOCKET_DIR", "/tmp/remote_desktop/workers")
+    
+    # Session settings
+    MAX_VIEWERS_PER_SESSION: int = int(os.getenv("MAX_VIEWERS_PER_SESSION", 10))  # View-only observers besides the controlling client
+    MAX_SESSIONS: int = int(os.getenv("MAX_SESSIONS", 500))  # Per worker
+    PENDING_REQUEST_TTL: int = int(os.getenv("PENDING_REQUEST_TTL", 120))  # Seconds a join request waits for the host
+    SESSION_IDLE_TTL: int = int(os.getenv("SESSION_IDLE_TTL", 1800))  # Seconds a session may sit with no clients and no stream
+    CONNECTION_IDLE_TTL: int = int(os.getenv("CONNECTION_IDLE_TTL", 600))  # Seconds a connection may stay outside any session
+    REAPER_INTERVAL: int = int(os.getenv("REAPER_INTERVAL", 5))  # Seconds between expiry sweeps and heartbeat checks
 
 settings = Settings()
@@ -0,0 +1,94 @@
+"""Binary WebSocket protocol for screen frames.
+
+Each frame is sent as a single binary message so that encoded images travel
+as raw bytes instead of base64 text inside JSON. Control messages stay JSON.
+
+Layout (little endian):
+
+    Frame header (24 bytes)
+        magic         2s   b"RD"
+        version       B
+        codec         B    see CODEC_*
+        flags         B    see FLAG_*
+        (padding)     x
+        tile_count    H
+        frame_id      I
+        actual_width  H    host screen size
+        actual_height H
+        canvas_width  H    size of the scaled frame
+        canvas_height H
+        scale_factor  f
+
+    Followed by tile_count tiles, each with a 12 byte header
+        x, y          H H  position on the canvas
+        width, height H H
+        length        I    number of encoded bytes that follow
+
+A keyframe carries a single tile covering the whole canvas.
+
+CODEC_H264 frames always carry that single full-canvas tile: one Annex B access
+unit from the inter-frame encoder. Its keyframe flag marks an IDR frame, which
+also carries the SPS/PPS a decoder needs to start.
+"""
+
+import struct
+from typing import List, Tuple
+
+MAGIC = b"RD"
+VERSION = 1
+
+CODEC_JPEG = 1
+CODEC_H264 = 2
+
+FLAG_KEYFRAME = 0x01
+
+FRAME_HEADER = struct.Struct("<2sBBBxHIHHHHf")
+TILE_HEADER = struct.Struct("<HHHHI")
+
+# (x, y, width, height, encoded bytes)
+Tile = Tuple[int, int, int, int, bytes]
+
+
+def encode_frame(frame_id: int, screen_info: dict, tiles: List[Tile],
+                 keyframe: bool = False, codec: int = CODEC_JPEG) -> bytes:
+    """Pack a frame header and its tiles into one binary message"""
+    flags = FLAG_KEYFRAME if keyframe else 0
+    parts = [FRAME_HEADER.pack(
+        MAGIC, VERSION, codec, flags, len(tiles), frame_id & 0xFFFFFFFF,
+        screen_info["actual_screen_width"], screen_info["actual_screen_height"],
+        screen_info["canvas_width"], screen_info["canvas_height"],
+        screen_info["scale_factor"]
+    )]
+    for x, y, width, height, data in tiles:
+        parts.append(TILE_HEADER.pack(x, y, width, height, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_frame(payload: bytes) -> dict:
+    """Unpack a binary frame message (used by tools and tests; browsers decode it in JS)"""
+    (magic, version, codec, flags, tile_count, frame_id, actual_width, actual_height,
+     canvas_width, canvas_height, scale_factor) = FRAME_HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported frame header: {magic!r} v{version}")
+
+    view = memoryview(payload)
+    offset = FRAME_HEADER.size
+    tiles = []
+    for _ in range(tile_count):
+        x, y, width, height, length = TILE_HEADER.unpack_from(payload, offset)
+        offset += TILE_HEADER.size
+        tiles.append((x, y, width, height, view[offset:offset + length]))
+        offset += length
+
+    return {
+        "frame_id": frame_id,
+        "codec": codec,
+        "keyframe": bool(flags & FLAG_KEYFRAME),
+        "actual_screen_width": actual_width,
+        "actual_screen_height": actual_height,
+        "canvas_width": canvas_width,
+        "canvas_height": canvas_height,
+        "scale_factor": scale_factor,
+        "tiles": tiles
+    }
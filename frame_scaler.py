@@ -0,0 +1,47 @@
+import math
+from typing import Optional, Tuple
+
+from PIL import Image
+
+class FrameScaler:
+    """Scale captured frames for streaming.
+
+    Real-time frames use the cheapest filter that looks acceptable: ``Image.reduce`` (a box
+    filter implemented in C) for integer factors such as 0.5, otherwise bilinear with a
+    reducing gap. LANCZOS is reserved for refinement frames sent once the screen is idle.
+    Output geometry is computed once per (resolution, scale) and reused every frame.
+    """
+
+    def __init__(self, reducing_gap: float = 2.0):
+        self.reducing_gap = reducing_gap
+        self._geometry_key: Optional[Tuple[int, int, float]] = None
+        self._size: Tuple[int, int] = (0, 0)
+        self._reduce_factor = 0
+
+    def geometry(self, width: int, height: int, scale_factor: float) -> Tuple[int, int]:
+        """Return the scaled (width, height) for a source size"""
+        key = (width, height, scale_factor)
+        if key != self._geometry_key:
+            inverse = 1.0 / scale_factor
+            factor = round(inverse)
+            if factor > 1 and abs(inverse - factor) < 1e-6:
+                # Image.reduce rounds partial blocks up
+                self._reduce_factor = factor
+                self._size = (math.ceil(width / factor), math.ceil(height / factor))
+            else:
+                self._reduce_factor = 0
+                self._size = (max(1, int(width * scale_factor)), max(1, int(height * scale_factor)))
+            self._geometry_key = key
+        return self._size
+
+    def scale(self, image: Image.Image, scale_factor: float, refine: bool = False) -> Image.Image:
+        """Scale a frame; refine=True trades speed for LANCZOS quality"""
+        if scale_factor == 1.0:
+            return image
+
+        size = self.geometry(image.width, image.height, scale_factor)
+        if refine:
+            return image.resize(size, Image.Resampling.LANCZOS)
+        if self._reduce_factor:
+            return image.reduce(self._reduce_factor)
+        return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=self.reducing_gap)
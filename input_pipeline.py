@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+from models import MessageType
+from logging_setup import get_category_logger
+from metrics import INPUT_LATENCY_SECONDS
+
+logger = get_category_logger("input")  # Per-event warnings are rate limited
+
+class InputEvent:
+    """One queued mouse or keyboard event"""
+    __slots__ = ("kind", "data", "source_id", "context", "received_at")
+
+    def __init__(self, kind: MessageType, data: dict, source_id: str, context: Any, received_at: float):
+        self.kind = kind
+        self.data = data
+        self.source_id = source_id
+        self.context = context  # Passed to the handler, e.g. the session's screen capture
+        self.received_at = received_at
+
+class InputPipeline:
+    """Queue input events, coalesce them and inject them in order on a dedicated thread.
+
+    Consecutive mouse moves from the same client collapse to the latest position and
+    consecutive wheel events collapse to one event with the summed delta, so a burst of
+    pointer motion costs one injection instead of dozens. Clicks and keys are never merged.
+
+    Injection (pyautogui sleeps ``PAUSE`` after every call) runs on a single worker thread,
+    so it never blocks the event loop while events are still applied in arrival order.
+    """
+
+    def __init__(self, handlers: Dict[MessageType, Callable[[dict, Any], bool]], slow_event_threshold: float = 0.05):
+        self.handlers = handlers
+        self.slow_event_threshold = slow_event_threshold  # Seconds before an injection is logged as slow
+        self._pending: Deque[InputEvent] = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # Counters and timings
+        self.events_received = 0
+        self.events_coalesced = 0
+        self.events_injected = 0
+        self.events_failed = 0
+        self.queue_latency: Optional[float] = None  # Smoothed receive -> injection start
+        self.injection_time: Optional[float] = None  # Smoothed duration of one injection
+        self.max_injection_time = 0.0
+
+    def submit(self, kind: MessageType, data: dict, source_id: str, context: Any = None):
+        """Queue one event; never blocks the caller"""
+        with self._condition:
+            self.events_received += 1
+            if self._coalesce(kind, data, source_id):
+                self.events_coalesced += 1
+            else:
+                self._pending.append(InputEvent(kind, data, source_id, context, time.monotonic()))
+                self._condition.notify()
+        self._ensure_worker()
+
+    def submit_batch(self, events: Iterable[dict], source_id: str, context: Any = None):
+        """Queue the events of an input_batch message, in order"""
+        for event in events:
+            try:
+                kind = MessageType(event.get("type"))
+            except ValueError:
+                continue
+            if kind in self.handlers and isinstance(event.get("data"), dict):
+                self.submit(kind, event["data"], source_id, context)
+
+    def _coalesce(self, kind: MessageType, data: dict, source_id: str) -> bool:
+        """Merge the event into the newest queued one if possible (caller holds the lock)"""
+        if not self._pending or kind != MessageType.MOUSE_EVENT:
+            return False
+
+        last = self._pending[-1]
+        if last.kind != kind or last.source_id != source_id:
+            return False
+
+        action = data.get("action")
+        if action != last.data.get("action"):
+            return False
+
+        if action == "mousemove":
+            last.data = data
+            return True
+        if action == "wheel":
+            merged = dict(data)
+            merged["deltaY"] = (last.data.get("deltaY") or 0) + (data.get("deltaY") or 0)
+            last.data = merged
+            return True
+        return False
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="input-injection", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the worker thread once the queued events are injected"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _inject(self, event: InputEvent):
+        started = time.monotonic()
+        try:
+            success = self.handlers[event.kind](event.data, event.context)
+        except Exception as e:
+            logger.error(f"❌ Input injection error: {e}")
+            success = False
+        finished = time.monotonic()
+
+        waited = started - event.received_at
+        duration = finished - started
+        self.queue_latency = waited if self.queue_latency is None else self.queue_latency * 0.9 + waited * 0.1
+        self.injection_time = duration if self.injection_time is None else self.injection_time * 0.9 + duration * 0.1
+        self.max_injection_time = max(self.max_injection_time, duration)
+        INPUT_LATENCY_SECONDS.observe(finished - event.received_at, type=event.kind.value)
+
+        if success:
+            self.events_injected += 1
+        else:
+            self.events_failed += 1
+            logger.warning(f"❌ Failed to execute {event.kind.value}: {event.data}")
+
+        if duration > self.slow_event_threshold:
+            logger.warning("🐢 %s %s took %.0fms to inject", event.kind.value, event.data.get("action"), duration * 1000)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and self._running:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                event = self._pending.popleft()
+            self._inject(event)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "events_received": self.events_received,
+            "events_coalesced": self.events_coalesced,
+            "events_injected": self.events_injected,
+            "events_failed": self.events_failed,
+            "queue_latency_ms": round(self.queue_latency * 1000, 2) if self.queue_latency is not None else None,
+            "injection_time_ms": round(self.injection_time * 1000, 2) if self.injection_time is not None else None,
+            "max_injection_time_ms": round(self.max_injection_time * 1000, 2)
+        }
@@ -0,0 +1,132 @@
+"""Non-blocking logging.
+
+Records are filtered and queued on the calling thread and written to stdout by a
+background listener thread, so the event loop, the capture thread and the input
+thread never wait on terminal or pipe I/O.
+
+Per-event messages (input, per-message relays, per-frame capture details) go to
+category loggers (``remote_desktop.<category>``) at DEBUG, so a disabled category
+costs one cached level check. Categories have their own levels and a records-per-
+second limit (errors are never limited); excess records are dropped and counted in
+the next record let through.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from config import settings
+
+CATEGORY_PREFIX = "remote_desktop."
+
+def get_category_logger(category: str) -> logging.Logger:
+    """Logger for a hot-path category (input, messages or frames)"""
+    return logging.getLogger(CATEGORY_PREFIX + category)
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parse "input=DEBUG,frames=WARNING" into a dict"""
+    mapping = {}
+    for item in value.split(","):
+        key, sep, val = item.partition("=")
+        if sep and key.strip():
+            mapping[key.strip()] = val.strip()
+    return mapping
+
+class RateLimitFilter(logging.Filter):
+    """Let at most N records per second through for each limited category"""
+
+    def __init__(self, limits: Dict[str, int]):
+        super().__init__()
+        self.limits = limits
+        self._windows: Dict[str, list] = {}  # category -> [window start, count, suppressed]
+        self.suppressed_total = 0
+        self._lock = threading.Lock()  # Records are filtered on whichever thread logs them
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = record.name[len(CATEGORY_PREFIX):] if record.name.startswith(CATEGORY_PREFIX) else record.name
+        limit = self.limits.get(category)
+        if limit is None or record.levelno >= logging.ERROR:
+            return True
+
+        suppressed = 0
+        with self._lock:
+            now = time.monotonic()
+            window = self._windows.get(category)
+            if window is None:
+                window = self._windows[category] = [now, 0, 0]
+            elif now - window[0] >= 1.0:
+                suppressed = window[2]
+                window[:] = [now, 0, 0]
+
+            if window[1] >= limit:
+                window[2] += 1
+                self.suppressed_total += 1
+                return False
+            window[1] += 1
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar suppressed)"
+            record.args = None
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of raising when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+_rate_limiter: Optional[RateLimitFilter] = None
+
+def setup_logging():
+    """Route the root logger through the background writer; safe to call more than once"""
+    global _listener, _handler, _rate_limiter
+    if _handler is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _rate_limiter = RateLimitFilter({
+        category: int(limit) for category, limit in _parse_mapping(settings.LOG_RATE_LIMITS).items()
+        if limit.isdigit()
+    })
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _handler.addFilter(_rate_limiter)
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL.upper())
+    root.addHandler(_handler)
+    for category, level in _parse_mapping(settings.LOG_CATEGORY_LEVELS).items():
+        get_category_logger(category).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Write out queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def logging_stats() -> dict:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped_queue_full": _handler.dropped if _handler else 0,
+        "suppressed_rate_limited": _rate_limiter.suppressed_total if _rate_limiter else 0
+    }
@@ -1,11 +1,12 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-import json
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import asyncio
 import logging
 import os
+import socket
+from typing import Optional, Tuple
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
@@ -15,25 +16,41 @@ import time
 
 # Import your modules
 from websocket_manager import manager
-from screen_capture import screen_capture
-from models import WebRTCMessage, MessageType, MouseEvent, KeyboardEvent
+from screen_capture import ScreenCapture
+from models import WebRTCMessage, MessageType
 from config import settings
+from input_pipeline import InputPipeline
+from message_dispatch import MessageDispatcher
+from logging_setup import setup_logging, get_category_logger, logging_stats, shutdown_logging
+from webrtc_media import MediaGateway, WEBRTC_AVAILABLE
+from session_store import create_store
+from worker_bus import WorkerBus
+from message_dispatch import encode_json
+import metrics
+
+# Log through the background writer thread - per-event messages are rate limited DEBUG records
+setup_logging()
+logger = logging.getLogger(__name__)
+input_logger = get_category_logger("input")
 
 # ✅ FIX: Handle pyautogui for headless environment
 pyautogui = None
-try:
-    # Set display for headless environment
-    if os.getenv('ENVIRONMENT') == 'production':
-        os.environ['DISPLAY'] = ':99'  # Virtual display
-    
-    import pyautogui
-    pyautogui.FAILSAFE = False
-    pyautogui.PAUSE = 0.01
-    logger.info("✅ PyAutoGUI loaded successfully")
-except Exception as e:
-    logger.warning(f"⚠️ PyAutoGUI not available: {e}")
-    logger.info("Running in headless mode - mouse/keyboard control disabled")
-    pyautogui = None
+if settings.INPUT_INJECTION:
+    try:
+        # Set display for headless environment
+        if os.getenv('ENVIRONMENT') == 'production':
+            os.environ['DISPLAY'] = ':99'  # Virtual display
+        
+        import pyautogui
+        pyautogui.FAILSAFE = False
+        pyautogui.PAUSE = 0.01
+        logger.info("✅ PyAutoGUI loaded successfully")
+    except Exception as e:
+        logger.warning(f"⚠️ PyAutoGUI not available: {e}")
+        logger.info("Running in headless mode - mouse/keyboard control disabled")
+        pyautogui = None
+else:
+    logger.info("🚫 Input injection disabled (INPUT_INJECTION=false) - mouse/keyboard events are only simulated")
 
 app = FastAPI(
     title="Remote Desktop WebApp",
@@ -87,14 +104,29 @@ async def startup_event():
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Debug mode: {settings.DEBUG}")
     logger.info(f"Port: {settings.PORT}")
+    
+    # Sessions stay on their host's worker; siblings route to them through the store and bus
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    store = create_store(settings.SESSION_STORE, settings.SESSION_STORE_PATH)
+    bus = WorkerBus(worker_id, settings.WORKER_SOCKET_DIR) if settings.SESSION_STORE != "memory" else None
+    await manager.start_cluster(worker_id, store, bus, dispatcher.dispatch, handle_remote_disconnect)
+    logger.info(f"🔀 Worker {worker_id} using the {settings.SESSION_STORE} session store")
+    manager.start_reaper()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("🛑 Remote Desktop WebApp shutting down")
-    try:
-        screen_capture.stop_streaming()
-    except Exception as e:
-        logger.error(f"Error stopping screen capture: {e}")
+    manager.stop_reaper()
+    for session in list(manager.sessions.values()):
+        try:
+            if session.capture is not None:
+                session.capture.close()
+        except Exception as e:
+            logger.error(f"Error stopping screen capture: {e}")
+    await media_gateway.close_all()
+    await manager.stop_cluster()
+    input_pipeline.close()
+    shutdown_logging()
 
 @app.get("/", response_class=HTMLResponse)
 async def get_landing_page(request: Request):
@@ -102,17 +134,39 @@ async def get_landing_page(request: Request):
 
 @app.get("/host", response_class=HTMLResponse)
 async def get_host_page(request: Request):
-    return templates.TemplateResponse("host.html", {"request": request})
+    return templates.TemplateResponse("host.html", {"request": request, "stream_codec": settings.STREAM_CODEC})
 
 @app.get("/client", response_class=HTMLResponse)
 async def get_client_page(request: Request):
     return templates.TemplateResponse("client.html", {"request": request})
 
-def execute_mouse_event(mouse_data):
+def read_input_screen_size() -> Optional[Tuple[int, int]]:
+    """pyautogui's coordinate space, which can differ from captured pixels on HiDPI screens"""
+    if pyautogui is None:
+        return None
+    try:
+        return tuple(pyautogui.size())
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read the input screen size: {e}")
+        return None
+
+def create_screen_capture() -> ScreenCapture:
+    """A capture for one session, mapping input into pyautogui's coordinate space"""
+    capture = ScreenCapture()
+    capture.input_size_provider = read_input_screen_size  # Re-read after resolution changes
+    capture.input_screen_size = read_input_screen_size()
+    return capture
+
+def get_session_capture(connection_id: str):
+    """Return the screen capture of the session a connection belongs to"""
+    session = manager.get_session_for(connection_id)
+    return session.capture if session is not None else None
+
+def execute_mouse_event(mouse_data, capture: ScreenCapture):
     """Execute actual mouse actions with proper coordinate mapping"""
 
     if pyautogui is None:
-        logger.info("🖱️ Mouse event simulated (headless mode)")
+        input_logger.debug("🖱️ Mouse event simulated (headless mode)")
         return True
     try:
         # Get coordinates from client
@@ -121,29 +175,13 @@ def execute_mouse_event(mouse_data):
         button = mouse_data.get('button', 'left')
         action = mouse_data.get('action', 'move')
         
-        # Get actual screen dimensions
-        actual_screen_width, actual_screen_height = pyautogui.size()
-        
-        # Get canvas dimensions (scaled frame size)
-        canvas_width = screen_capture.actual_screen_width * screen_capture.scale_factor if hasattr(screen_capture, 'actual_screen_width') and screen_capture.scale_factor else actual_screen_width
-        canvas_height = screen_capture.actual_screen_height * screen_capture.scale_factor if hasattr(screen_capture, 'actual_screen_height') and screen_capture.scale_factor else actual_screen_height
-        
-        # Calculate coordinate mapping from canvas to actual screen
-        scale_x = actual_screen_width / canvas_width
-        scale_y = actual_screen_height / canvas_height
-        
-        # Map canvas coordinates to actual screen coordinates
-        actual_x = int(canvas_x * scale_x)
-        actual_y = int(canvas_y * scale_y)
-        
-        # Ensure coordinates are within screen bounds
-        actual_x = max(0, min(actual_x, actual_screen_width - 1))
-        actual_y = max(0, min(actual_y, actual_screen_height - 1))
-        
-        print(f"🖱️ Mouse {action}:")
-        print(f"   Canvas coords: ({canvas_x}, {canvas_y})")
-        print(f"   Actual coords: ({actual_x}, {actual_y})")
-        print(f"   Scale: ({scale_x:.2f}, {scale_y:.2f})")
+        # Map canvas coordinates through the geometry of the frame the client clicked on;
+        # WebRTC video has no frame ids, so those clients name the video size instead
+        if mouse_data.get('canvas_width') and mouse_data.get('canvas_height'):
+            transform = capture.transform_for_canvas(int(mouse_data['canvas_width']), int(mouse_data['canvas_height']))
+        else:
+            transform = capture.transform_for_frame(mouse_data.get('frame_id'))
+        actual_x, actual_y = transform.to_screen(canvas_x, canvas_y)
         
         if action == 'mousemove':
             pyautogui.moveTo(actual_x, actual_y, duration=0)
@@ -177,25 +215,24 @@ def execute_mouse_event(mouse_data):
             if scroll_amount != 0:
                 pyautogui.scroll(-scroll_amount, actual_x, actual_y)
         
-        print(f"✅ Mouse {action} executed at ({actual_x}, {actual_y})")
+        input_logger.debug("🖱️ Mouse %s: canvas (%d, %d) -> screen (%d, %d), scale (%.2f, %.2f)",
+                           action, canvas_x, canvas_y, actual_x, actual_y, transform.scale_x, transform.scale_y)
         return True
         
     except Exception as e:
-        print(f"❌ Mouse control error: {e}")
+        input_logger.error(f"❌ Mouse control error: {e}")
         return False
 
-def execute_keyboard_event(keyboard_data):
+def execute_keyboard_event(keyboard_data, capture: ScreenCapture):
     """Execute actual keyboard actions on the host computer"""
     if pyautogui is None:
-        logger.info("⌨️ Keyboard event simulated (headless mode)")
+        input_logger.debug("⌨️ Keyboard event simulated (headless mode)")
         return True
     try:
         key = keyboard_data.get('key', '')
         action = keyboard_data.get('action', 'keydown')
         modifiers = keyboard_data.get('modifiers', {})
         
-        print(f"⌨️ Executing keyboard {action}: '{key}' with modifiers: {modifiers}")
-        
         # Only process keydown events to avoid duplicate actions
         if action != 'keydown':
             return True
@@ -256,373 +293,540 @@ def execute_keyboard_event(keyboard_data):
             # Key combination
             pyautogui.hotkey(*keys_to_press)
         
-        print(f"✅ Keyboard action executed: {'+'.join(keys_to_press)}")
+        input_logger.debug("⌨️ Keyboard %s executed: %s", action, keys_to_press)
         return True
         
     except Exception as e:
-        print(f"❌ Keyboard control error: {e}")
+        input_logger.error(f"❌ Keyboard control error: {e}")
         return False
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    connection_id = await manager.connect(websocket)
-    print(f"🔗 WebSocket connection opened: {connection_id}")
+# Coalesces pointer motion and injects input in arrival order on its own thread
+input_pipeline = InputPipeline({
+    MessageType.MOUSE_EVENT: execute_mouse_event,
+    MessageType.KEYBOARD_EVENT: execute_keyboard_event
+})
+
+# Routes each inbound message type to its handler below
+dispatcher = MessageDispatcher()
+media_gateway = MediaGateway(settings.WEBRTC_ICE_SERVERS)
+manager.release_media = media_gateway.close
+
+@dispatcher.register(MessageType.CONNECTION_REQUEST)
+async def handle_connection_request(connection_id: str, message: WebRTCMessage):
+    if message.data.get("action") == "create_session":
+        password = message.data.get("password")
+        conflict = manager.session_conflict(connection_id, creating=True)
+        if conflict:
+            await manager.send_personal_message({"type": "session_error", "data": {"error": conflict}}, connection_id)
+            return
+        session_id = await manager.create_session(connection_id, password or None)
+        if session_id is None:
+            await manager.send_personal_message({
+                "type": "session_error",
+                "data": {"error": "The server is at its session limit - try again later"}
+            }, connection_id)
+            return
+        manager.sessions[session_id].capture = create_screen_capture()
+        
+        response = {
+            "type": "session_created",
+            "data": {
+                "session_id": session_id,
+                "password": password if password else None
+            }
+        }
+        await manager.send_personal_message(response, connection_id)
+        logger.info(f"📋 Session created: {session_id} by {connection_id}")
     
-    try:
-        while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-            message = WebRTCMessage(**message_data)
+    elif message.data.get("action") == "join_session":
+        session_id = message.data.get("session_id")
+        provided_password = message.data.get("password")
+        
+        logger.info(f"🔌 Client {connection_id} requesting to join session: {session_id}")
+        
+        # One session per connection - leaving the old one silently would orphan its stream
+        conflict = manager.session_conflict(connection_id)
+        if conflict:
+            response = {
+                "type": "session_join_response",
+                "data": {"success": False, "error": conflict, "session_id": session_id}
+            }
+            await manager.send_personal_message(response, connection_id)
+            return
+        
+        # Sessions hosted by a sibling worker are joined there
+        worker_id = manager.session_worker(session_id)
+        if worker_id is not None:
+            if not await manager.forward_dispatch(worker_id, connection_id, encode_json(message.dict())):
+                response = {
+                    "type": "session_join_response",
+                    "data": {"success": False, "error": "Session host is unavailable", "session_id": session_id}
+                }
+                await manager.send_personal_message(response, connection_id)
+            return
+        
+        # Check if session exists
+        if session_id not in manager.sessions:
+            response = {
+                "type": "session_join_response",
+                "data": {"success": False, "error": "Session not found", "session_id": session_id}
+            }
+            await manager.send_personal_message(response, connection_id)
+            return
+        
+        session = manager.sessions[session_id]
+        
+        # Check password if set
+        if session.password and session.password != provided_password:
+            response = {
+                "type": "session_join_response",
+                "data": {"success": False, "error": "Invalid password", "session_id": session_id}
+            }
+            await manager.send_personal_message(response, connection_id)
+            return
+        
+        # Check if session is already full
+        if manager.is_session_full(session_id):
+            response = {
+                "type": "session_join_response",
+                "data": {"success": False, "error": "Session is full", "session_id": session_id}
+            }
+            await manager.send_personal_message(response, connection_id)
+            return
+        
+        # 🆕 CREATE PENDING CONNECTION REQUEST
+        client_info = {
+            "connection_time": str(asyncio.get_event_loop().time()),
+            "user_agent": message.data.get("user_agent", "Unknown"),
+            "ip_address": "Remote Client",
+            "video_codecs": [codec for codec in message.data.get("video_codecs") or () if isinstance(codec, str)]
+        }
+        
+        pending_id = await manager.request_join_session(session_id, connection_id, client_info)
+        
+        if pending_id:
+            # Notify HOST about the connection request
+            host_id = session.host_id
+            host_notification = {
+                "type": "connection_request_pending",
+                "data": {
+                    "pending_id": pending_id,
+                    "session_id": session_id,
+                    "client_id": connection_id,
+                    "client_info": client_info,
+                    "message": "A client wants to connect to your session"
+                }
+            }
+            await manager.send_personal_message(host_notification, host_id)
+            
+            # Notify CLIENT that request is pending
+            client_response = {
+                "type": "connection_request_sent",
+                "data": {
+                    "pending_id": pending_id,
+                    "session_id": session_id,
+                    "message": "Connection request sent. Waiting for host approval..."
+                }
+            }
+            await manager.send_personal_message(client_response, connection_id)
+            
+            logger.info(f"🔔 Connection request sent to host for session {session_id}")
+        else:
+            response = {
+                "type": "session_join_response",
+                "data": {"success": False, "error": "Unable to create connection request"}
+            }
+            await manager.send_personal_message(response, connection_id)
+    
+    elif message.data.get("action") == "set_password":
+        session_id = message.data.get("session_id")
+        new_password = message.data.get("password")
+        
+        if session_id in manager.sessions:
+            if manager.sessions[session_id].host_id == connection_id:
+                manager.sessions[session_id].password = new_password
+                response = {
+                    "type": "password_updated",
+                    "data": {"success": True, "password": new_password}
+                }
+            else:
+                response = {
+                    "type": "password_updated",
+                    "data": {"success": False, "error": "Not authorized to set password"}
+                }
+            await manager.send_personal_message(response, connection_id)
+    
+    elif message.data.get("action") == "disconnect":
+        session = manager.leave_session(connection_id)
+        if session is not None:
+            host_message = {
+                "type": "client_disconnected",
+                "data": {"client_id": connection_id}
+            }
+            await manager.send_personal_message(host_message, session.host_id)
+            logger.info(f"🔌 Client {connection_id} disconnected from session {session.session_id}")
+
+# 🆕 HANDLE CONNECTION APPROVAL
+@dispatcher.register(MessageType.CONNECTION_APPROVE)
+async def handle_connection_approve(connection_id: str, message: WebRTCMessage):
+    pending_id = message.data.get("pending_id")
+    
+    if pending_id in manager.pending_connections:
+        pending = manager.pending_connections[pending_id]
+        
+        # Verify the approver is the host
+        if pending.host_id == connection_id:
+            success = await manager.approve_connection(pending_id)
             
-            if message.type == MessageType.CONNECTION_REQUEST:
-                if message.data.get("action") == "create_session":
-                    session_id = await manager.create_session(connection_id)
-                    password = message.data.get("password")
-                    if password:
-                        manager.sessions[session_id]["password"] = password
-                    
-                    response = {
-                        "type": "session_created",
-                        "data": {
-                            "session_id": session_id,
-                            "password": password if password else None
-                        }
+            if success:
+                client_id = pending.client_id
+                session_id = pending.session_id
+                view_only = manager.is_viewer(client_id)
+                
+                # Notify CLIENT of approval
+                client_response = {
+                    "type": "session_join_response",
+                    "data": {
+                        "success": True,
+                        "session_id": session_id,
+                        "view_only": view_only,
+                        "message": "Connection approved! You are watching the remote desktop." if view_only
+                                   else "Connection approved! You can now control the remote desktop."
                     }
-                    await manager.send_personal_message(response, connection_id)
-                    print(f"📋 Session created: {session_id} by {connection_id}")
+                }
+                await manager.send_personal_message(client_response, client_id)
                 
-                elif message.data.get("action") == "join_session":
-                    session_id = message.data.get("session_id")
-                    provided_password = message.data.get("password")
-                    
-                    print(f"🔌 Client {connection_id} requesting to join session: {session_id}")
-                    
-                    # Check if session exists
-                    if session_id not in manager.sessions:
-                        response = {
-                            "type": "session_join_response",
-                            "data": {"success": False, "error": "Session not found", "session_id": session_id}
-                        }
-                        await manager.send_personal_message(response, connection_id)
-                        continue
-                    
-                    session = manager.sessions[session_id]
-                    
-                    # Check password if set
-                    if session.get("password") and session["password"] != provided_password:
-                        response = {
-                            "type": "session_join_response",
-                            "data": {"success": False, "error": "Invalid password", "session_id": session_id}
-                        }
-                        await manager.send_personal_message(response, connection_id)
-                        continue
-                    
-                    # Check if session is already full
-                    if session.get("client_id"):
-                        response = {
-                            "type": "session_join_response",
-                            "data": {"success": False, "error": "Session is full", "session_id": session_id}
-                        }
-                        await manager.send_personal_message(response, connection_id)
-                        continue
-                    
-                    # 🆕 CREATE PENDING CONNECTION REQUEST
-                    client_info = {
-                        "connection_time": str(asyncio.get_event_loop().time()),
-                        "user_agent": message.data.get("user_agent", "Unknown"),
-                        "ip_address": "Remote Client"
+                # Notify HOST of successful connection
+                host_response = {
+                    "type": "client_connected",
+                    "data": {
+                        "client_id": client_id,
+                        "session_id": session_id,
+                        "view_only": view_only,
+                        "message": "Client connected successfully"
                     }
-                    
-                    pending_id = await manager.request_join_session(session_id, connection_id, client_info)
-                    
-                    if pending_id:
-                        # Notify HOST about the connection request
-                        host_id = session["host_id"]
-                        host_notification = {
-                            "type": "connection_request_pending",
-                            "data": {
-                                "pending_id": pending_id,
-                                "session_id": session_id,
-                                "client_id": connection_id,
-                                "client_info": client_info,
-                                "message": "A client wants to connect to your session"
-                            }
-                        }
-                        await manager.send_personal_message(host_notification, host_id)
-                        
-                        # Notify CLIENT that request is pending
-                        client_response = {
-                            "type": "connection_request_sent",
-                            "data": {
-                                "pending_id": pending_id,
-                                "session_id": session_id,
-                                "message": "Connection request sent. Waiting for host approval..."
-                            }
-                        }
-                        await manager.send_personal_message(client_response, connection_id)
-                        
-                        print(f"🔔 Connection request sent to host for session {session_id}")
-                    else:
-                        response = {
-                            "type": "session_join_response",
-                            "data": {"success": False, "error": "Unable to create connection request"}
-                        }
-                        await manager.send_personal_message(response, connection_id)
+                }
+                await manager.send_personal_message(host_response, connection_id)
                 
-                elif message.data.get("action") == "set_password":
-                    session_id = message.data.get("session_id")
-                    new_password = message.data.get("password")
-                    
-                    if session_id in manager.sessions:
-                        if manager.sessions[session_id]["host_id"] == connection_id:
-                            manager.sessions[session_id]["password"] = new_password
-                            response = {
-                                "type": "password_updated",
-                                "data": {"success": True, "password": new_password}
-                            }
-                        else:
-                            response = {
-                                "type": "password_updated",
-                                "data": {"success": False, "error": "Not authorized to set password"}
-                            }
-                        await manager.send_personal_message(response, connection_id)
+                # The new client has no previous frame to apply tiles to
+                capture = get_session_capture(client_id)
+                if capture is not None:
+                    capture.request_keyframe()
                 
-                elif message.data.get("action") == "disconnect":
-                    for session_id, session in manager.sessions.items():
-                        if session.get("client_id") == connection_id:
-                            session["client_id"] = None
-                            session["status"] = "waiting"
-                            host_message = {
-                                "type": "client_disconnected",
-                                "data": {"client_id": connection_id}
-                            }
-                            await manager.send_personal_message(host_message, session["host_id"])
-                            print(f"🔌 Client {connection_id} disconnected from session {session_id}")
-                            break
+                logger.info(f"✅ Connection approved: {client_id} joined session {session_id}")
+            else:
+                # Approval failed
+                error_response = {
+                    "type": "connection_approval_failed",
+                    "data": {"error": "Failed to approve connection"}
+                }
+                await manager.send_personal_message(error_response, connection_id)
+
+# 🆕 HANDLE CONNECTION REJECTION
+@dispatcher.register(MessageType.CONNECTION_REJECT)
+async def handle_connection_reject(connection_id: str, message: WebRTCMessage):
+    pending_id = message.data.get("pending_id")
+    reject_reason = message.data.get("reason", "Connection rejected by host")
+    
+    if pending_id in manager.pending_connections:
+        pending = manager.pending_connections[pending_id]
+        
+        # Verify the rejector is the host
+        if pending.host_id == connection_id:
+            client_id = pending.client_id
             
-            # 🆕 HANDLE CONNECTION APPROVAL
-            elif message.type == MessageType.CONNECTION_APPROVE:
-                pending_id = message.data.get("pending_id")
-                
-                if pending_id in manager.pending_connections:
-                    pending = manager.pending_connections[pending_id]
-                    
-                    # Verify the approver is the host
-                    if pending["host_id"] == connection_id:
-                        success = await manager.approve_connection(pending_id)
-                        
-                        if success:
-                            client_id = pending["client_id"]
-                            session_id = pending["session_id"]
-                            
-                            # Notify CLIENT of approval
-                            client_response = {
-                                "type": "session_join_response",
-                                "data": {
-                                    "success": True,
-                                    "session_id": session_id,
-                                    "message": "Connection approved! You can now control the remote desktop."
-                                }
-                            }
-                            await manager.send_personal_message(client_response, client_id)
-                            
-                            # Notify HOST of successful connection
-                            host_response = {
-                                "type": "client_connected",
-                                "data": {
-                                    "client_id": client_id,
-                                    "session_id": session_id,
-                                    "message": "Client connected successfully"
-                                }
-                            }
-                            await manager.send_personal_message(host_response, connection_id)
-                            
-                            print(f"✅ Connection approved: {client_id} joined session {session_id}")
-                        else:
-                            # Approval failed
-                            error_response = {
-                                "type": "connection_approval_failed",
-                                "data": {"error": "Failed to approve connection"}
-                            }
-                            await manager.send_personal_message(error_response, connection_id)
+            # Notify CLIENT of rejection
+            client_response = {
+                "type": "session_join_response",
+                "data": {
+                    "success": False,
+                    "error": reject_reason,
+                    "rejected": True
+                }
+            }
+            await manager.send_personal_message(client_response, client_id)
             
-            # 🆕 HANDLE CONNECTION REJECTION
-            elif message.type == MessageType.CONNECTION_REJECT:
-                pending_id = message.data.get("pending_id")
-                reject_reason = message.data.get("reason", "Connection rejected by host")
-                
-                if pending_id in manager.pending_connections:
-                    pending = manager.pending_connections[pending_id]
-                    
-                    # Verify the rejector is the host
-                    if pending["host_id"] == connection_id:
-                        client_id = pending["client_id"]
-                        
-                        # Notify CLIENT of rejection
-                        client_response = {
-                            "type": "session_join_response",
-                            "data": {
-                                "success": False,
-                                "error": reject_reason,
-                                "rejected": True
-                            }
-                        }
-                        await manager.send_personal_message(client_response, client_id)
-                        
-                        # Clean up pending connection
-                        await manager.reject_connection(pending_id)
-                        
-                        print(f"❌ Connection rejected: {pending_id} - Reason: {reject_reason}")
+            # Clean up pending connection
+            await manager.reject_connection(pending_id)
             
-            # 🎥 HANDLE SCREEN SHARING
-            elif message.type == MessageType.SCREEN_SHARE:
-                if message.data.get("action") == "start":
-                    quality = message.data.get("quality", "medium")
-                    fps = message.data.get("fps", 15)
-                    
-                    print(f"📺 Starting screen sharing for {connection_id} - Quality: {quality}, FPS: {fps}")
-                    
-                    # Adjust quality settings
-                    if quality == "low":
-                        screen_capture.quality = 60
-                        screen_capture.scale_factor = 0.5
-                        fps = 10
-                    elif quality == "high":
-                        screen_capture.quality = 90
-                        screen_capture.scale_factor = 1.0
-                        fps = 20
-                    else:  # medium
-                        screen_capture.quality = 80
-                        screen_capture.scale_factor = 0.7
-                        fps = 15
-                    
-                    try:
-                        # Stop any existing streaming first
-                        screen_capture.stop_streaming()
-                        
-                        # Start new streaming task
-                        task = asyncio.create_task(
-                            screen_capture.start_streaming(manager, connection_id, fps)
-                        )
-                        
-                        print(f"✅ Screen capture task started")
-                        
-                        response = {
-                            "type": "sharing_started",
-                            "data": {"quality": quality, "fps": fps}
-                        }
-                        await manager.send_personal_message(response, connection_id)
-                        
-                    except Exception as e:
-                        print(f"❌ Error starting screen sharing: {e}")
-                        error_response = {
-                            "type": "sharing_error",
-                            "data": {"error": str(e)}
-                        }
-                        await manager.send_personal_message(error_response, connection_id)
-                    
-                elif message.data.get("action") == "stop":
-                    print(f"🛑 Stopping screen sharing for {connection_id}")
-                    screen_capture.stop_streaming()
-                    response = {"type": "sharing_stopped", "data": {}}
-                    await manager.send_personal_message(response, connection_id)
+            logger.info(f"❌ Connection rejected: {pending_id} - Reason: {reject_reason}")
+
+# 🎥 HANDLE SCREEN SHARING
+@dispatcher.register(MessageType.SCREEN_SHARE)
+async def handle_screen_share(connection_id: str, message: WebRTCMessage):
+    if message.data.get("action") == "start":
+        quality = message.data.get("quality", "medium")
+        fps = message.data.get("fps", 15)
+        
+        logger.info(f"📺 Starting screen sharing for {connection_id} - Quality: {quality}, FPS: {fps}")
+        
+        # Each session streams through its own capture, so hosts never stop each other's streams
+        session = manager.get_session_for(connection_id)
+        if session is None or session.host_id != connection_id:
+            error_response = {
+                "type": "sharing_error",
+                "data": {"error": "Create a session before sharing your screen"}
+            }
+            await manager.send_personal_message(error_response, connection_id)
+            return
+        if session.capture is None:
+            session.capture = create_screen_capture()
+        
+        try:
+            # Adjust quality settings (the adaptive bitrate controller may go lower)
+            fps = session.capture.apply_quality_preset(quality)
             
-            # 🖱️ HANDLE MOUSE EVENTS
-            elif message.type == MessageType.MOUSE_EVENT:
-                print(f"🖱️ Received mouse event from {connection_id}")
-                mouse_event = MouseEvent(**message.data)
-                
-                # Execute the mouse action on the HOST computer
-                success = execute_mouse_event(message.data)
-                
-                if not success:
-                    print(f"❌ Failed to execute mouse event: {message.data}")
-                
-                # Also relay to other peers if needed
-                await manager.relay_message(message, connection_id)
+            # H.264 only when the host preview and every viewer can decode it, JPEG otherwise
+            session.preferred_codec = message.data.get("codec") or settings.STREAM_CODEC
+            session.video_codecs[connection_id] = set(message.data.get("video_codecs") or ())
+            manager.update_stream_codec(session)
             
-            # ⌨️ HANDLE KEYBOARD EVENTS
-            elif message.type == MessageType.KEYBOARD_EVENT:
-                print(f"⌨️ Received keyboard event from {connection_id}")
-                keyboard_event = KeyboardEvent(**message.data)
-                
-                # Execute the keyboard action on the HOST computer
-                success = execute_keyboard_event(message.data)
-                
-                if not success:
-                    print(f"❌ Failed to execute keyboard event: {message.data}")
-                
-                # Also relay to other peers if needed
-                await manager.relay_message(message, connection_id)
+            # Replaces this session's previous stream, if any
+            session.capture.start(manager, connection_id, fps)
             
-            # 🎚️ HANDLE QUALITY CHANGE
-            elif message.type == MessageType.QUALITY_CHANGE:
-                quality = message.data.get("quality", "medium")
-                print(f"🎚️ Quality change requested: {quality}")
-                
-                if quality == "low":
-                    screen_capture.quality = 60
-                    screen_capture.scale_factor = 0.5
-                elif quality == "high":
-                    screen_capture.quality = 90
-                    screen_capture.scale_factor = 1.0
-                else:
-                    screen_capture.quality = 80
-                    screen_capture.scale_factor = 0.7
-                
-                response = {
-                    "type": "quality_changed",
-                    "data": {"quality": quality}
-                }
-                await manager.send_personal_message(response, connection_id)
+            logger.info("✅ Screen capture task started")
+            
+            response = {
+                "type": "sharing_started",
+                "data": {"quality": quality, "fps": fps, "codec": session.capture.codec}
+            }
+            await manager.send_personal_message(response, connection_id)
             
-            # 🔗 HANDLE WEBRTC SIGNALING
-            elif message.type in [MessageType.OFFER, MessageType.ANSWER, MessageType.ICE_CANDIDATE]:
-                await manager.relay_message(message, connection_id)
+        except Exception as e:
+            logger.error(f"❌ Error starting screen sharing: {e}")
+            error_response = {
+                "type": "sharing_error",
+                "data": {"error": str(e)}
+            }
+            await manager.send_personal_message(error_response, connection_id)
+        
+    elif message.data.get("action") == "stop":
+        logger.info(f"🛑 Stopping screen sharing for {connection_id}")
+        session = manager.get_session_for(connection_id)
+        if session is not None and session.host_id == connection_id and session.capture is not None:
+            session.capture.stop_streaming()
+        response = {"type": "sharing_stopped", "data": {}}
+        await manager.send_personal_message(response, connection_id)
+
+# 🖱️⌨️ HANDLE MOUSE AND KEYBOARD EVENTS (fast path - the injection handlers validate fields)
+@dispatcher.register(MessageType.MOUSE_EVENT, MessageType.KEYBOARD_EVENT, fast=True)
+async def handle_input_event(connection_id: str, message_data: dict):
+    capture = get_session_capture(connection_id)
+    if capture is None or manager.is_viewer(connection_id):
+        return  # Only session members may control the host, and view-only observers can't
+    
+    # Queue the action for the HOST computer, mapped through this session's frames
+    input_pipeline.submit(MessageType(message_data["type"]), message_data["data"], connection_id, capture)
+    
+    # Also relay to other peers if needed
+    await manager.relay_message(message_data, connection_id)
+
+# 📦 HANDLE BATCHED INPUT (several mouse/keyboard events per animation frame)
+@dispatcher.register(MessageType.INPUT_BATCH, fast=True)
+async def handle_input_batch(connection_id: str, message_data: dict):
+    capture = get_session_capture(connection_id)
+    if capture is None or manager.is_viewer(connection_id):
+        return
+    events = message_data["data"].get("events")
+    if isinstance(events, list):
+        input_pipeline.submit_batch(events, connection_id, capture)
+        await manager.relay_message(message_data, connection_id)
+
+# 🎚️ HANDLE QUALITY CHANGE
+@dispatcher.register(MessageType.QUALITY_CHANGE)
+async def handle_quality_change(connection_id: str, message: WebRTCMessage):
+    quality = message.data.get("quality", "medium")
+    logger.info(f"🎚️ Quality change requested: {quality}")
+    
+    # Only the requester's own session changes
+    capture = get_session_capture(connection_id)
+    if capture is not None:
+        capture.apply_quality_preset(quality)
+    
+    response = {
+        "type": "quality_changed",
+        "data": {"quality": quality}
+    }
+    await manager.send_personal_message(response, connection_id)
+
+# 📬 HANDLE FRAME ACKNOWLEDGEMENTS
+@dispatcher.register(MessageType.FRAME_ACK, fast=True)
+async def handle_frame_ack(connection_id: str, message_data: dict):
+    frame_id = message_data["data"].get("frame_id")
+    capture = get_session_capture(connection_id)
+    if isinstance(frame_id, int) and capture is not None:
+        capture.bitrate_controller.on_ack(connection_id, frame_id)
+
+# 💓 HANDLE HEARTBEAT REPLIES
+@dispatcher.register(MessageType.PONG, fast=True)
+async def handle_pong(connection_id: str, message_data: dict):
+    pass  # The endpoint already marked the connection as alive
+
+# 🔗 HANDLE WEBRTC SIGNALING
+@dispatcher.register(MessageType.OFFER, MessageType.ANSWER, MessageType.ICE_CANDIDATE)
+async def handle_signaling(connection_id: str, message: WebRTCMessage):
+    # Offers marked "media" are for the server-side peer publishing the session's screen;
+    # everything else is relayed to the other side of the session as before
+    if not message.data.get("media"):
+        await manager.relay_message(message, connection_id)
+        return
+    
+    session = manager.get_session_for(connection_id)
+    if not (settings.WEBRTC_MEDIA and WEBRTC_AVAILABLE) or session is None or session.capture is None \
+            or session.host_id == connection_id:
+        await manager.send_personal_message({
+            "type": "media_unavailable",
+            "data": {"reason": "WebRTC media is not available - using WebSocket frames"}
+        }, connection_id)
+        return
+    
+    try:
+        if message.type == MessageType.OFFER:
+            answer = await media_gateway.answer(connection_id, message.data, session.capture,
+                                                dispatcher.dispatch, manager.set_media_connected)
+            await manager.send_personal_message({"type": "answer", "data": {"media": True, **answer}}, connection_id)
+            logger.info(f"📡 WebRTC media answered for {connection_id}")
+        elif message.type == MessageType.ICE_CANDIDATE:
+            await media_gateway.add_ice_candidate(connection_id, message.data)
+    except Exception as e:
+        logger.error(f"❌ WebRTC media error for {connection_id}: {e}")
+        await media_gateway.close(connection_id)
+        await manager.send_personal_message({
+            "type": "media_unavailable",
+            "data": {"reason": str(e)}
+        }, connection_id)
+
+async def handle_remote_disconnect(connection_id: str):
+    """A member of a session held here disconnected from a sibling worker"""
+    manager.disconnect(connection_id)
+    await media_gateway.close(connection_id)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    connection_id = await manager.connect(websocket)
+    if connection_id is None:
+        return
+    logger.info(f"🔗 WebSocket connection opened: {connection_id}")
+    
+    try:
+        while True:
+            data = await websocket.receive_text()
+            manager.touch(connection_id)
+            # Messages of a session held by a sibling worker are handled there
+            home = manager.remote_homes.get(connection_id)
+            if home is not None:
+                await manager.forward_dispatch(home, connection_id, data)
+            else:
+                await dispatcher.dispatch(connection_id, data)
                 
     except WebSocketDisconnect:
-        print(f"🔌 WebSocket disconnected: {connection_id}")
+        logger.info(f"🔌 WebSocket disconnected: {connection_id}")
         manager.disconnect(connection_id)
     except Exception as e:
-        print(f"❌ WebSocket error for connection {connection_id}: {e}")
+        logger.error(f"❌ WebSocket error for connection {connection_id}: {e}")
         manager.disconnect(connection_id)
+    finally:
+        await media_gateway.close(connection_id)
 
 # 🧪 TEST ENDPOINT FOR SCREEN CAPTURE
 @app.get("/test/screenshot")
 async def test_screenshot():
     """Test endpoint to verify screen capture works"""
+    # A throwaway capture, so no session's stream or tile state is disturbed
+    capture = create_screen_capture()
     try:
-        screen_data = screen_capture.capture_screen()
+        screen_data = capture.capture_screen()
         if screen_data:
             return {
                 "success": True,
                 "message": "Screen capture working",
-                "frame_size": len(screen_data["frame"]) if isinstance(screen_data, dict) and "frame" in screen_data else len(str(screen_data)),
-                "screen_size": f"{screen_capture.actual_screen_width}x{screen_capture.actual_screen_height}" if hasattr(screen_capture, 'actual_screen_width') else "Unknown"
+                "frame_size": len(screen_data["payload"]),
+                "screen_size": f"{capture.actual_screen_width}x{capture.actual_screen_height}"
             }
         else:
             return {"success": False, "error": "Screen capture failed"}
     except Exception as e:
         return {"success": False, "error": str(e)}
+    finally:
+        capture.close()
+
+# 📈 METRICS
+def collect_runtime_metrics():
+    """Copy counters and queue depths kept by the pipelines into the metrics registry"""
+    metrics.CONNECTIONS.set(len(manager.active_connections))
+    metrics.SESSIONS.set(len(manager.sessions))
+    metrics.CAPTURE_QUEUE_DEPTH.set(sum(session.capture.frame_queue_depth()
+                                        for session in manager.sessions.values() if session.capture is not None))
+    
+    for metric in (metrics.CONNECTION_BYTES_SENT, metrics.CONNECTION_FRAMES_SENT,
+                   metrics.CONNECTION_FRAMES_DROPPED, metrics.CONNECTION_QUEUE_DEPTH):
+        metric.clear()
+    for connection_id in manager.active_connections:
+        stats = manager.get_connection_stats(connection_id)
+        if stats is None:
+            continue
+        metrics.CONNECTION_BYTES_SENT.set(stats["bytes_sent"], connection=connection_id)
+        metrics.CONNECTION_FRAMES_SENT.set(stats["frames_sent"], connection=connection_id)
+        metrics.CONNECTION_FRAMES_DROPPED.set(stats["frames_dropped"], connection=connection_id)
+        metrics.CONNECTION_QUEUE_DEPTH.set(stats["queue_depth"], connection=connection_id, queue="messages")
+        metrics.CONNECTION_QUEUE_DEPTH.set(int(stats["frame_pending"]), connection=connection_id, queue="frame")
+    
+    input_stats = input_pipeline.stats()
+    metrics.INPUT_QUEUE_DEPTH.set(input_stats["pending"])
+    for result in ("received", "coalesced", "injected", "failed"):
+        metrics.INPUT_EVENTS.set(input_stats[f"events_{result}"], result=result)
+
+metrics.REGISTRY.add_collector(collect_runtime_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of the streaming and input pipeline metrics"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 # 🐛 DEBUG ENDPOINTS
 @app.get("/debug/sessions")
 async def debug_sessions():
     return {
         "active_connections": list(manager.active_connections.keys()),
+        "connection_stats": {
+            cid: manager.get_connection_stats(cid)
+            for cid in manager.active_connections
+        },
+        "input_pipeline": input_pipeline.stats(),
+        "dispatcher": dispatcher.stats(),
+        "logging": logging_stats(),
+        "cluster": {
+            "worker_id": manager.worker_id,
+            "store": manager.store.counts(),
+            "bus": manager.bus.stats() if manager.bus is not None else None,
+            "remote_homes": dict(manager.remote_homes)
+        },
+        "reaper": manager.reaper_stats(),
+        "webrtc_media": {
+            "peers": list(media_gateway.peers),
+            "connected": list(manager.media_connections)
+        },
         "sessions": {
             sid: {
-                "host_id": session.get("host_id"),
-                "client_id": session.get("client_id"),
-                "has_password": "password" in session
+                "host_id": session.host_id,
+                "client_id": session.client_id,
+                "viewers": list(session.viewers),
+                "has_password": bool(session.password),
+                "streaming": session.capture is not None and session.capture.is_capturing,
+                "stream_settings": {
+                    "quality": session.capture.quality,
+                    "scale_factor": session.capture.scale_factor,
+                    "fps": session.capture.fps,
+                    "codec": session.capture.codec
+                } if session.capture is not None else None
             }
             for sid, session in manager.sessions.items()
         },
         "pending_connections": {
             pid: {
-                "session_id": pending.get("session_id"),
-                "client_id": pending.get("client_id"),
-                "host_id": pending.get("host_id")
+                "session_id": pending.session_id,
+                "client_id": pending.client_id,
+                "host_id": pending.host_id
             }
             for pid, pending in manager.pending_connections.items()
         }
@@ -637,7 +841,8 @@ async def health_check():
         "features": ["Screen Sharing", "Mouse Control", "Keyboard Control", "Connection Approval"],
         "active_connections": len(manager.active_connections),
         "active_sessions": len(manager.sessions),
-        "pending_connections": len(manager.pending_connections)
+        "pending_connections": len(manager.pending_connections),
+        "input_injection": pyautogui is not None
     }
 
 if __name__ == "__main__":
@@ -647,5 +852,8 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        workers=settings.WORKERS,
+        ws_ping_interval=settings.WS_PING_INTERVAL,  # Protocol-level pings as well; the reaper's pings cover proxies that drop them
+        ws_ping_timeout=settings.WS_PING_TIMEOUT,
         log_level="info"
     )
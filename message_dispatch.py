@@ -0,0 +1,91 @@
+"""Inbound WebSocket message decoding and dispatch.
+
+Handlers are registered per ``MessageType``. Regular handlers receive a validated
+``WebRTCMessage``. Fast handlers (mouse, keyboard, batched input, frame acks - the
+message types that arrive at 60-100+ per second) receive the decoded dict and skip
+pydantic validation; they check the few fields they use themselves.
+"""
+
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Union
+
+from models import MessageType, WebRTCMessage
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def decode_json(data: Union[str, bytes]) -> Any:
+    """Decode a JSON message, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def encode_json(message: Any) -> str:
+    """Encode a JSON message, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message)
+
+Handler = Callable[[str, WebRTCMessage], Awaitable[None]]
+FastHandler = Callable[[str, dict], Awaitable[None]]
+
+class MessageDispatcher:
+    """Route decoded messages to the handler registered for their type"""
+
+    def __init__(self):
+        self.handlers: Dict[MessageType, Handler] = {}
+        # MessageType is a str enum, so raw "type" strings look these up directly
+        self.fast_handlers: Dict[MessageType, FastHandler] = {}
+        self.messages_handled: Dict[str, int] = {}
+        self.messages_unhandled = 0
+
+    def register(self, *message_types: MessageType, fast: bool = False):
+        """Decorator registering a handler for one or more message types"""
+        def decorator(handler):
+            for message_type in message_types:
+                self.handlers.pop(message_type, None)
+                self.fast_handlers.pop(message_type, None)
+                if fast:
+                    self.fast_handlers[message_type] = handler
+                else:
+                    self.handlers[message_type] = handler
+            return handler
+        return decorator
+
+    async def dispatch(self, connection_id: str, raw: Union[str, bytes]):
+        """Decode one message and run its handler; invalid messages raise"""
+        message_data = decode_json(raw)
+        if not isinstance(message_data, dict):
+            raise ValueError("Message must be a JSON object")
+
+        message_type = message_data.get("type")
+        fast_handler = self.fast_handlers.get(message_type) if isinstance(message_type, str) else None
+        if fast_handler is not None:
+            if not isinstance(message_data.get("data"), dict):
+                raise ValueError(f"Invalid data for {message_type} message")
+            self._count(message_type)
+            await fast_handler(connection_id, message_data)
+            return
+
+        message = WebRTCMessage(**message_data)
+        handler = self.handlers.get(message.type)
+        if handler is None:
+            self.messages_unhandled += 1
+            return
+        self._count(message.type.value)
+        await handler(connection_id, message)
+
+    def _count(self, message_type: str):
+        self.messages_handled[message_type] = self.messages_handled.get(message_type, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "json_decoder": "orjson" if orjson is not None else "json",
+            "messages_handled": dict(self.messages_handled),
+            "messages_unhandled": self.messages_unhandled
+        }
@@ -0,0 +1,191 @@
+"""Minimal Prometheus-style metrics for the streaming and input pipelines.
+
+Metrics are plain in-process objects updated from the event loop, the capture thread
+and the input thread, and rendered in the Prometheus text exposition format by the
+``/metrics`` endpoint. Values that already live elsewhere (per-connection counters,
+queue depths) are copied in by collectors registered with ``REGISTRY.add_collector``
+right before each scrape instead of being updated twice on the hot path.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+class Gauge(Metric):
+    """A value that goes up and down"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+class Counter(Gauge):
+    """A value that only goes up"""
+
+    kind = "counter"
+
+class CollectedCounter(Gauge):
+    """A counter whose totals are copied in by a collector from an existing counter"""
+
+    kind = "counter"
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.buckets = sorted(buckets)
+        self._series: Dict[LabelValues, list] = {}  # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+
+        lines = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Run ``collector`` before every scrape to refresh collected metrics"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 131072, 262144, 524288, 1048576, 2097152)
+
+# 🎥 Streaming pipeline
+CAPTURE_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "remote_desktop_capture_stage_seconds", "Time per frame spent in each capture stage (grab, resize, diff, encode)",
+    LATENCY_BUCKETS, labels=("stage",)))
+FRAME_SEND_SECONDS = REGISTRY.register(Histogram(
+    "remote_desktop_frame_send_seconds", "Time to write one screen frame to a WebSocket", LATENCY_BUCKETS))
+FRAME_BYTES = REGISTRY.register(Histogram(
+    "remote_desktop_frame_bytes", "Encoded screen frame size", SIZE_BUCKETS, labels=("keyframe",)))
+FRAMES_ENCODED = REGISTRY.register(Counter(
+    "remote_desktop_frames_encoded_total", "Screen frames encoded", labels=("keyframe",)))
+STREAM_FPS = REGISTRY.register(Gauge(
+    "remote_desktop_stream_fps", "Frames per second achieved by each host's stream", labels=("host",)))
+CAPTURE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "remote_desktop_capture_queue_depth", "Encoded frames waiting to be fanned out"))
+
+# 🔗 Connections
+CONNECTIONS = REGISTRY.register(Gauge("remote_desktop_connections", "Open WebSocket connections"))
+SESSIONS = REGISTRY.register(Gauge("remote_desktop_sessions", "Active sessions"))
+CONNECTION_BYTES_SENT = REGISTRY.register(CollectedCounter(
+    "remote_desktop_connection_bytes_sent_total", "Bytes written per connection (frames and messages)", labels=("connection",)))
+CONNECTION_FRAMES_SENT = REGISTRY.register(CollectedCounter(
+    "remote_desktop_connection_frames_sent_total", "Screen frames sent per connection", labels=("connection",)))
+CONNECTION_FRAMES_DROPPED = REGISTRY.register(CollectedCounter(
+    "remote_desktop_connection_frames_dropped_total", "Screen frames replaced before delivery per connection",
+    labels=("connection",)))
+CONNECTION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "remote_desktop_connection_queue_depth", "Outbound items waiting per connection", labels=("connection", "queue")))
+
+# 🖱️ Input pipeline
+INPUT_LATENCY_SECONDS = REGISTRY.register(Histogram(
+    "remote_desktop_input_latency_seconds", "Time from receiving an input event to finishing its injection",
+    LATENCY_BUCKETS, labels=("type",)))
+INPUT_EVENTS = REGISTRY.register(CollectedCounter(
+    "remote_desktop_input_events_total", "Input events by outcome", labels=("result",)))
+INPUT_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "remote_desktop_input_queue_depth", "Input events waiting for injection"))
+
+# 🧹 Expiry and limits
+REAPED = REGISTRY.register(Counter(
+    "remote_desktop_reaped_total", "Pending requests, sessions and connections expired by the reaper", labels=("kind",)))
+REFUSED = REGISTRY.register(Counter(
+    "remote_desktop_refused_total", "Connections and sessions refused at their limit", labels=("kind",)))
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Set
 from enum import Enum
+import time
 
 class MessageType(str, Enum):
     OFFER = "offer"
@@ -16,6 +17,13 @@ class MessageType(str, Enum):
     CONNECTION_REQUEST_PENDING = "connection_request_pending"
     CONNECTION_APPROVE = "connection_approve"
     CONNECTION_REJECT = "connection_reject"
+    # Client acknowledgement of a painted frame, used for adaptive bitrate
+    FRAME_ACK = "frame_ack"
+    # Several mouse/keyboard events sent together by the client
+    INPUT_BATCH = "input_batch"
+    # Application-level heartbeat: the server pings, clients answer
+    PING = "ping"
+    PONG = "pong"
 
 class WebRTCMessage(BaseModel):
     type: MessageType
@@ -42,3 +50,51 @@ class ConnectionPendingRequest(BaseModel):
     client_id: str
     session_id: str
     client_info: Optional[Dict[str, str]] = None
+
+class Session:
+    """A host's session and the clients approved into it"""
+    __slots__ = ("session_id", "host_id", "client_id", "viewers", "status", "password", "capture",
+                 "preferred_codec", "video_codecs", "last_active")
+
+    def __init__(self, session_id: str, host_id: str, password: Optional[str] = None):
+        self.session_id = session_id
+        self.host_id = host_id
+        self.client_id: Optional[str] = None  # Controlling client
+        self.viewers: Set[str] = set()  # View-only observers, approved after the controlling client
+        self.status = "waiting"
+        self.password = password
+        self.capture = None  # ScreenCapture streaming the host's screen, with this session's quality and FPS
+        self.preferred_codec = "jpeg"  # Codec the host asked for when it started sharing
+        self.video_codecs: Dict[str, Set[str]] = {}  # Member -> video codecs its browser can decode
+        self.last_active = time.monotonic()  # Last time it had members or was streaming, for idle expiry
+
+    def stream_codec(self) -> str:
+        """The preferred codec if every member can decode it, otherwise JPEG"""
+        if self.preferred_codec == "jpeg":
+            return "jpeg"
+        for member_id in self.members():
+            if self.preferred_codec not in self.video_codecs.get(member_id, ()):
+                return "jpeg"
+        return self.preferred_codec
+
+    def members(self) -> List[str]:
+        """Host, controlling client and viewers"""
+        members = [self.host_id]
+        if self.client_id:
+            members.append(self.client_id)
+        members.extend(self.viewers)
+        return members
+
+class PendingConnection:
+    """A client's request to join a session, waiting for the host's decision"""
+    __slots__ = ("pending_id", "session_id", "client_id", "host_id", "client_info", "status", "created_at")
+
+    def __init__(self, pending_id: str, session_id: str, client_id: str, host_id: str,
+                 client_info: Optional[Dict[str, str]] = None):
+        self.pending_id = pending_id
+        self.session_id = session_id
+        self.client_id = client_id
+        self.host_id = host_id
+        self.client_info = client_info or {}
+        self.status = "pending"
+        self.created_at = time.monotonic()
@@ -1,157 +1,629 @@
-from PIL import ImageGrab, Image
-import base64
+from PIL import Image
+import numpy as np
 import io
 import asyncio
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Callable, Optional, List, Tuple
 import logging
 import os
+import time
+
+from frame_protocol import encode_frame, CODEC_JPEG, CODEC_H264
+from adaptive_bitrate import AdaptiveBitrateController
+from capture_backends import CaptureBackend, create_backend
+from frame_scaler import FrameScaler
+from config import settings
+from logging_setup import get_category_logger
+from metrics import CAPTURE_STAGE_SECONDS, FRAME_BYTES, FRAMES_ENCODED, STREAM_FPS
+from video_encoder import VideoEncoder, VIDEO_CODECS_AVAILABLE
 
 logger = logging.getLogger(__name__)
+frame_logger = get_category_logger("frames")  # Per-frame records, DEBUG and rate limited
+
+class CoordinateTransform:
+    """Maps canvas coordinates of one frame geometry to host screen coordinates"""
+    __slots__ = ("canvas_width", "canvas_height", "screen_width", "screen_height", "scale_x", "scale_y")
+    
+    def __init__(self, canvas_width: int, canvas_height: int, screen_width: int, screen_height: int):
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.scale_x = screen_width / canvas_width
+        self.scale_y = screen_height / canvas_height
+    
+    def matches(self, canvas_width: int, canvas_height: int, screen_width: int, screen_height: int) -> bool:
+        return (self.canvas_width == canvas_width and self.canvas_height == canvas_height
+                and self.screen_width == screen_width and self.screen_height == screen_height)
+    
+    def to_screen(self, x: float, y: float) -> Tuple[int, int]:
+        """Map a canvas point to the screen, clamped to its bounds"""
+        screen_x = int(x * self.scale_x)
+        screen_y = int(y * self.scale_y)
+        return (max(0, min(screen_x, self.screen_width - 1)),
+                max(0, min(screen_y, self.screen_height - 1)))
 
 class ScreenCapture:
-    def __init__(self):
+    def __init__(self, backend: Optional[CaptureBackend] = None):
         self.is_capturing = False
         self.quality = 80
         self.scale_factor = 0.7
+        self.fps = 15
+        self.bitrate_controller = AdaptiveBitrateController()
         self.actual_screen_width = 1920  # Default for headless
         self.actual_screen_height = 1080  # Default for headless
-        self.is_headless = os.getenv("ENVIRONMENT") == "production"
+        self.backend = backend  # Created from settings.CAPTURE_BACKEND on first capture
+        self.is_headless = (backend is None and settings.CAPTURE_BACKEND == "auto"
+                            and os.getenv("ENVIRONMENT") == "production")
+        
+        # Dirty-region detection
+        self.tile_size = 64
+        self.full_frame_threshold = 0.5  # Send a full frame when more than half the tiles changed
+        self._previous_raw = None  # Last grabbed frame, before scaling
+        self._previous_frame = None  # Last sent frame, after scaling
+        self._keyframe_requested = True
+        self._frame_id = 0
         
+        # Progressive quality - fast, low-quality frames while the screen changes, then a
+        # single full-resolution, high-quality refinement frame once it goes idle
+        self.scaler = FrameScaler()
+        self.progressive = True
+        self.motion_quality = 60  # JPEG quality cap while the screen is changing
+        self.refine_quality = 90
+        self.refine_after = 0.5  # Seconds without changes before the refinement frame is sent
+        self._refinement_pending = False
+        self._refined = False  # The client shows a refinement frame; small changes go on top of it
+        self._refined_quality = self.refine_quality
+        self._last_change_time = 0.0
+        
+        # Stream codec - "jpeg" sends independent tiles, "h264" sends whole frames through an
+        # inter-frame encoder; only used when PyAV is installed and every viewer can decode it
+        self.codec = "jpeg"
+        self._video_encoder: Optional[VideoEncoder] = None
+        self._video_frame: Optional[np.ndarray] = None  # Latest scaled frame, for WebRTC video tracks
+        
+        # Headless demo screen cache
+        self.dummy_cache_size = 4
+        self._dummy_frames: OrderedDict = OrderedDict()
+        self._dummy_sent_key: Optional[tuple] = None
+        
+        # Input coordinate mapping - rebuilt only when the frame geometry changes and
+        # remembered per frame id, so clicks map through the frame the client was looking at
+        self.input_screen_size: Optional[Tuple[int, int]] = None  # Injection coordinate space if it differs from the capture (HiDPI)
+        self.input_size_provider: Optional[Callable[[], Optional[Tuple[int, int]]]] = None  # Re-reads it when the screen size changes
+        self.transform_history_size = 64
+        self.transform = CoordinateTransform(int(self.actual_screen_width * self.scale_factor),
+                                             int(self.actual_screen_height * self.scale_factor),
+                                             self.actual_screen_width, self.actual_screen_height)
+        self._frame_transforms: OrderedDict = OrderedDict()
+        
+        # Capture pipeline
+        self.frame_queue_size = 2  # Encoded frames waiting for the sender
+        self._frame_queue: Optional[asyncio.Queue] = None
+        self.resync_interval = 1.0  # Minimum seconds between keyframes forced by dropped frames
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stream_task: Optional[asyncio.Task] = None
+        
+    def apply_quality_preset(self, preset: str) -> int:
+        """Apply a low/medium/high preset as the adaptive bitrate ceiling and return its FPS"""
+        self.bitrate_controller.set_preset(preset)
+        self.quality, self.scale_factor, self.fps = self.bitrate_controller.current_settings()
+        self.request_keyframe()
+        return self.fps
+    
+    def _get_backend(self) -> CaptureBackend:
+        if self.backend is None:
+            options = {}
+            if settings.CAPTURE_BACKEND == "synthetic":
+                options = {
+                    "width": settings.SYNTHETIC_CAPTURE_WIDTH,
+                    "height": settings.SYNTHETIC_CAPTURE_HEIGHT,
+                    "mode": settings.SYNTHETIC_CAPTURE_MODE
+                }
+            self.backend = create_backend(settings.CAPTURE_BACKEND, **options)
+        return self.backend
+    
+    def set_codec(self, codec: str) -> str:
+        """Switch between "jpeg" and "h264" streaming and return the codec actually used"""
+        if codec == "h264" and not VIDEO_CODECS_AVAILABLE:
+            logger.warning("⚠️ PyAV not installed - streaming with JPEG instead of H.264")
+            codec = "jpeg"
+        if codec not in ("jpeg", "h264"):
+            codec = "jpeg"
+        if codec != self.codec:
+            logger.info(f"🎞️ Stream codec switched from {self.codec} to {codec}")
+            self.codec = codec
+            self._refinement_pending = False
+            self.request_keyframe()
+        return self.codec
+    
+    def request_keyframe(self):
+        """Force the next capture to send a full frame (e.g. for a newly joined client)"""
+        self._keyframe_requested = True
+    
+    def _find_dirty_tiles(self, frame: np.ndarray, previous: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Return a (rows, cols) boolean grid of changed tiles, or None if a full frame is needed"""
+        if previous is None or previous.shape != frame.shape:
+            return None
+        
+        height, width = frame.shape[:2]
+        tile = self.tile_size
+        rows = -(-height // tile)
+        cols = -(-width // tile)
+        
+        changed = np.zeros((rows * tile, cols * tile), dtype=bool)
+        np.any(frame != previous, axis=2, out=changed[:height, :width])
+        return changed.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+    
+    def _dirty_rects(self, dirty: np.ndarray, width: int, height: int) -> List[tuple]:
+        """Merge horizontally adjacent dirty tiles into (x, y, w, h) rectangles"""
+        tile = self.tile_size
+        rects = []
+        for row, cols in enumerate(dirty):
+            indices = np.flatnonzero(cols)
+            if indices.size == 0:
+                continue
+            # Split the changed columns of this row into contiguous runs
+            breaks = np.flatnonzero(np.diff(indices) > 1)
+            starts = np.concatenate(([indices[0]], indices[breaks + 1]))
+            ends = np.concatenate((indices[breaks], [indices[-1]]))
+            y = row * tile
+            h = min(tile, height - y)
+            for start, end in zip(starts, ends):
+                x = int(start) * tile
+                w = min((int(end) + 1) * tile, width) - x
+                rects.append((x, y, w, h))
+        return rects
+    
+    def _encode_jpeg(self, image: Image.Image, quality: Optional[int] = None, optimize: bool = True) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=quality or self.quality, optimize=optimize)
+        return buffer.getvalue()
+    
+    def _motion_quality(self) -> int:
+        return min(self.quality, self.motion_quality) if self.progressive else self.quality
+    
+    def _build_frame(self, screen_info: dict, tiles: list, keyframe: bool, codec: int = CODEC_JPEG) -> dict:
+        """Pack encoded tiles into a binary frame message"""
+        self._frame_id = (self._frame_id + 1) & 0xFFFFFFFF
+        self._register_transform(self._frame_id, screen_info)
+        return {
+            "frame_id": self._frame_id,
+            "keyframe": keyframe,
+            "payload": encode_frame(self._frame_id, screen_info, tiles, keyframe=keyframe, codec=codec),
+            **screen_info
+        }
+    
+    def _register_transform(self, frame_id: int, screen_info: dict):
+        screen_width, screen_height = self.input_screen_size or (
+            screen_info["actual_screen_width"], screen_info["actual_screen_height"])
+        canvas_width, canvas_height = screen_info["canvas_width"], screen_info["canvas_height"]
+        if not self.transform.matches(canvas_width, canvas_height, screen_width, screen_height):
+            self.transform = CoordinateTransform(canvas_width, canvas_height, screen_width, screen_height)
+        
+        self._frame_transforms[frame_id] = self.transform
+        if len(self._frame_transforms) > self.transform_history_size:
+            self._frame_transforms.popitem(last=False)
+    
+    def transform_for_frame(self, frame_id: Optional[int] = None) -> CoordinateTransform:
+        """Return the coordinate mapping of a sent frame, or the current one if it is unknown"""
+        if frame_id is not None:
+            transform = self._frame_transforms.get(frame_id)
+            if transform is not None:
+                return transform
+        return self.transform
+    
+    def transform_for_canvas(self, canvas_width: int, canvas_height: int) -> CoordinateTransform:
+        """Map coordinates given on a canvas of another size (e.g. a WebRTC video) to the screen"""
+        transform = self.transform
+        if transform.canvas_width == canvas_width and transform.canvas_height == canvas_height:
+            return transform
+        return CoordinateTransform(canvas_width, canvas_height, transform.screen_width, transform.screen_height)
+    
+    def video_frame(self) -> Optional[np.ndarray]:
+        """The latest scaled RGB frame, or None before the first capture"""
+        return self._video_frame
+    
+    def _screen_info(self, canvas_width: int, canvas_height: int, scale_factor: Optional[float] = None) -> dict:
+        return {
+            "actual_screen_width": self.actual_screen_width,
+            "actual_screen_height": self.actual_screen_height,
+            "canvas_width": canvas_width,
+            "canvas_height": canvas_height,
+            "scale_factor": self.scale_factor if scale_factor is None else scale_factor
+        }
+    
+    def _capture_refinement(self, raw: np.ndarray) -> dict:
+        """Re-send an idle screen as one high-quality keyframe, then stay silent until it changes.
+        
+        The diff base stays the last streaming frame, so a small change afterwards is still
+        sent as tiles rather than as a keyframe.
+        """
+        self._refinement_pending = False
+        self._refined = True
+        started = time.perf_counter()
+        if self.progressive:
+            # Full resolution so text is crisp; the next change switches back to the streaming scale
+            scale_factor = 1.0
+            screenshot = Image.fromarray(raw)
+            quality = max(self.quality, self.refine_quality)
+        else:
+            scale_factor = self.scale_factor
+            screenshot = self.scaler.scale(Image.fromarray(raw), scale_factor, refine=True)
+            quality = self.quality
+        self._refined_quality = quality
+        
+        canvas_width, canvas_height = screenshot.size
+        resized = time.perf_counter()
+        data = self._encode_jpeg(screenshot, quality=quality)
+        CAPTURE_STAGE_SECONDS.observe(resized - started, stage="resize")
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - resized, stage="encode")
+        frame_logger.debug("✨ Screen idle - sending refinement frame (%d bytes)", len(data))
+        
+        return self._build_frame(self._screen_info(canvas_width, canvas_height, scale_factor),
+                                 [(0, 0, canvas_width, canvas_height, data)], keyframe=True)
+    
+    def _capture_refined_tiles(self, raw: np.ndarray, previous_raw: np.ndarray, started: float) -> Optional[dict]:
+        """Send a small change on top of a full-resolution refinement as full-resolution tiles.
+        
+        Returns None when too much changed; the caller then goes back to the streaming scale.
+        """
+        dirty = self._find_dirty_tiles(raw, previous_raw)
+        if dirty is None or dirty.mean() > self.full_frame_threshold:
+            return None
+        diffed = time.perf_counter()
+        CAPTURE_STAGE_SECONDS.observe(diffed - started, stage="diff")
+        
+        height, width = raw.shape[:2]
+        image = Image.fromarray(raw)
+        tiles = [
+            (x, y, w, h, self._encode_jpeg(image.crop((x, y, x + w, y + h)), quality=self._refined_quality, optimize=False))
+            for x, y, w, h in self._dirty_rects(dirty, width, height)
+        ]
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - diffed, stage="encode")
+        frame_logger.debug("✨ %d/%d tiles changed on the refinement - sending %d regions", dirty.sum(), dirty.size, len(tiles))
+        return self._build_frame(self._screen_info(width, height, 1.0), tiles, keyframe=False)
+    
+    def _capture_video(self, screenshot: Image.Image, started: float, keyframe: bool) -> Optional[dict]:
+        """Encode the whole scaled frame as one H.264 access unit; the encoder does the diffing"""
+        if self._video_encoder is None:
+            self._video_encoder = VideoEncoder()
+        
+        data, keyframe = self._video_encoder.encode(np.asarray(screenshot), self.quality, keyframe=keyframe)
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - started, stage="encode")
+        if not data:
+            return None
+        
+        # yuv420p needs even dimensions, so the canvas may be a pixel smaller than the scaled frame
+        canvas_width, canvas_height = self._video_encoder.size()
+        frame_logger.debug("🎞️ Encoded %s frame - %d bytes", "key" if keyframe else "delta", len(data))
+        return self._build_frame(self._screen_info(canvas_width, canvas_height),
+                                 [(0, 0, canvas_width, canvas_height, data)], keyframe=keyframe, codec=CODEC_H264)
+    
+    def _screen_resized(self, width: int, height: int):
+        # A resolution change or monitor hot-plug also moves the injection coordinate space
+        logger.info(f"🖥️ Screen size changed to {width}x{height}")
+        self.actual_screen_width, self.actual_screen_height = width, height
+        if self.input_size_provider is not None:
+            self.input_screen_size = self.input_size_provider()
+    
     def capture_screen(self) -> Optional[dict]:
+        """Capture the screen and return a full frame, the changed tiles, or None if nothing changed"""
+        # Read and clear the request once: one made by the event loop during this capture
+        # is kept for the next capture instead of being cleared unseen
+        force_keyframe = self._keyframe_requested
+        self._keyframe_requested = False
         try:
             if self.is_headless:
+                # The demo screen only changes with the stream settings, so send it once per change
+                settings_key = (self.scale_factor, self.quality)
+                if not force_keyframe and settings_key == self._dummy_sent_key:
+                    return None
+                self._dummy_sent_key = settings_key
+                
                 # Create a dummy screen for demo purposes in production
                 return self.create_dummy_screen()
             
-            logger.info("📸 Capturing screen...")
+            # The backend may reuse its buffers; a frame stays valid until the next-but-one grab
+            started = time.perf_counter()
+            raw = self._get_backend().grab()
+            height, width = raw.shape[:2]
+            if (width, height) != (self.actual_screen_width, self.actual_screen_height):
+                self._screen_resized(width, height)
+            grabbed = time.perf_counter()
+            CAPTURE_STAGE_SECONDS.observe(grabbed - started, stage="grab")
             
-            # Try to get actual screen dimensions
-            try:
-                import pyautogui
-                self.actual_screen_width, self.actual_screen_height = pyautogui.size()
-                screenshot = pyautogui.screenshot()
-            except Exception:
-                # Fallback to PIL
-                screenshot = ImageGrab.grab()
-                self.actual_screen_width, self.actual_screen_height = screenshot.size
+            # Skip scaling and encoding entirely when the raw frame is identical
+            previous_raw = self._previous_raw
+            self._previous_raw = raw
+            if (not force_keyframe and previous_raw is not None
+                    and previous_raw.shape == raw.shape and np.array_equal(previous_raw, raw)):
+                # No refinement while a congested viewer holds the stream below its preset;
+                # it stays pending until the controller climbs back up
+                if (self._refinement_pending and time.monotonic() - self._last_change_time >= self.refine_after
+                        and self.bitrate_controller.at_ceiling()):
+                    return self._capture_refinement(raw)
+                frame_logger.debug("💤 Screen unchanged - skipping frame")
+                return None
             
-            logger.info(f"📐 Screen size: {self.actual_screen_width}x{self.actual_screen_height}")
+            self._last_change_time = time.monotonic()
+            video = self.codec == "h264"
+            refined = self._refined and not force_keyframe and not video
+            refinable = self.progressive or self.scale_factor != 1.0
             
             # Resize for streaming performance
-            if self.scale_factor != 1.0:
-                new_size = (int(screenshot.width * self.scale_factor), 
-                           int(screenshot.height * self.scale_factor))
-                screenshot = screenshot.resize(new_size, Image.Resampling.LANCZOS)
-                logger.info(f"📏 Resized to: {new_size}")
+            screenshot = self.scaler.scale(Image.fromarray(raw), self.scale_factor)
+            resized = time.perf_counter()
+            CAPTURE_STAGE_SECONDS.observe(resized - grabbed, stage="resize")
+            frame = np.asarray(screenshot)
+            self._video_frame = frame  # A new array every frame, so WebRTC tracks can read it from the event loop
+            
+            if video:
+                self._refinement_pending = self._refined = False
+                return self._capture_video(screenshot, resized, force_keyframe)
+            
+            if refined and self.progressive:
+                # The client's canvas holds the full-resolution refinement; tiles at the
+                # streaming scale would not fit it
+                update = self._capture_refined_tiles(raw, previous_raw, resized)
+                if update is not None:
+                    self._previous_frame = frame
+                    return update
+                refined = False
+                force_keyframe = True
             
             canvas_width, canvas_height = screenshot.size
+            screen_info = self._screen_info(canvas_width, canvas_height)
+            
+            # Compare against the previously sent frame tile by tile
+            dirty = None if force_keyframe else self._find_dirty_tiles(frame, self._previous_frame)
+            self._previous_frame = frame
+            diffed = time.perf_counter()
+            CAPTURE_STAGE_SECONDS.observe(diffed - resized, stage="diff")
+            
+            if dirty is not None:
+                if not dirty.any():
+                    frame_logger.debug("💤 No tiles changed after scaling - skipping frame")
+                    return None
+                
+                if dirty.mean() <= self.full_frame_threshold:
+                    tiles = [
+                        (x, y, w, h, self._encode_jpeg(screenshot.crop((x, y, x + w, y + h)),
+                                                       quality=self._motion_quality(), optimize=False))
+                        for x, y, w, h in self._dirty_rects(dirty, canvas_width, canvas_height)
+                    ]
+                    CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - diffed, stage="encode")
+                    
+                    frame_logger.debug("✅ %d/%d tiles changed - sending %d regions", dirty.sum(), dirty.size, len(tiles))
+                    # Small changes on top of a refinement don't call for another one
+                    self._refinement_pending = refinable and not refined
+                    return self._build_frame(screen_info, tiles, keyframe=False)
             
-            # Convert to JPEG and encode to base64
-            buffer = io.BytesIO()
-            screenshot.save(buffer, format='JPEG', quality=self.quality, optimize=True)
-            img_str = base64.b64encode(buffer.getvalue()).decode()
+            # Convert the whole frame to JPEG
+            data = self._encode_jpeg(screenshot, quality=self._motion_quality(), optimize=False)
+            CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - diffed, stage="encode")
             
-            logger.info(f"✅ Screen captured successfully - {len(img_str)} bytes")
+            frame_logger.debug("📸 Captured %dx%d screen - %d bytes", self.actual_screen_width, self.actual_screen_height, len(data))
+            self._refinement_pending = refinable
+            self._refined = False
             
-            return {
-                "frame": f"data:image/jpeg;base64,{img_str}",
-                "actual_screen_width": self.actual_screen_width,
-                "actual_screen_height": self.actual_screen_height,
-                "canvas_width": canvas_width,
-                "canvas_height": canvas_height,
-                "scale_factor": self.scale_factor
-            }
+            return self._build_frame(screen_info, [(0, 0, canvas_width, canvas_height, data)], keyframe=True)
             
         except Exception as e:
             logger.error(f"❌ Screen capture error: {e}")
+            self._previous_frame = None  # The fallback frame replaces the client's canvas
+            self._refined = False
             return self.create_dummy_screen()
     
-    def create_dummy_screen(self) -> dict:
-        """Create a dummy screen for demo in headless environment"""
+    def _render_dummy_screen(self, scale_factor: float, quality: int) -> Tuple[dict, bytes]:
+        """Draw and encode the demo screen for one set of stream settings"""
+        # Create a simple demo image
+        width, height = int(1920 * scale_factor), int(1080 * scale_factor)
+        image = Image.new('RGB', (width, height), color='#2c3e50')
+        
+        # Add some demo content
         try:
-            # Create a simple demo image
-            width, height = int(1920 * self.scale_factor), int(1080 * self.scale_factor)
-            image = Image.new('RGB', (width, height), color='#2c3e50')
+            from PIL import ImageDraw, ImageFont
+            draw = ImageDraw.Draw(image)
             
-            # Add some demo content
+            # Try to use a default font, fallback to basic if not available
             try:
-                from PIL import ImageDraw, ImageFont
-                draw = ImageDraw.Draw(image)
-                
-                # Try to use a default font, fallback to basic if not available
-                try:
-                    font = ImageFont.truetype("arial.ttf", 48)
-                except:
-                    font = ImageFont.load_default()
-                
-                text = "Remote Desktop Demo\n\nRunning on Render\n\nConnect from client to test!"
-                draw.multiline_text((width//4, height//3), text, fill='white', font=font, align='center')
-                
-            except Exception as e:
-                logger.warning(f"Could not add text to demo image: {e}")
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            image.save(buffer, format='JPEG', quality=self.quality)
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            return {
-                "frame": f"data:image/jpeg;base64,{img_str}",
-                "actual_screen_width": 1920,
-                "actual_screen_height": 1080,
-                "canvas_width": width,
-                "canvas_height": height,
-                "scale_factor": self.scale_factor
-            }
+                font = ImageFont.truetype("arial.ttf", 48)
+            except:
+                font = ImageFont.load_default()
+            
+            text = "Remote Desktop Demo\n\nRunning on Render\n\nConnect from client to test!"
+            draw.multiline_text((width//4, height//3), text, fill='white', font=font, align='center')
+            
+        except Exception as e:
+            logger.warning(f"Could not add text to demo image: {e}")
+        
+        data = self._encode_jpeg(image, quality=quality, optimize=False)
+        
+        screen_info = {
+            "actual_screen_width": 1920,
+            "actual_screen_height": 1080,
+            "canvas_width": width,
+            "canvas_height": height,
+            "scale_factor": scale_factor
+        }
+        return screen_info, data
+    
+    def create_dummy_screen(self) -> Optional[dict]:
+        """Create a dummy screen for demo in headless environment"""
+        try:
+            # Rendering is memoized per (scale_factor, quality); only the frame header is rebuilt
+            key = (self.scale_factor, self.quality)
+            cached = self._dummy_frames.get(key)
+            if cached is None:
+                cached = self._dummy_frames[key] = self._render_dummy_screen(*key)
+                if len(self._dummy_frames) > self.dummy_cache_size:
+                    self._dummy_frames.popitem(last=False)
+            else:
+                self._dummy_frames.move_to_end(key)
+            
+            screen_info, data = cached
+            tile = (0, 0, screen_info["canvas_width"], screen_info["canvas_height"], data)
+            return self._build_frame(screen_info, [tile], keyframe=True)
             
         except Exception as e:
             logger.error(f"Failed to create dummy screen: {e}")
             return None
     
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # A single worker keeps captures ordered, which the tile diff relies on
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screen-capture")
+        return self._executor
+    
+    async def _capture_loop(self, frames: asyncio.Queue):
+        """Grab, scale and encode frames in the worker pool and hand them to the sender"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        next_frame_time = loop.time()
+        
+        try:
+            while self.is_capturing:
+                try:
+                    screen_data = await loop.run_in_executor(executor, self.capture_screen)
+                    
+                    if screen_data:
+                        # Blocks while the sender is behind, so capture never outruns delivery
+                        await frames.put(screen_data)
+                    
+                    # Read every frame since the bitrate controller may change it
+                    next_frame_time += 1.0 / self.fps
+                    delay = next_frame_time - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        # Running behind - don't try to catch up with a burst of frames
+                        next_frame_time = loop.time()
+                        await asyncio.sleep(0)
+                    
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Capture error: {e}")
+                    await asyncio.sleep(1)
+                    next_frame_time = loop.time()
+        finally:
+            # Wake the sender so it can finish
+            if frames.full():
+                frames.get_nowait()
+            frames.put_nowait(None)
+    
     async def start_streaming(self, websocket_manager, host_connection_id: str, fps: int = 15):
         logger.info(f"🚀 Starting screen streaming for host: {host_connection_id} at {fps} FPS")
         
         self.is_capturing = True
-        frame_delay = 1.0 / fps
+        self.fps = fps
+        self.request_keyframe()
+        self._stream_task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
         frame_count = 0
+        last_resync = 0.0
+        fps_window_start = loop.time()
+        fps_window_frames = 0
         
-        while self.is_capturing:
-            try:
-                logger.debug(f"📸 Capturing frame #{frame_count}")
-                screen_data = self.capture_screen()
+        frames = asyncio.Queue(maxsize=self.frame_queue_size)
+        producer = asyncio.create_task(self._capture_loop(frames))
+        self._frame_queue = frames
+        
+        try:
+            while True:
+                try:
+                    # Wake at least once a second so an idle screen reports its falling rate
+                    screen_data = await asyncio.wait_for(frames.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    now = loop.time()
+                    STREAM_FPS.set(fps_window_frames / (now - fps_window_start), host=host_connection_id)
+                    fps_window_start = now
+                    fps_window_frames = 0
+                    continue
+                if screen_data is None:
+                    break
                 
-                if screen_data:
-                    message = {
-                        "type": "screen_frame",
-                        "data": screen_data
-                    }
+                try:
+                    # Encoded once; the host preview and every viewer get the same bytes
+                    recipients = websocket_manager.get_stream_recipients(host_connection_id)
+                    websocket_manager.broadcast_bytes(screen_data["payload"], recipients, screen_data["keyframe"])
+                    self.bitrate_controller.on_frame_sent(screen_data["frame_id"])
+                    keyframe_label = "true" if screen_data["keyframe"] else "false"
+                    FRAME_BYTES.observe(len(screen_data["payload"]), keyframe=keyframe_label)
+                    FRAMES_ENCODED.inc(keyframe=keyframe_label)
                     
-                    # Send to host (for preview)
-                    await websocket_manager.send_personal_message(message, host_connection_id)
+                    # Adapt quality, scale and FPS to the viewers (the host preview doesn't count)
+                    viewer_stats = {
+                        connection_id: websocket_manager.get_connection_stats(connection_id)
+                        for connection_id in recipients if connection_id != host_connection_id
+                    }
+                    if self.bitrate_controller.evaluate(viewer_stats):
+                        self.quality, self.scale_factor, self.fps = self.bitrate_controller.current_settings()
+                        self.request_keyframe()
+                        logger.info(f"🎚️ Adapted stream to quality {self.quality}, scale {self.scale_factor}, {self.fps} FPS")
                     
-                    # Send to connected clients
-                    for session_id, session in websocket_manager.sessions.items():
-                        if session["host_id"] == host_connection_id:
-                            client_id = session.get("client_id")
-                            if client_id and client_id in websocket_manager.active_connections:
-                                await websocket_manager.send_personal_message(message, client_id)
-                            break
+                    # A viewer that lost a tile update needs a full frame to resync. One that lost
+                    # an H.264 delta can decode nothing until it gets one, so that isn't rate limited
+                    now = loop.time()
+                    if ((self.codec == "h264" or now - last_resync >= self.resync_interval)
+                            and websocket_manager.consume_keyframe_requests(recipients)):
+                        last_resync = now
+                        self.request_keyframe()
                     
                     frame_count += 1
+                    fps_window_frames += 1
+                    if now - fps_window_start >= 1.0:
+                        STREAM_FPS.set(fps_window_frames / (now - fps_window_start), host=host_connection_id)
+                        fps_window_start = now
+                        fps_window_frames = 0
                     if frame_count % 30 == 0:  # Log every 30 frames
                         logger.info(f"📤 Sent {frame_count} frames")
-                
-                await asyncio.sleep(frame_delay)
-                
-            except Exception as e:
-                logger.error(f"❌ Streaming error at frame #{frame_count}: {e}")
-                await asyncio.sleep(1)
-        
-        self.is_capturing = False
-        logger.info(f"🛑 Screen streaming stopped after {frame_count} frames")
+                    
+                except Exception as e:
+                    logger.error(f"❌ Streaming error at frame #{frame_count}: {e}")
+        finally:
+            producer.cancel()
+            STREAM_FPS.remove(host=host_connection_id)
+            if self._stream_task is asyncio.current_task():
+                self._stream_task = None
+                self._frame_queue = None
+                self.is_capturing = False
+            logger.info(f"🛑 Screen streaming stopped after {frame_count} frames")
+    
+    def frame_queue_depth(self) -> int:
+        """Encoded frames waiting to be fanned out"""
+        return self._frame_queue.qsize() if self._frame_queue is not None else 0
+    
+    def start(self, websocket_manager, host_connection_id: str, fps: int = 15) -> asyncio.Task:
+        """Replace any running stream with a new one; the task is tracked so stop_streaming always finds it"""
+        self.stop_streaming()
+        self._stream_task = asyncio.create_task(self.start_streaming(websocket_manager, host_connection_id, fps))
+        return self._stream_task
     
     def stop_streaming(self):
         logger.info("🛑 Stopping screen streaming...")
         self.is_capturing = False
-
-screen_capture = ScreenCapture()
+        if self._stream_task is not None and not self._stream_task.done():
+            self._stream_task.cancel()
+        self._stream_task = None
+    
+    def close(self):
+        """Stop streaming and release the capture thread and backend"""
+        self.stop_streaming()
+        backend, self.backend = self.backend, None
+        encoder, self._video_encoder = self._video_encoder, None
+        if self._executor is not None:
+            # Both were used on the capture thread; close them there after any in-flight grab
+            if backend is not None:
+                self._executor.submit(backend.close)
+            if encoder is not None:
+                self._executor.submit(encoder.close)
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        else:
+            if backend is not None:
+                backend.close()
+            if encoder is not None:
+                encoder.close()
@@ -0,0 +1,155 @@
+"""Shared directory of connections and sessions for running several workers.
+
+A session, its capture and its pending requests live on the worker that holds the
+host's WebSocket. The store only records where things are - which worker owns each
+connection and each session - so a worker can route a join request, a relayed
+message or a screen frame to the worker that can handle it (see worker_bus.py).
+
+Backends:
+    memory  one process; the default with a single worker
+    sqlite  a WAL-mode database file shared by every worker on the machine
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """Where each connection and session lives"""
+
+    def add_connection(self, connection_id: str, worker_id: str):
+        raise NotImplementedError
+
+    def remove_connection(self, connection_id: str):
+        raise NotImplementedError
+
+    def connection_worker(self, connection_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def add_session(self, session_id: str, host_id: str, worker_id: str):
+        raise NotImplementedError
+
+    def remove_session(self, session_id: str):
+        raise NotImplementedError
+
+    def session_worker(self, session_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def remove_worker(self, worker_id: str):
+        """Forget everything a worker owned (at start-up and shutdown)"""
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class MemoryStore(SessionStore):
+    """In-process dictionaries - enough when one worker holds every connection"""
+
+    def __init__(self):
+        self.connections: Dict[str, str] = {}
+        self.sessions: Dict[str, str] = {}
+
+    def add_connection(self, connection_id: str, worker_id: str):
+        self.connections[connection_id] = worker_id
+
+    def remove_connection(self, connection_id: str):
+        self.connections.pop(connection_id, None)
+
+    def connection_worker(self, connection_id: str) -> Optional[str]:
+        return self.connections.get(connection_id)
+
+    def add_session(self, session_id: str, host_id: str, worker_id: str):
+        self.sessions[session_id] = worker_id
+
+    def remove_session(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    def session_worker(self, session_id: str) -> Optional[str]:
+        return self.sessions.get(session_id)
+
+    def remove_worker(self, worker_id: str):
+        for table in (self.connections, self.sessions):
+            for key in [key for key, owner in table.items() if owner == worker_id]:
+                del table[key]
+
+    def counts(self) -> Dict[str, int]:
+        return {"connections": len(self.connections), "sessions": len(self.sessions)}
+
+class SQLiteStore(SessionStore):
+    """SQLite in WAL mode, so every worker reads while one writes.
+
+    Only connects, disconnects and session changes write; per-message routing is
+    cached by ConnectionManager, so the database stays off the hot path.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS connections (connection_id TEXT PRIMARY KEY, worker_id TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, host_id TEXT NOT NULL, worker_id TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS connections_worker ON connections (worker_id)",
+        "CREATE INDEX IF NOT EXISTS sessions_worker ON sessions (worker_id)",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # Routing data is rebuilt on restart; no fsync per write
+        for statement in self.SCHEMA:
+            self._db.execute(statement)
+        logger.info(f"🗄️ Session store: {path}")
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def add_connection(self, connection_id: str, worker_id: str):
+        self._execute("INSERT OR REPLACE INTO connections VALUES (?, ?)", (connection_id, worker_id))
+
+    def remove_connection(self, connection_id: str):
+        self._execute("DELETE FROM connections WHERE connection_id = ?", (connection_id,))
+
+    def connection_worker(self, connection_id: str) -> Optional[str]:
+        rows = self._execute("SELECT worker_id FROM connections WHERE connection_id = ?", (connection_id,))
+        return rows[0][0] if rows else None
+
+    def add_session(self, session_id: str, host_id: str, worker_id: str):
+        self._execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session_id, host_id, worker_id))
+
+    def remove_session(self, session_id: str):
+        self._execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def session_worker(self, session_id: str) -> Optional[str]:
+        rows = self._execute("SELECT worker_id FROM sessions WHERE session_id = ?", (session_id,))
+        return rows[0][0] if rows else None
+
+    def remove_worker(self, worker_id: str):
+        self._execute("DELETE FROM connections WHERE worker_id = ?", (worker_id,))
+        self._execute("DELETE FROM sessions WHERE worker_id = ?", (worker_id,))
+
+    def counts(self) -> Dict[str, int]:
+        connections = self._execute("SELECT COUNT(*) FROM connections")[0][0]
+        sessions = self._execute("SELECT COUNT(*) FROM sessions")[0][0]
+        return {"connections": connections, "sessions": sessions}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def create_store(kind: str, path: str) -> SessionStore:
+    """Create a store by name ("memory" or "sqlite")"""
+    if kind == "sqlite":
+        return SQLiteStore(path)
+    if kind != "memory":
+        raise ValueError(f"Unknown session store: {kind}")
+    return MemoryStore()
@@ -0,0 +1,49 @@
+// Binary screen frame decoder - mirrors frame_protocol.py on the server
+const FRAME_HEADER_SIZE = 24;
+const TILE_HEADER_SIZE = 12;
+const CODEC_JPEG = 1;
+const CODEC_H264 = 2;
+const FLAG_KEYFRAME = 0x01;
+const CODEC_MIME_TYPES = {
+    [CODEC_JPEG]: 'image/jpeg'
+};
+
+function parseScreenFrame(buffer) {
+    const view = new DataView(buffer);
+    if (buffer.byteLength < FRAME_HEADER_SIZE || view.getUint8(0) !== 0x52 || view.getUint8(1) !== 0x44) {
+        throw new Error('Invalid screen frame header');
+    }
+
+    const flags = view.getUint8(4);
+    const tileCount = view.getUint16(6, true);
+    const frame = {
+        frame_id: view.getUint32(8, true),
+        codec: view.getUint8(3),
+        keyframe: (flags & FLAG_KEYFRAME) !== 0,
+        actual_screen_width: view.getUint16(12, true),
+        actual_screen_height: view.getUint16(14, true),
+        canvas_width: view.getUint16(16, true),
+        canvas_height: view.getUint16(18, true),
+        scale_factor: view.getFloat32(20, true),
+        tiles: []
+    };
+
+    let offset = FRAME_HEADER_SIZE;
+    for (let i = 0; i < tileCount; i++) {
+        const length = view.getUint32(offset + 8, true);
+        frame.tiles.push({
+            x: view.getUint16(offset, true),
+            y: view.getUint16(offset + 2, true),
+            width: view.getUint16(offset + 4, true),
+            height: view.getUint16(offset + 6, true),
+            data: new Uint8Array(buffer, offset + TILE_HEADER_SIZE, length)
+        });
+        offset += TILE_HEADER_SIZE + length;
+    }
+    return frame;
+}
+
+function decodeFrameTiles(frame) {
+    const type = CODEC_MIME_TYPES[frame.codec] || 'image/jpeg';
+    return Promise.all(frame.tiles.map((tile) => createImageBitmap(new Blob([tile.data], { type }))));
+}
@@ -0,0 +1,210 @@
+// Screen frame renderer shared by the render worker and the main-thread fallback.
+// Tiles are decoded with createImageBitmap and painted in arrival order; the canvas is
+// only resized when the frame geometry changes. Frames that queue up while a decode is
+// in flight are painted together in one pass, and anything queued before a newer
+// keyframe is dropped without being decoded or painted, since the keyframe covers it.
+//
+// H.264 frames go through a WebCodecs VideoDecoder instead. Decoding starts at a
+// keyframe, and a keyframe that finds older frames still queued resets the decoder
+// so they are skipped. A gap in the frame ids means the server dropped a delta the
+// next ones predict from, so decoding stops until the keyframe it sends to resync.
+const H264_CODEC_STRING = 'avc1.42E033';  // Constrained baseline, level 5.1 - what the host's x264 emits
+
+// Codecs this browser can decode besides JPEG, sent to the server when joining a session
+async function detectVideoCodecs() {
+    if (typeof VideoDecoder === 'undefined') {
+        return [];
+    }
+    try {
+        const support = await VideoDecoder.isConfigSupported({ codec: H264_CODEC_STRING, optimizeForLatency: true });
+        return support.supported ? ['h264'] : [];
+    } catch (error) {
+        return [];
+    }
+}
+
+class FrameRenderer {
+    constructor(canvas, onPainted) {
+        this.canvas = canvas;
+        this.ctx = canvas.getContext('2d');
+        this.onPainted = onPainted;
+        this.pending = [];
+        this.busy = false;
+        this.geometry = null;
+        this.framesDropped = 0;
+        this.decoder = null;
+        this.videoFrames = new Map();  // frame_id -> header of frames inside the video decoder
+        this.lastVideoFrameId = null;
+    }
+
+    push(buffer) {
+        let frame;
+        try {
+            frame = parseScreenFrame(buffer);
+        } catch (error) {
+            console.error('❌ Invalid frame data format:', error);
+            return;
+        }
+
+        if (frame.codec === CODEC_H264) {
+            this.pushVideo(frame);
+            return;
+        }
+        if (this.decoder && frame.keyframe) {
+            this.closeDecoder();  // Back to JPEG; late video output must not paint over it
+        }
+
+        if (frame.keyframe) {
+            this.framesDropped += this.pending.length;
+            this.pending = [frame];
+        } else {
+            this.pending.push(frame);
+        }
+
+        if (!this.busy) {
+            this.pump();
+        }
+    }
+
+    async pump() {
+        this.busy = true;
+        try {
+            while (this.pending.length) {
+                const batch = this.pending;
+                this.pending = [];
+                const decoded = await Promise.all(batch.map((frame) => decodeFrameTiles(frame)));
+
+                if (this.pending.length && this.pending[0].keyframe) {
+                    // A keyframe arrived while decoding and would paint over this batch at once
+                    this.framesDropped += batch.length;
+                    decoded.forEach((bitmaps) => bitmaps.forEach((bitmap) => bitmap.close()));
+                    continue;
+                }
+                this.paint(batch, decoded);
+            }
+        } catch (error) {
+            console.error('❌ Error decoding frame:', error);
+        } finally {
+            this.busy = false;
+        }
+    }
+
+    paint(batch, decoded) {
+        let painted = null;
+        batch.forEach((frame, index) => {
+            const bitmaps = decoded[index];
+            const sameGeometry = this.geometry &&
+                this.geometry.width === frame.canvas_width &&
+                this.geometry.height === frame.canvas_height;
+
+            if (frame.keyframe) {
+                if (!sameGeometry) {
+                    // Resizing reallocates the backing store, so only do it when the size changes
+                    this.canvas.width = frame.canvas_width;
+                    this.canvas.height = frame.canvas_height;
+                    this.geometry = { width: frame.canvas_width, height: frame.canvas_height };
+                }
+            } else if (!sameGeometry) {
+                // Tiles only apply on top of a keyframe with the same geometry
+                bitmaps.forEach((bitmap) => bitmap.close());
+                return;
+            }
+
+            bitmaps.forEach((bitmap, tileIndex) => {
+                const tile = frame.tiles[tileIndex];
+                this.ctx.drawImage(bitmap, tile.x, tile.y);
+                bitmap.close();
+            });
+            painted = frame;
+        });
+
+        if (painted) {
+            this.onPainted({
+                frame_id: painted.frame_id,
+                keyframe: batch.some((frame) => frame.keyframe),
+                actual_screen_width: painted.actual_screen_width,
+                actual_screen_height: painted.actual_screen_height,
+                canvas_width: painted.canvas_width,
+                canvas_height: painted.canvas_height,
+                scale_factor: painted.scale_factor
+            });
+        }
+    }
+
+    pushVideo(frame) {
+        if (this.decoder && !frame.keyframe && frame.frame_id !== ((this.lastVideoFrameId + 1) >>> 0)) {
+            this.closeDecoder();  // Decoding past a missing delta would paint garbage
+        }
+        if (!this.decoder) {
+            if (!frame.keyframe) {
+                this.framesDropped++;  // Nothing to predict from until the next keyframe
+                return;
+            }
+            this.decoder = new VideoDecoder({
+                output: (videoFrame) => this.paintVideo(videoFrame),
+                error: (error) => {
+                    console.error('❌ Video decoder error:', error);
+                    this.closeDecoder();
+                }
+            });
+            this.decoder.configure({ codec: H264_CODEC_STRING, optimizeForLatency: true });
+        } else if (frame.keyframe && this.decoder.decodeQueueSize > 0) {
+            // Frames still waiting would only be painted over by this keyframe
+            this.framesDropped += this.decoder.decodeQueueSize;
+            this.decoder.reset();
+            this.videoFrames.clear();
+            this.decoder.configure({ codec: H264_CODEC_STRING, optimizeForLatency: true });
+        }
+
+        const tile = frame.tiles[0];
+        this.lastVideoFrameId = frame.frame_id;
+        this.videoFrames.set(frame.frame_id, frame);
+        this.decoder.decode(new EncodedVideoChunk({
+            type: frame.keyframe ? 'key' : 'delta',
+            timestamp: frame.frame_id,
+            data: tile.data
+        }));
+    }
+
+    paintVideo(videoFrame) {
+        const frame = this.videoFrames.get(videoFrame.timestamp);
+        this.videoFrames.delete(videoFrame.timestamp);
+        if (!frame) {
+            videoFrame.close();
+            return;
+        }
+
+        if (!this.geometry || this.geometry.width !== frame.canvas_width || this.geometry.height !== frame.canvas_height) {
+            this.canvas.width = frame.canvas_width;
+            this.canvas.height = frame.canvas_height;
+            this.geometry = { width: frame.canvas_width, height: frame.canvas_height };
+        }
+        this.ctx.drawImage(videoFrame, 0, 0, frame.canvas_width, frame.canvas_height);
+        videoFrame.close();
+
+        this.onPainted({
+            frame_id: frame.frame_id,
+            keyframe: frame.keyframe,
+            actual_screen_width: frame.actual_screen_width,
+            actual_screen_height: frame.actual_screen_height,
+            canvas_width: frame.canvas_width,
+            canvas_height: frame.canvas_height,
+            scale_factor: frame.scale_factor
+        });
+    }
+
+    closeDecoder() {
+        if (this.decoder && this.decoder.state !== 'closed') {
+            this.decoder.close();
+        }
+        this.decoder = null;
+        this.videoFrames.clear();
+    }
+
+    snapshot() {
+        if (this.canvas.convertToBlob) {
+            return this.canvas.convertToBlob({ type: 'image/png' });
+        }
+        return new Promise((resolve) => this.canvas.toBlob(resolve, 'image/png'));
+    }
+}
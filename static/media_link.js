@@ -0,0 +1,95 @@
+// WebRTC media path - the host's screen arrives as a video track and pointer motion
+// leaves over an unordered, unreliable data channel, so a lost move is simply replaced
+// by the next one. Clicks and keys stay on the ordered WebSocket.
+// Signaling uses the offer/answer/ice_candidate messages, marked "media" so the server
+// answers them itself instead of relaying them. No TURN - meant for a LAN.
+class MediaLink {
+    constructor(video, sendSignal, onStateChange) {
+        this.video = video;
+        this.sendSignal = sendSignal;
+        this.onStateChange = onStateChange;
+        this.peer = null;
+        this.channel = null;
+        this.connected = false;
+        this.maxBufferedAmount = 16 * 1024;  // Skip the channel when it backs up instead of queueing stale moves
+    }
+
+    static isSupported() {
+        return typeof RTCPeerConnection !== 'undefined';
+    }
+
+    async start() {
+        this.close();
+        const peer = new RTCPeerConnection({ iceServers: [] });
+        this.peer = peer;
+
+        peer.addTransceiver('video', { direction: 'recvonly' });
+        this.channel = peer.createDataChannel('input', { ordered: false, maxRetransmits: 0 });
+
+        peer.ontrack = (event) => {
+            this.video.srcObject = event.streams[0] || new MediaStream([event.track]);
+        };
+        peer.onicecandidate = (event) => {
+            if (event.candidate) {
+                this.sendSignal('ice_candidate', {
+                    media: true,
+                    candidate: event.candidate.candidate,
+                    sdpMid: event.candidate.sdpMid,
+                    sdpMLineIndex: event.candidate.sdpMLineIndex
+                });
+            }
+        };
+        peer.onconnectionstatechange = () => {
+            if (this.peer !== peer) return;
+            const state = peer.connectionState;
+            console.log('📡 WebRTC media:', state);
+            if (state === 'connected') {
+                this.setConnected(true);
+            } else if (state === 'failed' || state === 'closed') {
+                this.close();
+            }
+        };
+
+        const offer = await peer.createOffer();
+        await peer.setLocalDescription(offer);
+        this.sendSignal('offer', { media: true, type: offer.type, sdp: offer.sdp });
+    }
+
+    async handleAnswer(data) {
+        if (this.peer) {
+            await this.peer.setRemoteDescription({ type: data.type, sdp: data.sdp });
+        }
+    }
+
+    // Returns false when the caller should use the WebSocket instead
+    send(message) {
+        if (!this.connected || !this.channel || this.channel.readyState !== 'open' ||
+            this.channel.bufferedAmount > this.maxBufferedAmount) {
+            return false;
+        }
+        this.channel.send(JSON.stringify(message));
+        return true;
+    }
+
+    videoSize() {
+        return { width: this.video.videoWidth, height: this.video.videoHeight };
+    }
+
+    setConnected(connected) {
+        if (this.connected !== connected) {
+            this.connected = connected;
+            this.onStateChange(connected);
+        }
+    }
+
+    close() {
+        const peer = this.peer;
+        this.peer = null;
+        this.channel = null;
+        if (peer) {
+            peer.close();
+        }
+        this.video.srcObject = null;
+        this.setConnected(false);
+    }
+}
@@ -0,0 +1,27 @@
+// Decodes and paints screen frames off the main thread onto the canvas handed over by client.html
+importScripts('/static/frame_protocol.js', '/static/frame_renderer.js');
+
+let renderer = null;
+
+self.onmessage = (event) => {
+    const message = event.data;
+    switch (message.type) {
+        case 'init':
+            renderer = new FrameRenderer(message.canvas, (frame) => {
+                self.postMessage({ type: 'painted', frame: frame });
+            });
+            break;
+
+        case 'frame':
+            if (renderer) {
+                renderer.push(message.buffer);
+            }
+            break;
+
+        case 'snapshot':
+            if (renderer) {
+                renderer.snapshot().then((blob) => self.postMessage({ type: 'snapshot', blob: blob }));
+            }
+            break;
+    }
+};
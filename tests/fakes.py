@@ -0,0 +1,36 @@
+"""Stand-ins for the WebSocket and screen capture used by ConnectionManager tests"""
+
+class FakeWebSocket:
+    def __init__(self):
+        self.accepted = False
+        self.closed_with = None
+        self.sent = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    async def send_text(self, text: str):
+        self.sent.append(text)
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+class FakeCapture:
+    def __init__(self, capturing: bool = False):
+        self.is_capturing = capturing
+        self.closed = False
+        self.codec = "jpeg"
+
+    def close(self):
+        self.closed = True
+        self.is_capturing = False
+
+    def set_codec(self, codec: str) -> str:
+        self.codec = codec
+        return codec
+
+    def request_keyframe(self):
+        pass
@@ -0,0 +1,64 @@
+from adaptive_bitrate import QUALITY_LADDER, QUALITY_PRESETS, AdaptiveBitrateController
+
+T = 1000.0  # Like time.monotonic(), well past the controller's first evaluation interval
+
+def stats(queued: int = 0, dropped: int = 0, latency: float = 0.01) -> dict:
+    return {"frames_queued": queued, "frames_dropped": dropped, "frame_latency": latency}
+
+def congested_controller() -> AdaptiveBitrateController:
+    """A medium-preset controller whose only viewer was stepped down once at T + 1"""
+    controller = AdaptiveBitrateController("medium")
+    controller.evaluate({"v": stats()}, now=T + 0.0)
+    assert controller.evaluate({"v": stats(queued=10, dropped=5)}, now=T + 1.0)
+    return controller
+
+def test_starts_at_the_preset_ceiling():
+    controller = AdaptiveBitrateController("low")
+    assert controller.level == QUALITY_PRESETS["low"]
+    assert controller.current_settings() == QUALITY_LADDER[QUALITY_PRESETS["low"]]
+    assert controller.at_ceiling()
+
+def test_dropped_frames_step_down():
+    controller = congested_controller()
+    assert controller.level == QUALITY_PRESETS["medium"] - 1
+    assert not controller.at_ceiling()
+
+def test_step_down_waits_for_the_cooldown():
+    controller = congested_controller()
+    assert not controller.evaluate({"v": stats(queued=20, dropped=10)}, now=T + 1.5)
+    assert controller.evaluate({"v": stats(queued=30, dropped=15)}, now=T + 2.0)
+    assert controller.level == QUALITY_PRESETS["medium"] - 2
+
+def test_slow_acks_step_down():
+    controller = AdaptiveBitrateController("medium")
+    controller.evaluate({"v": stats()}, now=T + 0.0)
+    controller.on_frame_sent(1, now=T + 0.5)
+    controller.on_ack("v", 1, now=T + 1.3)
+    assert controller.evaluate({"v": stats(queued=10)}, now=T + 1.5)
+    assert controller.level == QUALITY_PRESETS["medium"] - 1
+
+def test_healthy_delivery_steps_up_to_the_ceiling_only():
+    controller = congested_controller()
+    controller.evaluate({"v": stats(queued=20, dropped=5)}, now=T + 1.5)  # Healthy from here
+    assert not controller.evaluate({"v": stats(queued=30, dropped=5)}, now=T + 4.0)
+    assert controller.evaluate({"v": stats(queued=40, dropped=5)}, now=T + 4.5)
+    assert controller.at_ceiling()
+
+    assert not controller.evaluate({"v": stats(queued=50, dropped=5)}, now=T + 10.0)
+    assert controller.level == QUALITY_PRESETS["medium"]
+
+def test_stream_follows_the_slowest_viewer():
+    controller = AdaptiveBitrateController("medium")
+    controller.evaluate({"fast": stats(), "slow": stats()}, now=T + 0.0)
+    controller.evaluate({"fast": stats(queued=10), "slow": stats(queued=10, dropped=5)}, now=T + 1.0)
+    assert controller.level == QUALITY_PRESETS["medium"] - 1
+
+    # The slow viewer leaving lets the stream return to the ceiling
+    assert controller.evaluate({"fast": stats(queued=20)}, now=T + 1.5)
+    assert controller.at_ceiling()
+
+def test_preset_change_resets_every_viewer():
+    controller = congested_controller()
+    controller.set_preset("high")
+    assert controller.level == QUALITY_PRESETS["high"]
+    assert controller.current_settings() == QUALITY_LADDER[QUALITY_PRESETS["high"]]
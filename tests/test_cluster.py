@@ -0,0 +1,99 @@
+import asyncio
+import tempfile
+
+import pytest
+
+from session_store import MemoryStore, SQLiteStore, create_store
+from worker_bus import WorkerBus
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = create_store(request.param, str(tmp_path / "sessions.db"))
+    yield store
+    store.close()
+
+def test_store_round_trip(store):
+    store.add_connection("host", "w1")
+    store.add_connection("client", "w2")
+    store.add_session("s1", "host", "w1")
+
+    assert store.connection_worker("host") == "w1"
+    assert store.connection_worker("client") == "w2"
+    assert store.session_worker("s1") == "w1"
+    assert store.connection_worker("unknown") is None
+    assert store.counts() == {"connections": 2, "sessions": 1}
+
+    store.remove_connection("client")
+    store.remove_session("s1")
+    assert store.connection_worker("client") is None
+    assert store.session_worker("s1") is None
+
+def test_store_forgets_everything_a_worker_owned(store):
+    store.add_connection("a", "w1")
+    store.add_connection("b", "w2")
+    store.add_session("s1", "a", "w1")
+    store.add_session("s2", "b", "w2")
+
+    store.remove_worker("w1")
+
+    assert store.connection_worker("a") is None
+    assert store.session_worker("s1") is None
+    assert store.connection_worker("b") == "w2"
+    assert store.session_worker("s2") == "w2"
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    try:
+        first.add_session("s1", "host", "w1")
+        assert second.session_worker("s1") == "w1"
+        second.remove_worker("w1")
+        assert first.session_worker("s1") is None
+    finally:
+        first.close()
+        second.close()
+
+def test_unknown_store_is_rejected(tmp_path):
+    assert isinstance(create_store("memory", ""), MemoryStore)
+    with pytest.raises(ValueError):
+        create_store("redis", str(tmp_path / "sessions.db"))
+
+def test_worker_bus_delivers_messages_and_payloads():
+    async def scenario(socket_dir: str):
+        received = []
+        delivered = asyncio.Event()
+
+        async def handler(header: dict, payload: bytes):
+            received.append((header, payload))
+            if len(received) == 2:
+                delivered.set()
+
+        async def ignore(header: dict, payload: bytes):
+            pass
+
+        sender, receiver = WorkerBus("w1", socket_dir), WorkerBus("w2", socket_dir)
+        await sender.start(ignore)
+        await receiver.start(handler)
+        try:
+            assert sender.send_nowait("w2", {"kind": "frame"}, b"dropped") is False  # No link yet
+            assert await sender.send("w2", {"kind": "text", "connection": "c1"}, b"hello")
+            assert sender.send_nowait("w2", {"kind": "frame"}, b"\x00\x01" * 1000)
+            await asyncio.wait_for(delivered.wait(), timeout=5)
+            assert await sender.send("w3", {"kind": "text"}) is False  # Nobody listening
+            return received, sender.stats(), receiver.stats()
+        finally:
+            await sender.close()
+            await receiver.close()
+
+    # Unix socket paths are short; pytest's tmp_path can exceed the limit
+    with tempfile.TemporaryDirectory(prefix="bus") as socket_dir:
+        received, sent, got = asyncio.run(scenario(socket_dir))
+
+    assert received == [
+        ({"kind": "text", "connection": "c1", "from": "w1"}, b"hello"),
+        ({"kind": "frame", "from": "w1"}, b"\x00\x01" * 1000),
+    ]
+    assert sent["frames_dropped"] == 1
+    assert sent["messages_sent"] == 2
+    assert sent["send_errors"] == 1
+    assert got["messages_received"] == 2
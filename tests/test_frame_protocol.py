@@ -0,0 +1,57 @@
+import struct
+
+import pytest
+
+from frame_protocol import CODEC_H264, CODEC_JPEG, FRAME_HEADER, TILE_HEADER, decode_frame, encode_frame
+
+SCREEN_INFO = {
+    "actual_screen_width": 1920,
+    "actual_screen_height": 1080,
+    "canvas_width": 960,
+    "canvas_height": 540,
+    "scale_factor": 0.5
+}
+
+def test_keyframe_round_trip():
+    payload = encode_frame(7, SCREEN_INFO, [(0, 0, 960, 540, b"jpeg-bytes")], keyframe=True)
+    frame = decode_frame(payload)
+
+    assert frame["frame_id"] == 7
+    assert frame["codec"] == CODEC_JPEG
+    assert frame["keyframe"] is True
+    assert {key: frame[key] for key in SCREEN_INFO} == SCREEN_INFO
+    assert [(x, y, w, h, bytes(data)) for x, y, w, h, data in frame["tiles"]] == [(0, 0, 960, 540, b"jpeg-bytes")]
+
+def test_tiles_round_trip_in_order():
+    tiles = [(0, 0, 64, 64, b"a"), (128, 64, 192, 64, b"bb" * 100), (896, 512, 64, 28, b"")]
+    frame = decode_frame(encode_frame(8, SCREEN_INFO, tiles))
+
+    assert frame["keyframe"] is False
+    assert [(x, y, w, h, bytes(data)) for x, y, w, h, data in frame["tiles"]] == tiles
+
+def test_payload_size_is_headers_plus_data():
+    tiles = [(0, 0, 64, 64, b"x" * 10), (64, 0, 64, 64, b"y" * 20)]
+    payload = encode_frame(1, SCREEN_INFO, tiles)
+    assert len(payload) == FRAME_HEADER.size + 2 * TILE_HEADER.size + 30
+
+def test_h264_codec_round_trip():
+    frame = decode_frame(encode_frame(9, SCREEN_INFO, [(0, 0, 960, 540, b"\x00\x00\x00\x01")],
+                                      keyframe=True, codec=CODEC_H264))
+    assert frame["codec"] == CODEC_H264
+    assert frame["keyframe"] is True
+
+def test_frame_id_wraps_to_32_bits():
+    frame = decode_frame(encode_frame(2 ** 32 + 5, SCREEN_INFO, []))
+    assert frame["frame_id"] == 5
+    assert frame["tiles"] == []
+
+def test_frame_id_at_offset_8():
+    # The load generator and clients read the frame id straight from the header
+    payload = encode_frame(0xDEADBEEF, SCREEN_INFO, [])
+    assert struct.unpack_from("<I", payload, 8)[0] == 0xDEADBEEF
+
+def test_bad_magic_is_rejected():
+    payload = bytearray(encode_frame(1, SCREEN_INFO, []))
+    payload[0:2] = b"XX"
+    with pytest.raises(ValueError):
+        decode_frame(bytes(payload))
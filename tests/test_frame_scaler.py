@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from frame_scaler import FrameScaler
+
+def test_integer_factors_use_reduce_and_round_up():
+    scaler = FrameScaler()
+    assert scaler.geometry(101, 51, 0.5) == (51, 26)
+    assert scaler._reduce_factor == 2
+    assert scaler.scale(Image.new("RGB", (101, 51)), 0.5).size == (51, 26)
+
+def test_other_factors_use_bilinear_sizes():
+    scaler = FrameScaler()
+    assert scaler.geometry(1920, 1080, 0.7) == (1344, 756)
+    assert scaler._reduce_factor == 0
+    assert scaler.scale(Image.new("RGB", (100, 50)), 0.7).size == (70, 35)
+
+def test_geometry_is_cached_per_size_and_factor():
+    scaler = FrameScaler()
+    first = scaler.geometry(1920, 1080, 0.5)
+    assert scaler.geometry(1920, 1080, 0.5) is first
+
+    assert scaler.geometry(1280, 720, 0.5) == (640, 360)
+    assert scaler._geometry_key == (1280, 720, 0.5)
+    assert scaler.geometry(1280, 720, 0.75) == (960, 540)
+    assert scaler._reduce_factor == 0
+
+def test_full_scale_returns_the_frame_unchanged():
+    image = Image.new("RGB", (10, 10))
+    assert FrameScaler().scale(image, 1.0) is image
+
+def test_refinement_keeps_the_streaming_geometry():
+    scaler = FrameScaler()
+    refined = scaler.scale(Image.new("RGB", (101, 51)), 0.5, refine=True)
+    assert refined.size == (51, 26)
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from input_pipeline import InputPipeline
+from models import MessageType
+
+MOUSE = MessageType.MOUSE_EVENT
+KEY = MessageType.KEYBOARD_EVENT
+
+class HeldInjector:
+    """Records injected events; the first injection blocks until released so later events queue up"""
+
+    def __init__(self):
+        self.injected = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, data: dict, context) -> bool:
+        if not self.injected:
+            self.started.set()
+            self.release.wait(2)
+        self.injected.append(data)
+        return True
+
+def run(events, source_ids=None):
+    injector = HeldInjector()
+    pipeline = InputPipeline({MOUSE: injector, KEY: injector})
+    pipeline.submit(MOUSE, {"action": "mousemove", "x": 0, "y": 0}, "client")
+    assert injector.started.wait(2)
+    for index, (kind, data) in enumerate(events):
+        pipeline.submit(kind, data, source_ids[index] if source_ids else "client")
+    injector.release.set()
+    pipeline.close()
+    return pipeline, injector.injected[1:]
+
+def move(x: int) -> dict:
+    return {"action": "mousemove", "x": x, "y": x}
+
+def test_consecutive_moves_collapse_to_the_latest():
+    pipeline, injected = run([(MOUSE, move(1)), (MOUSE, move(2)), (MOUSE, move(3))])
+    assert injected == [move(3)]
+    assert pipeline.events_coalesced == 2
+    assert pipeline.events_injected == 2
+
+def test_clicks_and_keys_are_never_merged_or_reordered():
+    down = {"action": "mousedown", "x": 2, "y": 2, "button": "left"}
+    up = {"action": "mouseup", "x": 2, "y": 2, "button": "left"}
+    key = {"action": "keydown", "key": "a"}
+    pipeline, injected = run([(MOUSE, move(1)), (MOUSE, down), (MOUSE, up), (MOUSE, up),
+                              (KEY, key), (KEY, key), (MOUSE, move(2)), (MOUSE, move(3))])
+    assert injected == [move(1), down, up, up, key, key, move(3)]
+
+def test_wheel_deltas_are_summed():
+    pipeline, injected = run([(MOUSE, {"action": "wheel", "x": 5, "y": 5, "deltaY": 100}),
+                              (MOUSE, {"action": "wheel", "x": 5, "y": 5, "deltaY": -30}),
+                              (MOUSE, {"action": "wheel", "x": 5, "y": 5, "deltaY": 50})])
+    assert [event["deltaY"] for event in injected] == [120]
+
+def test_moves_from_different_clients_are_kept_apart():
+    pipeline, injected = run([(MOUSE, move(1)), (MOUSE, move(2)), (MOUSE, move(3))],
+                             source_ids=["a", "b", "b"])
+    assert injected == [move(1), move(3)]
+
+def test_batches_skip_unknown_and_malformed_events():
+    injector = HeldInjector()
+    injector.release.set()
+    pipeline = InputPipeline({MOUSE: injector})
+    pipeline.submit_batch([
+        {"type": "mouse_event", "data": move(1)},
+        {"type": "not_an_event", "data": move(2)},
+        {"type": "keyboard_event", "data": {"action": "keydown", "key": "a"}},  # No handler
+        {"type": "mouse_event", "data": "not a dict"},
+    ], "client")
+    pipeline.close()
+    assert injector.injected == [move(1)]
@@ -0,0 +1,66 @@
+import logging
+import threading
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+import logging_setup
+from logging_setup import CATEGORY_PREFIX, RateLimitFilter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(logging_setup, "time", clock)
+    return clock
+
+def record(category: str = "frames", level: int = logging.DEBUG, msg: str = "frame %d", args=(1,)) -> logging.LogRecord:
+    return logging.LogRecord(CATEGORY_PREFIX + category, level, __file__, 1, msg, args, None)
+
+def test_excess_records_are_suppressed_and_reported(clock):
+    limiter = RateLimitFilter({"frames": 2})
+    passed = [limiter.filter(record()) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limiter.suppressed_total == 3
+
+    clock.now += 1.0  # A new one-second window
+    reported = record(args=(6,))
+    assert limiter.filter(reported)
+    assert reported.getMessage() == "frame 6 (+3 similar suppressed)"
+
+    # The count was reported once
+    following = record(args=(7,))
+    assert limiter.filter(following)
+    assert following.getMessage() == "frame 7"
+
+def test_errors_and_unlimited_categories_are_never_suppressed(clock):
+    limiter = RateLimitFilter({"frames": 1})
+    assert limiter.filter(record())
+    assert limiter.filter(record(level=logging.ERROR))
+    assert all(limiter.filter(record(category="input")) for _ in range(10))
+    assert limiter.suppressed_total == 0
+
+def test_limit_holds_across_threads(clock):
+    limiter = RateLimitFilter({"frames": 100})
+    passed = []
+    start = threading.Barrier(8)
+
+    def log_many():
+        start.wait()
+        passed.append(sum(limiter.filter(record()) for _ in range(1000)))
+
+    threads = [threading.Thread(target=log_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(passed) == 100
+    assert limiter.suppressed_total == 8000 - 100
@@ -0,0 +1,35 @@
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.register(Histogram("frame_seconds", "Time per frame", (0.01, 0.1), labels=("stage",)))
+    for value in (0.005, 0.01, 0.05, 0.5):
+        histogram.observe(value, stage="encode")
+
+    assert registry.render() == "\n".join([
+        "# HELP frame_seconds Time per frame",
+        "# TYPE frame_seconds histogram",
+        'frame_seconds_bucket{stage="encode",le="0.01"} 2',  # Bounds are inclusive
+        'frame_seconds_bucket{stage="encode",le="0.1"} 3',
+        'frame_seconds_bucket{stage="encode",le="+Inf"} 4',
+        'frame_seconds_sum{stage="encode"} 0.565',
+        'frame_seconds_count{stage="encode"} 4',
+    ]) + "\n"
+
+def test_removed_gauge_series_are_no_longer_rendered():
+    registry = MetricsRegistry()
+    fps = registry.register(Gauge("stream_fps", "Frames per second", labels=("host",)))
+    fps.set(15.0, host="a")
+    fps.set(0.0, host="b")
+    fps.remove(host="a")
+    fps.remove(host="missing")
+
+    assert registry.render().splitlines()[2:] == ['stream_fps{host="b"} 0.0']
+
+def test_collectors_run_before_each_render():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("events_total", "Events"))
+    registry.add_collector(lambda: counter.inc())
+
+    assert registry.render().splitlines()[-1] == "events_total 1"
+    assert registry.render().splitlines()[-1] == "events_total 2"
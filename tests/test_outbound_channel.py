@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pydantic")
+
+from websocket_manager import OutboundChannel
+
+class RecordingWebSocket:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def send_text(self, text: str):
+        if self.fail:
+            raise ConnectionError("peer gone")
+        self.sent.append(("text", text))
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(("bytes", data))
+
+def test_newer_frame_replaces_undelivered_one():
+    async def scenario():
+        channel = OutboundChannel("c1", RecordingWebSocket(), max_queue=4)
+        channel.send_frame(b"frame-1", keyframe=True)
+        channel.send_frame(b"frame-2")
+        assert channel.frames_dropped == 1
+        assert channel.needs_keyframe is True
+
+        channel.start()
+        await asyncio.sleep(0.01)
+        channel.close()
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert channel.websocket.sent == [("bytes", b"frame-2")]
+    assert channel.frames_sent == 1
+
+def test_keyframe_clears_the_resync_request():
+    channel = OutboundChannel("c1", RecordingWebSocket(), max_queue=4)
+    channel.send_frame(b"delta-1")
+    channel.send_frame(b"delta-2")
+    assert channel.needs_keyframe is True
+    channel.send_frame(b"key", keyframe=True)
+    assert channel.needs_keyframe is False
+    assert channel.frames_dropped == 2
+
+def test_control_messages_go_before_frames():
+    async def scenario():
+        channel = OutboundChannel("c1", RecordingWebSocket(), max_queue=4)
+        channel.send_frame(b"frame")
+        await channel.send_text("first")
+        await channel.send_text("second")
+        channel.start()
+        await asyncio.sleep(0.01)
+        channel.close()
+        return channel.websocket.sent
+
+    assert asyncio.run(scenario()) == [("text", "first"), ("text", "second"), ("bytes", b"frame")]
+
+def test_send_text_gives_up_when_a_full_channel_closes():
+    async def scenario():
+        channel = OutboundChannel("c1", RecordingWebSocket(), max_queue=1)
+        assert await channel.send_text("fills the queue")
+        waiting = asyncio.ensure_future(channel.send_text("waits for room"))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        channel.close()
+        return await asyncio.wait_for(waiting, 1), await channel.send_text("after close")
+
+    assert asyncio.run(scenario()) == (False, False)
+
+def test_failed_send_closes_the_channel():
+    failed = []
+
+    async def scenario():
+        channel = OutboundChannel("c1", RecordingWebSocket(fail=True), max_queue=4, on_failure=failed.append)
+        channel.start()
+        await channel.send_text("lost")
+        await asyncio.sleep(0.01)
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert channel.closed
+    assert failed == ["c1"]
+    assert channel.try_send_text("refused") is False
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pydantic")
+
+import models
+import websocket_manager
+from config import settings
+from fakes import FakeWebSocket
+from websocket_manager import ConnectionManager
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(websocket_manager, "time", clock)
+    monkeypatch.setattr(models, "time", clock)
+    return clock
+
+async def connected(manager: ConnectionManager, count: int):
+    return [await manager.connect(FakeWebSocket()) for _ in range(count)]
+
+def test_unanswered_join_requests_expire(clock):
+    async def scenario():
+        manager = ConnectionManager()
+        host, client = await connected(manager, 2)
+        session_id = await manager.create_session(host)
+        pending_id = await manager.request_join_session(session_id, client)
+
+        clock.advance(settings.PENDING_REQUEST_TTL - 1)
+        assert (await manager.reap())["pending"] == 0
+        clock.advance(2)
+        reaped = await manager.reap()
+        return manager, pending_id, client, reaped
+
+    manager, pending_id, client, reaped = asyncio.run(scenario())
+    assert reaped["pending"] == 1
+    assert pending_id not in manager.pending_connections
+    assert manager.session_conflict(client) is None
+
+def test_sessions_expire_only_while_nobody_uses_them(clock):
+    async def scenario():
+        manager = ConnectionManager()
+        host, client = await connected(manager, 2)
+        session_id = await manager.create_session(host)
+        manager._add_client(manager.sessions[session_id], client)
+
+        # A joined client keeps the session alive however long it lasts
+        clock.advance(settings.SESSION_IDLE_TTL + 1)
+        for connection_id in (host, client):
+            manager.touch(connection_id)
+        assert (await manager.reap())["session"] == 0
+
+        manager.leave_session(client)
+        clock.advance(settings.SESSION_IDLE_TTL - 1)
+        manager.touch(host)
+        assert (await manager.reap())["session"] == 0
+        clock.advance(2)
+        return manager, session_id, await manager.reap()
+
+    manager, session_id, reaped = asyncio.run(scenario())
+    assert reaped["session"] == 1
+    assert session_id not in manager.sessions
+
+def test_connections_outside_any_session_are_closed_when_idle(clock):
+    async def scenario():
+        manager = ConnectionManager()
+        host, loiterer = await connected(manager, 2)
+        await manager.create_session(host)
+        websocket = manager.active_connections[loiterer]
+
+        assert (await manager.reap())["idle"] == 0  # The first sweep starts the clock
+        clock.advance(settings.CONNECTION_IDLE_TTL + 1)
+        return manager, host, loiterer, websocket, await manager.reap()
+
+    manager, host, loiterer, websocket, reaped = asyncio.run(scenario())
+    assert reaped["idle"] == 1
+    assert loiterer not in manager.active_connections
+    assert websocket.closed_with == 1001
+    assert host in manager.active_connections
+
+def test_heartbeat_timeout_runs_from_the_first_unanswered_ping(clock, monkeypatch):
+    # Pings more often than the timeout must not keep pushing it back
+    monkeypatch.setattr(settings, "WS_PING_TIMEOUT", 10)
+    async def scenario():
+        manager = ConnectionManager()
+        silent, alive = await connected(manager, 2)
+        for _ in range(2):
+            manager.send_heartbeats()
+            clock.advance(4)
+            manager.touch(alive)
+            assert (await manager.reap())["silent"] == 0
+        manager.send_heartbeats()
+        clock.advance(4)  # 12s after the first ping the silent connection never answered
+        manager.touch(alive)
+        return manager, silent, alive, await manager.reap()
+
+    manager, silent, alive, reaped = asyncio.run(scenario())
+    assert reaped["silent"] == 1
+    assert silent not in manager.active_connections
+    assert alive in manager.active_connections
+    assert silent not in manager.unanswered_pings
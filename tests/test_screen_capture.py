@@ -0,0 +1,101 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from capture_backends import CaptureBackend, SyntheticBackend
+from frame_protocol import decode_frame
+from screen_capture import ScreenCapture
+
+WIDTH, HEIGHT = 200, 130  # Neither is a multiple of the 64px tile
+
+class StillBackend(CaptureBackend):
+    """Returns a copy of whatever ``frame`` currently holds"""
+
+    name = "still"
+
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+
+    def size(self):
+        return self.frame.shape[1], self.frame.shape[0]
+
+    def grab(self) -> np.ndarray:
+        return self.frame.copy()
+
+def blank() -> np.ndarray:
+    return np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+def streaming_capture(backend: CaptureBackend) -> ScreenCapture:
+    capture = ScreenCapture(backend)
+    capture.scale_factor = 1.0
+    capture.progressive = False
+    return capture
+
+def test_dirty_tiles_cover_partial_edge_tiles():
+    capture = ScreenCapture(StillBackend(blank()))
+    previous, frame = blank(), blank()
+    frame[70, 140] = 255  # Tile row 1, column 2
+    frame[129, 199] = 255  # Last pixel, in the partial bottom-right tile
+
+    dirty = capture._find_dirty_tiles(frame, previous)
+
+    assert dirty.shape == (3, 4)
+    assert sorted(zip(*np.nonzero(dirty))) == [(1, 2), (2, 3)]
+
+def test_dirty_tiles_need_a_comparable_previous_frame():
+    capture = ScreenCapture(StillBackend(blank()))
+    assert capture._find_dirty_tiles(blank(), None) is None
+    assert capture._find_dirty_tiles(blank(), np.zeros((HEIGHT, WIDTH + 1, 3), dtype=np.uint8)) is None
+
+def test_dirty_rects_merge_runs_and_clip_to_the_frame():
+    capture = ScreenCapture(StillBackend(blank()))
+    dirty = np.array([
+        [True, True, False, True],
+        [False, False, False, False],
+        [False, True, True, True],
+    ])
+
+    assert capture._dirty_rects(dirty, WIDTH, HEIGHT) == [
+        (0, 0, 128, 64),
+        (192, 0, 8, 64),  # The last column is only 8px wide
+        (64, 128, 136, 2),  # The last row is only 2px high
+    ]
+
+def test_small_changes_are_sent_as_tiles():
+    backend = StillBackend(blank())
+    capture = streaming_capture(backend)
+    assert capture.capture_screen()["keyframe"] is True
+    assert capture.capture_screen() is None  # Unchanged
+
+    backend.frame[10:20, 70:80] = 255
+    update = capture.capture_screen()
+
+    assert update["keyframe"] is False
+    assert [tile[:4] for tile in decode_frame(update["payload"])["tiles"]] == [(64, 0, 64, 64)]
+
+def test_large_changes_fall_back_to_a_keyframe():
+    backend = StillBackend(blank())
+    capture = streaming_capture(backend)
+    capture.capture_screen()
+
+    # 6 of 12 tiles is exactly the threshold and still goes out as tiles
+    backend.frame[:64, :] = 255
+    backend.frame[64:66, :100] = 255
+    update = capture.capture_screen()
+    assert update["keyframe"] is False
+    assert len(decode_frame(update["payload"])["tiles"]) == 2
+
+    # 8 of 12 is above it
+    backend.frame[64:, :] = 128
+    update = capture.capture_screen()
+    assert update["keyframe"] is True
+    assert [tile[:4] for tile in decode_frame(update["payload"])["tiles"]] == [(0, 0, WIDTH, HEIGHT)]
+
+def test_requested_keyframe_is_sent_even_without_changes():
+    capture = streaming_capture(SyntheticBackend(WIDTH, HEIGHT, mode="static"))
+    capture.capture_screen()
+    assert capture.capture_screen() is None
+
+    capture.request_keyframe()
+    assert capture.capture_screen()["keyframe"] is True
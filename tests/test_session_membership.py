@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pydantic")
+
+from fakes import FakeCapture, FakeWebSocket
+from websocket_manager import ConnectionManager
+
+async def connected(manager: ConnectionManager, count: int):
+    return [await manager.connect(FakeWebSocket()) for _ in range(count)]
+
+def test_a_host_cannot_join_another_session():
+    async def scenario():
+        manager = ConnectionManager()
+        host_a, host_b = await connected(manager, 2)
+        session_a = await manager.create_session(host_a)
+        session_b = await manager.create_session(host_b)
+        capture = manager.sessions[session_a].capture = FakeCapture(capturing=True)
+
+        assert manager.session_conflict(host_a) == f"Already in session {session_a}"
+        assert await manager.request_join_session(session_b, host_a) is None
+        assert await manager.join_session(session_b, host_a) is False
+
+        # Disconnecting still finds and ends the host's own session
+        manager.disconnect(host_a)
+        return manager, session_a, session_b, capture
+
+    manager, session_a, session_b, capture = asyncio.run(scenario())
+    assert session_a not in manager.sessions
+    assert capture.closed
+    assert manager.sessions[session_b].client_id is None
+
+def test_a_client_cannot_create_or_join_while_in_a_session():
+    async def scenario():
+        manager = ConnectionManager()
+        host, other_host, client = await connected(manager, 3)
+        session_id = await manager.create_session(host)
+        other_id = await manager.create_session(other_host)
+        pending_id = await manager.request_join_session(session_id, client)
+
+        # Waiting for approval already ties the client to a session
+        assert manager.session_conflict(client) == "A connection request is already pending"
+        assert await manager.create_session(client) is None
+        assert await manager.request_join_session(other_id, client) is None
+
+        assert await manager.approve_connection(pending_id)
+        assert manager.session_conflict(client) == f"Already in session {session_id}"
+        assert await manager.create_session(client) is None
+        return manager, session_id, client
+
+    manager, session_id, client = asyncio.run(scenario())
+    assert manager.sessions[session_id].client_id == client
+    assert manager.get_session_for(client).session_id == session_id
+
+def test_approval_is_refused_for_a_client_that_joined_elsewhere():
+    async def scenario():
+        manager = ConnectionManager()
+        host_a, host_b, client = await connected(manager, 3)
+        session_a = await manager.create_session(host_a)
+        session_b = await manager.create_session(host_b)
+        pending_id = await manager.request_join_session(session_a, client)
+        manager._add_client(manager.sessions[session_b], client)  # Joined by another route
+        return await manager.approve_connection(pending_id), manager.sessions[session_a]
+
+    approved, session_a = asyncio.run(scenario())
+    assert approved is False
+    assert session_a.client_id is None
+
+def test_a_host_may_replace_its_own_session():
+    async def scenario():
+        manager = ConnectionManager()
+        (host,) = await connected(manager, 1)
+        first = await manager.create_session(host)
+        capture = manager.sessions[first].capture = FakeCapture()
+        second = await manager.create_session(host)
+        return manager, host, first, second, capture
+
+    manager, host, first, second, capture = asyncio.run(scenario())
+    assert first not in manager.sessions
+    assert capture.closed
+    assert manager.get_session_for(host).session_id == second
+
+def test_leaving_or_ending_a_session_closes_media_peers():
+    async def scenario():
+        manager = ConnectionManager()
+        released = []
+        async def release_media(connection_id: str):
+            released.append(connection_id)
+        manager.release_media = release_media
+
+        host, client, viewer, leaver = await connected(manager, 4)
+        session_id = await manager.create_session(host)
+        for connection_id in (client, viewer, leaver):
+            manager._add_client(manager.sessions[session_id], connection_id)
+            manager.set_media_connected(connection_id, True)
+
+        manager.leave_session(leaver)
+        await asyncio.sleep(0)
+        assert released == [leaver]
+
+        manager.disconnect(host)
+        await asyncio.sleep(0)
+        return manager, released, (client, viewer)
+
+    manager, released, members = asyncio.run(scenario())
+    assert set(members) <= set(released)
+    assert not manager.media_connections
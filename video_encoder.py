@@ -0,0 +1,101 @@
+"""Inter-frame H.264 encoding for the video streaming mode.
+
+Wraps a local libx264 encoder through PyAV (ultrafast preset, zerolatency tune,
+baseline profile, no B-frames) so every captured frame comes out as one Annex B
+access unit that browsers decode with WebCodecs ``VideoDecoder``. SPS/PPS are
+repeated on every IDR frame, so a viewer can start decoding at any keyframe.
+
+PyAV is optional; without it ``VIDEO_CODECS_AVAILABLE`` is False and ScreenCapture
+stays on per-frame JPEG.
+"""
+
+import logging
+from fractions import Fraction
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import av
+    from av.video.frame import PictureType
+except ImportError:
+    av = None
+
+VIDEO_CODECS_AVAILABLE = av is not None
+
+def quality_to_crf(quality: int) -> int:
+    """Map a JPEG quality (40-90 on the bitrate ladder) to an x264 CRF (35-20)"""
+    quality = max(40, min(90, quality))
+    return round(35 - (quality - 40) * 15 / 50)
+
+class VideoEncoder:
+    """H.264 encoder that is reopened only when the frame size or quality changes"""
+
+    codec_name = "libx264"
+
+    def __init__(self, keyframe_interval: int = 300):
+        if av is None:
+            raise RuntimeError("PyAV is not installed")
+        self.keyframe_interval = keyframe_interval  # Frames between periodic IDRs
+        self._context = None
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._pts = 0
+
+    def _open(self, width: int, height: int, crf: int):
+        self.close()
+        context = av.CodecContext.create(self.codec_name, "w")
+        context.width = width
+        context.height = height
+        context.pix_fmt = "yuv420p"
+        context.time_base = Fraction(1, 1000)
+        context.options = {
+            "preset": "ultrafast",
+            "tune": "zerolatency",
+            "profile": "baseline",
+            "crf": str(crf),
+            "x264-params": f"keyint={self.keyframe_interval}:repeat-headers=1:bframes=0"
+        }
+        context.open()
+        self._context = context
+        self._key = (width, height, crf)
+        self._pts = 0
+        logger.info(f"🎞️ Opened {self.codec_name} encoder {width}x{height} crf {crf}")
+
+    def encode(self, frame: np.ndarray, quality: int, keyframe: bool = False) -> Tuple[bytes, bool]:
+        """Encode one RGB frame; return (access unit, is_keyframe).
+
+        yuv420p needs even dimensions, so an odd last row or column is cropped.
+        """
+        height, width = frame.shape[0] & ~1, frame.shape[1] & ~1
+        if (height, width) != frame.shape[:2]:
+            frame = np.ascontiguousarray(frame[:height, :width])
+
+        key = (width, height, quality_to_crf(quality))
+        if key != self._key:
+            self._open(*key)
+            keyframe = True
+
+        video_frame = av.VideoFrame.from_ndarray(frame, format="rgb24")
+        video_frame.pts = self._pts
+        self._pts += 1
+        if keyframe:
+            video_frame.pict_type = PictureType.I  # PyAV 13+ no longer accepts the string "I"
+
+        packets = self._context.encode(video_frame)
+        data = b"".join(bytes(packet) for packet in packets)
+        return data, any(packet.is_keyframe for packet in packets)
+
+    def size(self) -> Optional[Tuple[int, int]]:
+        """(width, height) of the encoded frames"""
+        return self._key[:2] if self._key else None
+
+    def close(self):
+        if self._context is not None:
+            try:
+                self._context.close()
+            except Exception:
+                pass
+        self._context = None
+        self._key = None
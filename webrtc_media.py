@@ -0,0 +1,139 @@
+"""WebRTC media path: the host's screen as a video track, input over a data channel.
+
+Each viewer that offers WebRTC gets a server-side peer (aiortc) publishing its
+session's ScreenCapture as a video track. Signaling rides on the existing
+offer/answer/ice_candidate messages; once the peer connects, the WebSocket stops
+carrying frames to that viewer and the encoder's congestion control takes over.
+Pointer motion arrives on an unordered, unreliable ``input`` data channel and is
+dispatched exactly like WebSocket messages.
+
+Unlike the WebSocket path, where one encoded frame is shared by every viewer, each
+peer converts and encodes the screen itself - the price of per-viewer congestion
+control. CPU therefore grows with the number of WebRTC viewers, and the path is off
+unless WEBRTC_MEDIA is set.
+
+No TURN is configured - host candidates are enough on a LAN. aiortc is optional;
+without it viewers stay on WebSocket frames.
+"""
+
+import asyncio
+import logging
+import time
+from fractions import Fraction
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from aiortc import RTCConfiguration, RTCIceServer, RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+    from aiortc.sdp import candidate_from_sdp
+    from av import VideoFrame
+except ImportError:
+    RTCPeerConnection = None
+    VideoStreamTrack = object
+
+WEBRTC_AVAILABLE = RTCPeerConnection is not None
+
+VIDEO_CLOCK_RATE = 90000
+VIDEO_TIME_BASE = Fraction(1, VIDEO_CLOCK_RATE)
+
+class ScreenTrack(VideoStreamTrack):
+    """Video track that sends a session capture's latest scaled frame at the capture's FPS"""
+
+    kind = "video"
+
+    def __init__(self, capture):
+        super().__init__()
+        self.capture = capture
+        self._started: Optional[float] = None
+        self._pts = 0
+        self._blank = np.zeros((360, 640, 3), dtype=np.uint8)  # Until the host starts sharing
+
+    async def _next_timestamp(self):
+        if self._started is None:
+            self._started = time.time()
+            return 0, VIDEO_TIME_BASE
+        # Read every frame since the bitrate controller may change the FPS
+        self._pts += int(VIDEO_CLOCK_RATE / max(1, self.capture.fps))
+        wait = self._started + self._pts / VIDEO_CLOCK_RATE - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self._pts, VIDEO_TIME_BASE
+
+    async def recv(self):
+        pts, time_base = await self._next_timestamp()
+        frame = self.capture.video_frame()
+        if frame is None:
+            frame = self._blank
+
+        # Encoders want even dimensions; the client reports the video size with each click
+        height, width = frame.shape[0] & ~1, frame.shape[1] & ~1
+        video_frame = VideoFrame.from_ndarray(np.ascontiguousarray(frame[:height, :width]), format="rgb24")
+        video_frame.pts = pts
+        video_frame.time_base = time_base
+        return video_frame
+
+class MediaGateway:
+    """Server-side WebRTC peers, one per viewer connection"""
+
+    def __init__(self, ice_servers: Iterable[str] = ()):
+        self.ice_servers = list(ice_servers)  # STUN/TURN URLs; empty on a LAN
+        self.peers: Dict[str, "RTCPeerConnection"] = {}
+
+    async def answer(self, connection_id: str, offer: dict, capture,
+                     on_message: Callable[[str, str], Awaitable[None]],
+                     on_state: Callable[[str, bool], None]) -> dict:
+        """Answer a viewer's offer with a peer publishing ``capture``; replaces any previous peer"""
+        if not WEBRTC_AVAILABLE:
+            raise RuntimeError("aiortc is not installed")
+        await self.close(connection_id)
+
+        configuration = RTCConfiguration(iceServers=[RTCIceServer(urls=url) for url in self.ice_servers])
+        peer = RTCPeerConnection(configuration)
+        self.peers[connection_id] = peer
+
+        @peer.on("datachannel")
+        def on_datachannel(channel):
+            @channel.on("message")
+            async def on_channel_message(message):
+                if isinstance(message, str):
+                    await on_message(connection_id, message)
+
+        @peer.on("connectionstatechange")
+        async def on_connectionstatechange():
+            state = peer.connectionState
+            logger.info(f"📡 WebRTC peer {connection_id}: {state}")
+            if state == "connected":
+                on_state(connection_id, True)
+            elif state in ("failed", "closed"):
+                on_state(connection_id, False)
+                if state == "failed" and self.peers.get(connection_id) is peer:
+                    await self.close(connection_id)
+
+        await peer.setRemoteDescription(RTCSessionDescription(sdp=offer["sdp"], type=offer["type"]))
+        peer.addTrack(ScreenTrack(capture))  # Fills the viewer's recvonly video transceiver
+        await peer.setLocalDescription(await peer.createAnswer())
+        return {"sdp": peer.localDescription.sdp, "type": peer.localDescription.type}
+
+    async def add_ice_candidate(self, connection_id: str, data: dict) -> bool:
+        """Add a trickled candidate from the viewer; the end-of-candidates marker is ignored"""
+        peer = self.peers.get(connection_id)
+        candidate_line = data.get("candidate")
+        if peer is None or not candidate_line:
+            return False
+        candidate = candidate_from_sdp(candidate_line.split(":", 1)[1])
+        candidate.sdpMid = data.get("sdpMid")
+        candidate.sdpMLineIndex = data.get("sdpMLineIndex")
+        await peer.addIceCandidate(candidate)
+        return True
+
+    async def close(self, connection_id: str):
+        peer = self.peers.pop(connection_id, None)
+        if peer is not None:
+            await peer.close()
+
+    async def close_all(self):
+        for connection_id in list(self.peers):
+            await self.close(connection_id)
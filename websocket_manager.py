@@ -1,149 +1,746 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
-import json
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
 import uuid
+import time
 import asyncio
-from models import WebRTCMessage, MessageType
+import logging
+from models import WebRTCMessage, MessageType, Session, PendingConnection
+from config import settings
+from message_dispatch import encode_json
+from logging_setup import get_category_logger
+from metrics import FRAME_SEND_SECONDS, REAPED, REFUSED
+from session_store import SessionStore, MemoryStore
+from worker_bus import WorkerBus
+
+logger = logging.getLogger(__name__)
+message_logger = get_category_logger("messages")  # Per-message records, DEBUG and rate limited
+
+class OutboundChannel:
+    """Per-connection sender: a bounded queue for control messages and a latest-wins slot for frames.
+    
+    Control and input messages are never dropped; when the queue is full the caller waits
+    until there is room or the channel closes. Screen frames that are still undelivered
+    when a newer one arrives are dropped.
+    """
+    
+    def __init__(self, connection_id: str, websocket: WebSocket, max_queue: int,
+                 on_failure: Optional[Callable[[str], None]] = None):
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.on_failure = on_failure  # Called when a send fails, to close the connection
+        self.closed = False
+        self._closed = asyncio.Event()
+        self.messages: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.frame: Optional[bytes] = None
+        self.frame_queued_at = 0.0
+        self.needs_keyframe = False  # A dropped frame left the client without a base for the next tiles
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        
+        # Counters
+        self.messages_queued = 0
+        self.messages_sent = 0
+        self.frames_queued = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.frame_latency: Optional[float] = None  # Smoothed time a frame waits before it is written
+    
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+    
+    def close(self):
+        self._mark_closed()
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+    
+    def _mark_closed(self):
+        # Releases senders waiting for room in a queue nobody drains any more
+        self.closed = True
+        self._closed.set()
+    
+    async def send_text(self, text: str) -> bool:
+        """Queue a message, waiting while the queue is full; False once the channel is closed"""
+        if self.try_send_text(text):
+            return True
+        if self.closed:
+            return False
+        
+        put = asyncio.ensure_future(self.messages.put(text))
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            await asyncio.wait((put, closed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+            queued = put.done() and not put.cancelled()
+            if not queued:
+                put.cancel()
+        if not queued:
+            return False
+        self.messages_queued += 1
+        self._wakeup.set()
+        return True
+    
+    def try_send_text(self, text: str) -> bool:
+        """Queue a message without waiting; False when the queue is full or the channel is closed"""
+        if self.closed:
+            return False
+        try:
+            self.messages.put_nowait(text)
+        except asyncio.QueueFull:
+            return False
+        self.messages_queued += 1
+        self._wakeup.set()
+        return True
+    
+    def send_frame(self, data: bytes, keyframe: bool = False):
+        self.frames_queued += 1
+        if self.frame is not None:
+            self.frames_dropped += 1
+            if not keyframe:
+                self.needs_keyframe = True
+        if keyframe:
+            self.needs_keyframe = False
+        self.frame = data
+        self.frame_queued_at = time.monotonic()
+        self._wakeup.set()
+    
+    def stats(self) -> dict:
+        return {
+            "messages_queued": self.messages_queued,
+            "messages_sent": self.messages_sent,
+            "queue_depth": self.messages.qsize(),
+            "frames_queued": self.frames_queued,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "frame_pending": self.frame is not None,
+            "frame_latency": self.frame_latency,
+            "bytes_sent": self.bytes_sent
+        }
+    
+    async def _run(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                
+                # Control messages go first so input never waits behind a frame
+                while True:
+                    if not self.messages.empty():
+                        text = self.messages.get_nowait()
+                        await self.websocket.send_text(text)
+                        self.messages_sent += 1
+                        self.bytes_sent += len(text)
+                    elif self.frame is not None:
+                        data, self.frame = self.frame, None
+                        queued_at = self.frame_queued_at
+                        send_started = time.monotonic()
+                        await self.websocket.send_bytes(data)
+                        self.frames_sent += 1
+                        self.bytes_sent += len(data)
+                        
+                        sent_at = time.monotonic()
+                        FRAME_SEND_SECONDS.observe(sent_at - send_started)
+                        latency = sent_at - queued_at
+                        self.frame_latency = latency if self.frame_latency is None else self.frame_latency * 0.8 + latency * 0.2
+                    else:
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Sender for {self.connection_id} stopped: {e}")
+            self._mark_closed()
+            if self.on_failure is not None:
+                self.on_failure(self.connection_id)
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.sessions: Dict[str, Dict[str, str]] = {}
-        self.pending_connections: Dict[str, Dict[str, str]] = {}  # New: track pending requests
+        self.channels: Dict[str, OutboundChannel] = {}
+        self.sessions: Dict[str, Session] = {}
+        self.pending_connections: Dict[str, PendingConnection] = {}  # New: track pending requests
+        
+        # Reverse indexes so lookups by connection never scan every session
+        self.connection_sessions: Dict[str, str] = {}  # connection id -> session id (host, client or viewer)
+        self.connection_pending: Dict[str, Set[str]] = {}  # connection id -> pending ids (as host or client)
+        self.media_connections: Set[str] = set()  # Viewers receiving the screen over WebRTC instead of frames
+        self.release_media: Optional[Callable[[str], Awaitable[None]]] = None  # Closes a member's WebRTC peer
+        
+        # Several workers - each session lives on its host's worker; the store says where
+        # connections and sessions are, and the bus carries messages and frames between workers
+        self.worker_id = "local"
+        self.store: SessionStore = MemoryStore()
+        self.bus: Optional[WorkerBus] = None
+        self.remote_homes: Dict[str, str] = {}  # Local connection -> worker holding its session
+        self._connection_workers: Dict[str, str] = {}  # Cache of store lookups for remote connections
+        self._homed_here: Set[str] = set()  # Remote connections whose worker forwards their messages here
+        self._workers_need_keyframe: Set[str] = set()  # Workers that missed a frame
+        self._remote_dispatch: Optional[Callable[[str, str], Awaitable[None]]] = None
+        self._remote_disconnect: Optional[Callable[[str], Awaitable[None]]] = None
+        
+        # Expiry - the reaper times out join requests, idle sessions and connections
+        # that stopped answering heartbeats or never joined anything
+        self.last_seen: Dict[str, float] = {}  # connection id -> last message received
+        self.idle_since: Dict[str, float] = {}  # connection id -> first sweep that found it outside any session
+        self.unanswered_pings: Dict[str, float] = {}  # connection id -> oldest ping sent since it last spoke
+        self.last_ping_at = 0.0
+        self._reaper_task: Optional[asyncio.Task] = None
+        
+    async def start_cluster(self, worker_id: str, store: SessionStore, bus: Optional[WorkerBus],
+                            dispatch: Callable[[str, str], Awaitable[None]],
+                            on_disconnect: Callable[[str], Awaitable[None]]):
+        """Share routing through ``store`` and accept forwarded messages from sibling workers"""
+        self.worker_id = worker_id
+        self.store = store
+        self.bus = bus
+        self._remote_dispatch = dispatch
+        self._remote_disconnect = on_disconnect
+        store.remove_worker(worker_id)  # Leftovers of a previous process with the same id
+        if bus is not None:
+            await bus.start(self._handle_worker_message)
+    
+    async def stop_cluster(self):
+        self.store.remove_worker(self.worker_id)
+        if self.bus is not None:
+            await self.bus.close()
+        self.store.close()
+    
+    async def connect(self, websocket: WebSocket) -> Optional[str]:
+        """Accept a connection, or refuse it (returning None) at MAX_CONNECTIONS"""
+        if len(self.active_connections) >= settings.MAX_CONNECTIONS:
+            REFUSED.inc(kind="connection")
+            logger.warning(f"⚠️ Connection refused: {len(self.active_connections)} connections open")
+            await websocket.close(code=1013)  # Try again later
+            return None
         
-    async def connect(self, websocket: WebSocket) -> str:
         await websocket.accept()
         connection_id = str(uuid.uuid4())
         self.active_connections[connection_id] = websocket
-        print(f"New connection: {connection_id}")
+        self.last_seen[connection_id] = time.monotonic()
+        self.store.add_connection(connection_id, self.worker_id)
+        channel = OutboundChannel(connection_id, websocket, settings.WS_SEND_QUEUE_SIZE, self._on_send_failure)
+        channel.start()
+        self.channels[connection_id] = channel
+        logger.info(f"New connection: {connection_id}")
         return connection_id
     
+    def _on_send_failure(self, connection_id: str):
+        # The peer is gone or broken; close it instead of letting messages pile up for it
+        asyncio.ensure_future(self.close_connection(connection_id, "send failed"))
+    
     def disconnect(self, connection_id: str):
         if connection_id in self.active_connections:
             del self.active_connections[connection_id]
-            print(f"Connection removed: {connection_id}")
+            logger.info(f"Connection removed: {connection_id}")
         
-        # Clean up sessions
-        sessions_to_remove = []
-        for session_id, session in self.sessions.items():
-            if session.get("host_id") == connection_id or session.get("client_id") == connection_id:
-                sessions_to_remove.append(session_id)
+        channel = self.channels.pop(connection_id, None)
+        if channel is not None:
+            channel.close()
+        self.media_connections.discard(connection_id)
+        self.last_seen.pop(connection_id, None)
+        self.idle_since.pop(connection_id, None)
+        self.unanswered_pings.pop(connection_id, None)
+        
+        # A connection whose session lives on another worker is cleaned up there; a remote
+        # connection is only forgotten here, its own worker owns the store entry
+        home = self.remote_homes.pop(connection_id, None)
+        if home is not None:
+            self._forward_soon(home, {"kind": "disconnect", "connection": connection_id})
+        if self._connection_workers.pop(connection_id, None) is None:
+            self.store.remove_connection(connection_id)
+        self._homed_here.discard(connection_id)
+        
+        # Clean up sessions - losing the host or controlling client ends the session
+        session = self.get_session_for(connection_id)
+        if session is not None:
+            if connection_id in (session.host_id, session.client_id):
+                self._remove_session(session)
+            else:
+                session.viewers.discard(connection_id)
+                session.video_codecs.pop(connection_id, None)
+                self.connection_sessions.pop(connection_id, None)
+                self.update_stream_codec(session)
         
-        for session_id in sessions_to_remove:
-            print(f"Session removed: {session_id}")
-            del self.sessions[session_id]
-            
         # Clean up pending connections
-        pending_to_remove = []
-        for pending_id, pending in self.pending_connections.items():
-            if pending.get("client_id") == connection_id or pending.get("host_id") == connection_id:
-                pending_to_remove.append(pending_id)
-                
-        for pending_id in pending_to_remove:
-            del self.pending_connections[pending_id]
+        for pending_id in list(self.connection_pending.get(connection_id, ())):
+            self._remove_pending(pending_id)
+    
+    def _remove_session(self, session: Session):
+        # Ending the session ends its stream - nothing else holds on to the capture task
+        if session.capture is not None:
+            session.capture.close()
+            session.capture = None
+        
+        for member_id in session.members():
+            if self.connection_sessions.get(member_id) == session.session_id:
+                del self.connection_sessions[member_id]
+            self._release_media(member_id)
+            self._sync_remote_home(member_id)
+        self.sessions.pop(session.session_id, None)
+        self.store.remove_session(session.session_id)
+        logger.info(f"Session removed: {session.session_id}")
+    
+    def _release_media(self, connection_id: str):
+        # A WebRTC peer streams the session's capture, so it must not outlive the membership
+        self.media_connections.discard(connection_id)
+        if self.release_media is not None:
+            asyncio.ensure_future(self.release_media(connection_id))
+    
+    def _remove_pending(self, pending_id: str) -> Optional[PendingConnection]:
+        pending = self.pending_connections.pop(pending_id, None)
+        if pending is not None:
+            for connection_id in (pending.client_id, pending.host_id):
+                pending_ids = self.connection_pending.get(connection_id)
+                if pending_ids is not None:
+                    pending_ids.discard(pending_id)
+                    if not pending_ids:
+                        del self.connection_pending[connection_id]
+            self._sync_remote_home(pending.client_id)
+        return pending
+    
+    def get_session_for(self, connection_id: str) -> Optional[Session]:
+        """Return the session a connection hosts, controls or watches"""
+        session_id = self.connection_sessions.get(connection_id)
+        return self.sessions.get(session_id) if session_id is not None else None
     
     async def send_personal_message(self, message: dict, connection_id: str):
-        if connection_id in self.active_connections:
-            websocket = self.active_connections[connection_id]
-            try:
-                await websocket.send_text(json.dumps(message))
-                if message.get("type") != "screen_frame":
-                    print(f"Message sent to {connection_id}: {message.get('type')}")
-            except Exception as e:
-                print(f"Failed to send message to {connection_id}: {e}")
+        channel = self.channels.get(connection_id)
+        if channel is not None:
+            await channel.send_text(encode_json(message))
+            message_logger.debug("Message queued for %s: %s", connection_id, message.get('type'))
+            return
+        
+        worker_id = self.worker_of(connection_id)
+        if worker_id is not None:
+            await self.bus.send(worker_id, {"kind": "text", "connection": connection_id},
+                                encode_json(message).encode())
+            message_logger.debug("Message forwarded to %s on %s: %s", connection_id, worker_id, message.get('type'))
+        else:
+            message_logger.debug("Connection %s not found in active connections", connection_id)
+    
+    def send_bytes(self, data: bytes, connection_id: str, keyframe: bool = False):
+        """Queue a screen frame for one connection, replacing any undelivered older frame"""
+        channel = self.channels.get(connection_id)
+        if channel is not None:
+            channel.send_frame(data, keyframe)
+    
+    def broadcast_bytes(self, data: bytes, connection_ids: List[str], keyframe: bool = False):
+        """Queue the same screen frame for several connections without copying it"""
+        remote: Dict[str, List[str]] = {}
+        for connection_id in connection_ids:
+            if connection_id in self.channels:
+                self.send_bytes(data, connection_id, keyframe)
+            else:
+                worker_id = self.worker_of(connection_id)
+                if worker_id is not None:
+                    remote.setdefault(worker_id, []).append(connection_id)
+        
+        # One copy per worker; it fans the frame out to its own connections
+        for worker_id, targets in remote.items():
+            header = {"kind": "frame", "connections": targets, "keyframe": keyframe}
+            if self.bus.send_nowait(worker_id, header, data):
+                if keyframe:
+                    self._workers_need_keyframe.discard(worker_id)
+            elif not keyframe:
+                self._workers_need_keyframe.add(worker_id)
+    
+    def consume_keyframe_requests(self, connection_ids: List[str]) -> bool:
+        """Return True (and reset the flags) if any of the connections lost a frame it needed"""
+        requested = False
+        for connection_id in connection_ids:
+            channel = self.channels.get(connection_id)
+            if channel is not None and channel.needs_keyframe:
+                channel.needs_keyframe = False
+                requested = True
+            elif channel is None and self._connection_workers.get(connection_id) in self._workers_need_keyframe:
+                requested = True
+        return requested
+    
+    # 🔀 Cross-worker routing
+    def worker_of(self, connection_id: str) -> Optional[str]:
+        """The sibling worker holding a connection's WebSocket, or None if it is local or gone"""
+        if self.bus is None or connection_id in self.active_connections:
+            return None
+        worker_id = self._connection_workers.get(connection_id)
+        if worker_id is None:
+            worker_id = self.store.connection_worker(connection_id)
+            if worker_id is None or worker_id == self.worker_id:
+                return None
+            self._connection_workers[connection_id] = worker_id
+        return worker_id
+    
+    def is_reachable(self, connection_id: str) -> bool:
+        return connection_id in self.active_connections or self.worker_of(connection_id) is not None
+    
+    def session_worker(self, session_id: str) -> Optional[str]:
+        """The sibling worker holding a session, or None if it is here or unknown"""
+        if self.bus is None or session_id in self.sessions:
+            return None
+        worker_id = self.store.session_worker(session_id)
+        return worker_id if worker_id != self.worker_id else None
+    
+    async def forward_dispatch(self, worker_id: str, connection_id: str, raw: str) -> bool:
+        """Hand a client message to the worker holding its session, which dispatches it.
+        
+        The connection is routed there only once that worker answers with a "home" message,
+        so a join it refuses leaves nothing behind. Returns False if the worker is gone.
+        """
+        if await self.bus.send(worker_id, {"kind": "dispatch", "connection": connection_id}, raw.encode()):
+            return True
+        self.forget_worker(worker_id)
+        return False
+    
+    def forget_worker(self, worker_id: str):
+        """Drop a dead sibling's store rows and every route through it"""
+        logger.warning(f"⚠️ Forgetting unreachable worker {worker_id}")
+        self.store.remove_worker(worker_id)
+        for routes in (self.remote_homes, self._connection_workers):
+            for connection_id in [key for key, owner in routes.items() if owner == worker_id]:
+                del routes[connection_id]
+    
+    def _forward_soon(self, worker_id: str, header: dict, payload: bytes = b""):
+        if self.bus is not None:
+            asyncio.ensure_future(self.bus.send(worker_id, header, payload))
+    
+    def _sync_remote_home(self, connection_id: str):
+        """Tell a remote connection's worker whether to forward its messages here"""
+        worker_id = self.worker_of(connection_id)
+        if worker_id is None:
+            return
+        here = connection_id in self.connection_sessions or connection_id in self.connection_pending
+        if here and connection_id not in self._homed_here:
+            self._homed_here.add(connection_id)
+            self._forward_soon(worker_id, {"kind": "home", "connection": connection_id, "worker": self.worker_id})
+        elif not here and connection_id in self._homed_here:
+            self._homed_here.discard(connection_id)
+            self._forward_soon(worker_id, {"kind": "home", "connection": connection_id})
+    
+    async def _handle_worker_message(self, header: dict, payload: bytes):
+        kind = header.get("kind")
+        if kind == "frame":
+            for connection_id in header["connections"]:
+                channel = self.channels.get(connection_id)
+                if channel is None:
+                    continue
+                channel.send_frame(payload, header["keyframe"])
+                if channel.needs_keyframe:
+                    channel.needs_keyframe = False
+                    await self.bus.send(header["from"], {"kind": "keyframe", "connection": connection_id})
+        elif kind == "text":
+            channel = self.channels.get(header["connection"])
+            if channel is not None:
+                await channel.send_text(payload.decode())
+        elif kind == "dispatch":
+            await self._remote_dispatch(header["connection"], payload.decode())
+            self._sync_remote_home(header["connection"])
+        elif kind == "keyframe":
+            session = self.get_session_for(header["connection"])
+            if session is not None and session.capture is not None:
+                session.capture.request_keyframe()
+        elif kind == "home":
+            # Where this connection's session now lives; a stale release from a previous home is ignored
+            connection_id = header["connection"]
+            if connection_id not in self.active_connections:
+                return
+            if header.get("worker"):
+                self.remote_homes[connection_id] = header["worker"]
+            elif self.remote_homes.get(connection_id) == header["from"]:
+                del self.remote_homes[connection_id]
+        elif kind == "disconnect":
+            await self._remote_disconnect(header["connection"])
         else:
-            print(f"Connection {connection_id} not found in active connections")
+            logger.warning(f"⚠️ Unknown worker message: {kind}")
+    
+    def get_connection_stats(self, connection_id: str) -> Optional[dict]:
+        channel = self.channels.get(connection_id)
+        return channel.stats() if channel is not None else None
     
-    async def create_session(self, host_id: str) -> str:
+    def get_stream_recipients(self, host_id: str) -> List[str]:
+        """Return the host and every approved client/viewer of the host's session not on WebRTC video"""
+        session = self.get_session_for(host_id)
+        recipients = session.members() if session is not None and session.host_id == host_id else [host_id]
+        return [connection_id for connection_id in recipients
+                if self.is_reachable(connection_id) and connection_id not in self.media_connections]
+    
+    def set_media_connected(self, connection_id: str, connected: bool):
+        """Move a viewer between WebRTC video and WebSocket frames"""
+        if connected:
+            self.media_connections.add(connection_id)
+        elif connection_id in self.media_connections:
+            self.media_connections.discard(connection_id)
+            # Back on WebSocket frames, starting from a full frame
+            session = self.get_session_for(connection_id)
+            if session is not None and session.capture is not None:
+                session.capture.request_keyframe()
+    
+    def is_viewer(self, connection_id: str) -> bool:
+        """Check whether a connection joined a session as a view-only observer"""
+        session = self.get_session_for(connection_id)
+        return session is not None and connection_id in session.viewers
+    
+    def session_conflict(self, connection_id: str, creating: bool = False) -> Optional[str]:
+        """Why a connection can't create or join a session, or None if it can.
+        
+        A connection belongs to one session at a time; only a host may replace its own
+        session with a new one.
+        """
+        session = self.get_session_for(connection_id)
+        if session is not None and not (creating and session.host_id == connection_id):
+            return f"Already in session {session.session_id}"
+        for pending_id in self.connection_pending.get(connection_id, ()):
+            if self.pending_connections[pending_id].client_id == connection_id:
+                return "A connection request is already pending"
+        return None
+    
+    def is_session_full(self, session_id: str) -> bool:
+        session = self.sessions[session_id]
+        return bool(session.client_id) and len(session.viewers) >= settings.MAX_VIEWERS_PER_SESSION
+    
+    async def create_session(self, host_id: str, password: Optional[str] = None) -> Optional[str]:
+        """Create a session for a host, or return None at MAX_SESSIONS"""
+        if self.session_conflict(host_id, creating=True):
+            return None
+        
+        # A host runs one session at a time
+        previous = self.get_session_for(host_id)
+        if previous is not None and previous.host_id == host_id:
+            self._remove_session(previous)
+        
+        if len(self.sessions) >= settings.MAX_SESSIONS:
+            REFUSED.inc(kind="session")
+            logger.warning(f"⚠️ Session refused for host {host_id}: {len(self.sessions)} sessions open")
+            return None
+        
         session_id = str(uuid.uuid4())[:8]
-        self.sessions[session_id] = {
-            "host_id": host_id, 
-            "client_id": None,
-            "status": "waiting"  # New: track session status
-        }
-        print(f"Session created: {session_id} for host: {host_id}")
+        self.sessions[session_id] = Session(session_id, host_id, password)
+        self.connection_sessions[host_id] = session_id
+        self.store.add_session(session_id, host_id, self.worker_id)
+        logger.info(f"Session created: {session_id} for host: {host_id}")
         return session_id
     
     async def request_join_session(self, session_id: str, client_id: str, client_info: dict = None) -> str:
         """Create a pending connection request"""
-        if session_id not in self.sessions:
+        if session_id not in self.sessions or self.session_conflict(client_id):
             return None
             
         pending_id = str(uuid.uuid4())[:8]
-        self.pending_connections[pending_id] = {
-            "session_id": session_id,
-            "client_id": client_id,
-            "host_id": self.sessions[session_id]["host_id"],
-            "client_info": client_info or {},
-            "status": "pending"
-        }
+        pending = PendingConnection(pending_id, session_id, client_id, self.sessions[session_id].host_id, client_info)
+        self.pending_connections[pending_id] = pending
+        self.connection_pending.setdefault(client_id, set()).add(pending_id)
+        self.connection_pending.setdefault(pending.host_id, set()).add(pending_id)
         
-        print(f"Pending connection created: {pending_id} for session {session_id}")
+        logger.info(f"Pending connection created: {pending_id} for session {session_id}")
         return pending_id
     
+    def update_stream_codec(self, session: Session):
+        """Re-negotiate the stream codec after the members or the host's preference changed"""
+        if session.capture is not None:
+            session.capture.set_codec(session.stream_codec())
+    
+    def _add_client(self, session: Session, client_id: str, video_codecs=()):
+        session.video_codecs[client_id] = set(video_codecs)
+        if not session.client_id:
+            session.client_id = client_id
+            session.status = "connected"
+        else:
+            # The first client controls the desktop, later ones only watch
+            session.viewers.add(client_id)
+        self.connection_sessions[client_id] = session.session_id
+    
     async def approve_connection(self, pending_id: str) -> bool:
         """Approve a pending connection request"""
         if pending_id not in self.pending_connections:
             return False
             
         pending = self.pending_connections[pending_id]
-        session_id = pending["session_id"]
-        client_id = pending["client_id"]
+        session_id = pending.session_id
+        client_id = pending.client_id
         
-        if session_id in self.sessions and not self.sessions[session_id]["client_id"]:
-            self.sessions[session_id]["client_id"] = client_id
-            self.sessions[session_id]["status"] = "connected"
-            
-            # Clean up pending request
-            del self.pending_connections[pending_id]
-            
-            print(f"Connection approved: {client_id} joined session {session_id}")
-            return True
-            
-        return False
+        if session_id not in self.sessions or self.is_session_full(session_id):
+            return False
+        if self.get_session_for(client_id) is not None:
+            return False
+        
+        session = self.sessions[session_id]
+        self._add_client(session, client_id, pending.client_info.get("video_codecs", ()))
+        self.update_stream_codec(session)
+        
+        # Clean up pending request
+        self._remove_pending(pending_id)
+        
+        logger.info(f"Connection approved: {client_id} joined session {session_id}")
+        return True
     
     async def reject_connection(self, pending_id: str) -> bool:
         """Reject a pending connection request"""
-        if pending_id not in self.pending_connections:
+        if self._remove_pending(pending_id) is None:
             return False
-            
-        pending = self.pending_connections[pending_id]
-        
-        # Clean up pending request
-        del self.pending_connections[pending_id]
         
-        print(f"Connection rejected for pending request: {pending_id}")
+        logger.info(f"Connection rejected for pending request: {pending_id}")
         return True
     
     async def join_session(self, session_id: str, client_id: str) -> bool:
         """Direct join (for backward compatibility)"""
-        if session_id in self.sessions and not self.sessions[session_id]["client_id"]:
-            self.sessions[session_id]["client_id"] = client_id
-            self.sessions[session_id]["status"] = "connected"
-            print(f"Client {client_id} joined session {session_id}")
+        session = self.sessions.get(session_id)
+        if session is not None and not session.client_id and self.session_conflict(client_id) is None:
+            self._add_client(session, client_id)
+            logger.info(f"Client {client_id} joined session {session_id}")
             return True
         return False
     
-    async def relay_message(self, message: WebRTCMessage, sender_id: str):
-        session_id = None
+    def leave_session(self, client_id: str) -> Optional[Session]:
+        """Remove a client or viewer from its session, keeping the session open for the host"""
+        session = self.get_session_for(client_id)
+        if session is None or session.host_id == client_id:
+            return None
+        
+        if session.client_id == client_id:
+            session.client_id = None
+            session.status = "waiting"
+        else:
+            session.viewers.discard(client_id)
+        session.video_codecs.pop(client_id, None)
+        self._release_media(client_id)
+        del self.connection_sessions[client_id]
+        self._sync_remote_home(client_id)
+        self.update_stream_codec(session)
+        return session
+    
+    async def relay_message(self, message: Union[WebRTCMessage, dict], sender_id: str):
+        """Forward a message to the sender's peer; fast-path handlers pass the raw decoded dict"""
         target_id = None
         
-        for sid, session in self.sessions.items():
-            if session["host_id"] == sender_id:
-                target_id = session["client_id"]
-                session_id = sid
-                break
-            elif session["client_id"] == sender_id:
-                target_id = session["host_id"]
-                session_id = sid
-                break
-        
-        if target_id and target_id in self.active_connections:
-            message.source_id = sender_id
-            message.target_id = target_id
-            await self.send_personal_message(message.dict(), target_id)
-            print(f"Relayed {message.type} from {sender_id} to {target_id}")
+        session = self.get_session_for(sender_id)
+        if session is not None:
+            if session.host_id == sender_id:
+                target_id = session.client_id
+            elif session.client_id == sender_id:
+                target_id = session.host_id
+        
+        if target_id and self.is_reachable(target_id):
+            message_data = message.dict() if isinstance(message, WebRTCMessage) else dict(message)
+            message_data["source_id"] = sender_id
+            message_data["target_id"] = target_id
+            await self.send_personal_message(message_data, target_id)
+            message_logger.debug("Relayed %s from %s to %s", message_data['type'], sender_id, target_id)
+        else:
+            message_logger.debug("Could not relay message from %s - target not found", sender_id)
+    
+    def touch(self, connection_id: str):
+        """Record that a connection is alive (any message counts as a heartbeat reply)"""
+        self.last_seen[connection_id] = time.monotonic()
+        self.unanswered_pings.pop(connection_id, None)
+    
+    def _notify(self, message: dict, connection_id: str):
+        # The reaper never waits on a slow client; a full queue means it is about to be reaped too
+        channel = self.channels.get(connection_id)
+        if channel is not None:
+            channel.try_send_text(encode_json(message))
         else:
-            print(f"Could not relay message from {sender_id} - target not found")
+            worker_id = self.worker_of(connection_id)
+            if worker_id is not None:
+                self._forward_soon(worker_id, {"kind": "text", "connection": connection_id},
+                                   encode_json(message).encode())
+    
+    def send_heartbeats(self):
+        """Ping every local connection; replies are checked by the next sweeps"""
+        now = self.last_ping_at = time.monotonic()
+        ping = encode_json({"type": "ping", "data": {"ts": time.time()}})
+        for connection_id, channel in self.channels.items():
+            # The timeout runs from the first unanswered ping, whatever the ping interval
+            self.unanswered_pings.setdefault(connection_id, now)
+            channel.try_send_text(ping)
+    
+    async def close_connection(self, connection_id: str, reason: str):
+        """Close a connection from the server side and forget it"""
+        websocket = self.active_connections.get(connection_id)
+        if websocket is None:
+            return
+        self.disconnect(connection_id)
+        logger.info(f"🧹 Closed {connection_id}: {reason}")
+        try:
+            # A dead peer may never take the close frame
+            await asyncio.wait_for(websocket.close(code=1001), timeout=settings.WS_PING_TIMEOUT)
+        except Exception:
+            pass
+    
+    async def reap(self) -> Dict[str, int]:
+        """Expire join requests, idle sessions and dead or idle connections"""
+        now = time.monotonic()
+        reaped = {"pending": 0, "session": 0, "silent": 0, "idle": 0}
+        
+        # Join requests the host never answered
+        expired = [pending for pending in self.pending_connections.values()
+                   if now - pending.created_at > settings.PENDING_REQUEST_TTL]
+        for pending in expired:
+            self._remove_pending(pending.pending_id)
+            self._notify({
+                "type": "session_join_response",
+                "data": {"success": False, "session_id": pending.session_id,
+                         "error": "The host did not answer the connection request in time"}
+            }, pending.client_id)
+            self._notify({
+                "type": "connection_request_expired",
+                "data": {"pending_id": pending.pending_id, "client_id": pending.client_id}
+            }, pending.host_id)
+            reaped["pending"] += 1
+        
+        # Sessions with nobody joined, nothing waiting and no stream
+        waiting = {pending.session_id for pending in self.pending_connections.values()}
+        for session in list(self.sessions.values()):
+            streaming = session.capture is not None and session.capture.is_capturing
+            if streaming or session.client_id or session.viewers or session.session_id in waiting:
+                session.last_active = now
+            elif now - session.last_active > settings.SESSION_IDLE_TTL:
+                self._remove_session(session)
+                self._notify({"type": "session_expired", "data": {"session_id": session.session_id}},
+                             session.host_id)
+                reaped["session"] += 1
+        
+        # Connections that missed a heartbeat, or never joined anything
+        for connection_id in list(self.active_connections):
+            pinged_at = self.unanswered_pings.get(connection_id)
+            if pinged_at is not None and now - pinged_at > settings.WS_PING_TIMEOUT:
+                await self.close_connection(connection_id, "heartbeat timed out")
+                reaped["silent"] += 1
+            elif (connection_id in self.connection_sessions or connection_id in self.connection_pending
+                  or connection_id in self.remote_homes):
+                self.idle_since.pop(connection_id, None)
+            elif now - self.idle_since.setdefault(connection_id, now) > settings.CONNECTION_IDLE_TTL:
+                await self.close_connection(connection_id, "idle outside any session")
+                reaped["idle"] += 1
+        
+        for kind, count in reaped.items():
+            if count:
+                REAPED.inc(count, kind=kind)
+        return reaped
+    
+    async def _run_reaper(self):
+        while True:
+            await asyncio.sleep(settings.REAPER_INTERVAL)
+            try:
+                if time.monotonic() - self.last_ping_at >= settings.WS_PING_INTERVAL:
+                    self.send_heartbeats()
+                reaped = await self.reap()
+                if any(reaped.values()):
+                    logger.info(f"🧹 Reaped {reaped}")
+            except Exception as e:
+                logger.error(f"❌ Reaper error: {e}")
+    
+    def start_reaper(self):
+        self._reaper_task = asyncio.create_task(self._run_reaper())
+    
+    def stop_reaper(self):
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+    
+    def reaper_stats(self) -> dict:
+        return {
+            "max_connections": settings.MAX_CONNECTIONS,
+            "max_sessions": settings.MAX_SESSIONS,
+            "idle_connections": len(self.idle_since),
+            "seconds_since_ping": round(time.monotonic() - self.last_ping_at, 1) if self.last_ping_at else None
+        }
 
 manager = ConnectionManager()
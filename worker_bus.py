@@ -0,0 +1,160 @@
+"""Message forwarding between the workers of one machine over Unix sockets.
+
+Every worker listens on ``<socket_dir>/<worker_id>.sock``. A message is a small JSON
+header plus an optional binary payload (message text, raw client message or an
+encoded screen frame), framed as:
+
+    header_length  I
+    payload_length I
+    header         JSON, always carrying "from" (the sending worker)
+    payload
+
+Frames are encoded once and sent once per worker however many of its connections
+watch them; the receiving worker fans them out to its own connections.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ENVELOPE = struct.Struct("<II")
+
+Handler = Callable[[dict, bytes], Awaitable[None]]
+
+class WorkerBus:
+    """One worker's end of the Unix-socket links to its siblings"""
+
+    def __init__(self, worker_id: str, socket_dir: str, max_buffered: int = 4 * 1024 * 1024):
+        self.worker_id = worker_id
+        self.socket_dir = socket_dir
+        self.max_buffered = max_buffered  # Bytes queued for one worker before frames to it are dropped
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        self._connecting: Dict[str, asyncio.Task] = {}
+        self._handler: Optional[Handler] = None
+
+        # Counters
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.frames_dropped = 0
+        self.send_errors = 0
+
+    def path_for(self, worker_id: str) -> str:
+        return os.path.join(self.socket_dir, f"{worker_id}.sock")
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        os.makedirs(self.socket_dir, exist_ok=True)
+        path = self.path_for(self.worker_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path=path)
+        logger.info(f"🔀 Worker bus listening on {path}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header_length, payload_length = ENVELOPE.unpack(await reader.readexactly(ENVELOPE.size))
+                header = json.loads(await reader.readexactly(header_length))
+                payload = await reader.readexactly(payload_length) if payload_length else b""
+                self.messages_received += 1
+                try:
+                    await self._handler(header, payload)
+                except Exception as e:
+                    logger.error(f"❌ Worker bus handler error for {header.get('kind')}: {e}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Shutting down; the link is closed below
+        finally:
+            writer.close()
+
+    def _pack(self, header: dict, payload: bytes) -> bytes:
+        header = json.dumps({**header, "from": self.worker_id}).encode()
+        return ENVELOPE.pack(len(header), len(payload)) + header + payload
+
+    def _start_connect(self, worker_id: str) -> asyncio.Task:
+        # One connection attempt per worker at a time, shared by every sender
+        task = self._connecting.get(worker_id)
+        if task is None:
+            task = self._connecting[worker_id] = asyncio.create_task(self._open(worker_id))
+            task.add_done_callback(lambda _: self._connecting.pop(worker_id, None))
+        return task
+
+    async def _link(self, worker_id: str) -> Optional[asyncio.StreamWriter]:
+        writer = self._writers.get(worker_id)
+        if writer is not None and not writer.is_closing():
+            return writer
+        return await asyncio.shield(self._start_connect(worker_id))
+
+    async def _open(self, worker_id: str) -> Optional[asyncio.StreamWriter]:
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path_for(worker_id))
+        except OSError as e:
+            self.send_errors += 1
+            logger.warning(f"⚠️ Worker {worker_id} unreachable: {e}")
+            return None
+        self._writers[worker_id] = writer
+        return writer
+
+    async def send(self, worker_id: str, header: dict, payload: bytes = b"") -> bool:
+        """Send a message that must not be dropped, waiting while the link is backed up"""
+        writer = await self._link(worker_id)
+        if writer is None:
+            return False
+        try:
+            writer.write(self._pack(header, payload))
+            await writer.drain()
+        except (ConnectionError, OSError) as e:
+            self.send_errors += 1
+            self._writers.pop(worker_id, None)
+            logger.warning(f"⚠️ Lost link to worker {worker_id}: {e}")
+            return False
+        self.messages_sent += 1
+        return True
+
+    def send_nowait(self, worker_id: str, header: dict, payload: bytes = b"") -> bool:
+        """Send a screen frame without waiting; returns False if it was dropped.
+
+        A frame is dropped while the link is still being opened or has more than
+        ``max_buffered`` bytes queued - the caller then asks for a keyframe.
+        """
+        writer = self._writers.get(worker_id)
+        if writer is None or writer.is_closing():
+            self._start_connect(worker_id)
+            self.frames_dropped += 1
+            return False
+        if writer.transport.get_write_buffer_size() > self.max_buffered:
+            self.frames_dropped += 1
+            return False
+        writer.write(self._pack(header, payload))
+        self.messages_sent += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "links": sorted(self._writers),
+            "messages_sent": self.messages_sent,
+            "messages_received": self.messages_received,
+            "frames_dropped": self.frames_dropped,
+            "send_errors": self.send_errors
+        }
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        try:
+            os.unlink(self.path_for(self.worker_id))
+        except OSError:
+            pass